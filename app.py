@@ -1,27 +1,57 @@
-from flask import Flask, render_template, redirect, url_for, request, flash, abort, send_from_directory
-from flask_bcrypt import Bcrypt
+from flask import (Flask, render_template, redirect, url_for, request, flash, abort, send_from_directory, jsonify,
+                   Response, stream_with_context, send_file)
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from flask_migrate import Migrate
 from flask_wtf.csrf import CSRFProtect
-from werkzeug.utils import secure_filename
-from models import db, User, Role, Course, Module, ContentItem, CourseEnrollment, StudentResponse, QuizQuestion
+from models import (db, User, Role, Course, Module, ContentItem, CourseEnrollment, StudentResponse, QuizQuestion,
+                    ModuleCompletion, QuizAttemptSummary, QUIZ_PASSING_SCORE)
+from sqlalchemy.orm import joinedload
 from functools import wraps
 from datetime import datetime, timedelta
 import os
 from forms import DeleteUserForm
+from jobs import Job, submit_job, get_job
+from progress import recompute_enrollment_progress, reconcile_course_content_counts
+from metrics import refresh_course_metrics, instructor_course_metrics
+from catalog import available_courses
+from search import ensure_search_index, rebuild_search_index, search
+from grading import (AnswerKey, get_answer_key, invalidate_answer_key, save_attempt_answers, regrade_quiz,
+                     start_attempt, claim_attempt, attempt_block_reason)
+from item_analysis import quiz_item_analysis, course_item_analysis, invalidate_item_analysis
+from identity import load_identity, invalidate_identity
+from passwords import PasswordHasherBusy, hash_password, check_password, needs_rehash, benchmark_rounds
+from user_import import save_import_file, run_import, generated_passwords_path, take_generated_passwords
+from uploads import UploadRequest, save_upload, content_hash, send_blob, collect_garbage
+from fragments import cached_fragment, fragment_cache_stats
+from conditional import conditional_on_course
+from assets import asset_url, build_assets, send_asset
+from enrollment import parse_identifiers, read_identifiers_csv, resolve_students, enroll_students
+from query_plans import check_query_plans
+from sqlite_profile import init_sqlite_profile, run_maintenance, benchmark
+from reports import completed_courses_query, keyset_page, prefix_match, stream_csv, stream_jsonl, COMPLETED_COURSES_COLUMNS
 from urllib.parse import urlparse, parse_qs
+from collections import OrderedDict
+import io
 import json
+import re
+import click
 
 
 # Application Configuration
 app = Flask(__name__, template_folder="app/templates", static_folder="app/static")
 app.config.from_object('config.Config')
+app.request_class = UploadRequest  # Los archivos subidos se hashean mientras se reciben
 
 # Static Upload Folder
 UPLOAD_FOLDER = os.path.join(app.root_path, 'app/static/uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+# Almacén de archivos subidos direccionado por contenido (ver uploads.py)
+app.config.setdefault('UPLOAD_STORE', os.path.join(app.instance_path, 'uploads'))
+
+# Tamaño de página de los listados de administración
+ADMIN_PAGE_SIZE = 50
 
 def allowed_file(filename):
     ALLOWED_EXTENSIONS = {'pdf', 'docx', 'txt', 'mp4'}
@@ -29,26 +59,37 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 # Ruta para servir los archivos subidos
-@app.route('/uploads/<filename>')
+@app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    sha256 = content_hash(filename)
+    if sha256:
+        return send_blob(sha256, filename.split('/', 1)[1])
+    # Archivos subidos antes del almacén por contenido (guardados con su ruta completa)
+    return send_from_directory(app.config['UPLOAD_FOLDER'], filename.replace('\\', '/').rsplit('/', 1)[-1])
 
 # Initialize Extensions
 db.init_app(app)
-bcrypt = Bcrypt(app)
+init_sqlite_profile(app, db)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
+
+@app.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(error):
+    """Demasiadas verificaciones de contraseña en curso: se rechaza rápido en lugar de encolar."""
+    return Response('Servidor ocupado, inténtalo de nuevo en unos segundos.', status=503,
+                    headers={'Retry-After': '2'}, mimetype='text/plain')
 migrate = Migrate(app, db)
 csrf = CSRFProtect(app)
 csrf.init_app(app)
 
-# Registrar `enumerate` en el entorno Jinja
-app.jinja_env.globals.update(enumerate=enumerate)
+# Registrar `enumerate` y `asset_url` en el entorno Jinja
+app.jinja_env.globals.update(enumerate=enumerate, asset_url=asset_url)
 
 # User Loader
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Usuario y rol desde la caché de identidades (una consulta con join si no está)
+    return load_identity(user_id)
 
 # Role-based Access Control Decorator
 def role_required(role):
@@ -62,37 +103,169 @@ def role_required(role):
     return decorator
 
 # Database Initialization
-with app.app_context():
-    try:
-        db.create_all()  # Create tables if they don't exist
-
-        # Create default roles
-        roles = ['admin', 'instructor', 'student']
-        for role_name in roles:
-            role = Role.query.filter_by(name=role_name).first()
-            if not role:
-                new_role = Role(name=role_name)
-                db.session.add(new_role)
+def init_db():
+    """Crea las tablas, los roles por defecto y el usuario administrador."""
+    db.create_all()  # Create tables if they don't exist
+
+    # Create default roles
+    roles = ['admin', 'instructor', 'student']
+    for role_name in roles:
+        role = Role.query.filter_by(name=role_name).first()
+        if not role:
+            new_role = Role(name=role_name)
+            db.session.add(new_role)
+    db.session.commit()
+
+    # Create default admin user
+    admin_role = Role.query.filter_by(name='admin').first()
+    admin_user = User.query.filter_by(username='admin').first()
+
+    if not admin_user and admin_role:
+        password_hash = hash_password('admin123')
+        admin_user = User(username='admin', email='admin@example.com', password=password_hash, role=admin_role)
+        db.session.add(admin_user)
         db.session.commit()
+        print("Admin user created successfully. Username: 'admin', Password: 'admin123'")
 
-        # Create default admin user
-        admin_role = Role.query.filter_by(name='admin').first()
-        admin_user = User.query.filter_by(username='admin').first()
+    ensure_search_index()
 
-        if not admin_user and admin_role:
-            password_hash = bcrypt.generate_password_hash('admin123').decode('utf-8')
-            admin_user = User(username='admin', email='admin@example.com', password=password_hash, role=admin_role)
-            db.session.add(admin_user)
-            db.session.commit()
-            print("Admin user created successfully. Username: 'admin', Password: 'admin123'")
+@app.cli.command('init-db')
+def init_db_command():
+    """Inicializa la base de datos con los datos por defecto."""
+    try:
+        init_db()
     except Exception as e:
         print(f"Error creating database or admin user: {e}")
         db.session.rollback()
 
-# Routes for Static Files (Fixing BuildError for Static)
-@app.route('/static/<path:filename>')
-def serve_static(filename):
-    return redirect(url_for('static', filename=filename))
+@app.cli.command('recompute-progress')
+@click.option('--since', type=click.DateTime(), default=None,
+              help='Recalcular solo las inscripciones tocadas desde esta fecha.')
+def recompute_progress_command(since):
+    """Recalcula el progreso de las inscripciones con consultas agrupadas."""
+    updated = recompute_enrollment_progress(since=since)
+    print(f"Inscripciones actualizadas: {updated}")
+
+@app.cli.command('reconcile-counters')
+@click.option('--dry-run', is_flag=True, help='Solo informar de las desviaciones, sin corregirlas.')
+def reconcile_counters_command(dry_run):
+    """Detecta y corrige desviaciones en los contadores de contenidos y progreso."""
+    courses = reconcile_course_content_counts(dry_run=dry_run)
+    enrollments = recompute_enrollment_progress(dry_run=dry_run)
+    action = 'detectadas' if dry_run else 'corregidas'
+    print(f"Desviaciones {action}: {courses} cursos, {enrollments} inscripciones")
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Reconstruye el índice de búsqueda de texto completo."""
+    indexed = rebuild_search_index()
+    print(f"Documentos indexados: {indexed}")
+
+@app.cli.command('benchmark-bcrypt')
+@click.option('--target-ms', default=250, show_default=True, help='Tiempo máximo aceptable por hash.')
+def benchmark_bcrypt_command(target_ms):
+    """Mide el coste de bcrypt en esta máquina y sugiere BCRYPT_LOG_ROUNDS."""
+    suggested = None
+    for rounds, elapsed in benchmark_rounds(range(10, 15)):
+        click.echo(f'coste {rounds}: {elapsed:.0f} ms')
+        if elapsed <= target_ms:
+            suggested = rounds
+    click.echo(f'BCRYPT_LOG_ROUNDS sugerido: {suggested or 10} (configurado: {app.config["BCRYPT_LOG_ROUNDS"]})')
+
+@app.cli.command('import-users')
+@click.argument('csv_file', type=click.File('rb'))
+def import_users_command(csv_file):
+    """Importa usuarios desde un CSV (username, email, role, password).
+
+    Si se interrumpe, volver a ejecutarlo con el mismo archivo continúa desde el último lote.
+    """
+    import_id = save_import_file(csv_file.read())
+    try:
+        summary = run_import(Job('import_users'), import_id)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for error in summary['errors']:
+        click.echo(f"línea {error['line']} ({error['username']}): {error['error']}")
+    click.echo(f"Usuarios creados: {summary['created']}, filas con errores: {len(summary['errors'])}")
+    passwords_path = generated_passwords_path(import_id)
+    if passwords_path:
+        click.echo(f'Contraseñas generadas: {passwords_path}')
+
+@app.cli.command('enroll-students')
+@click.option('--course', 'course_ids', type=int, multiple=True, required=True, help='Id del curso (repetible).')
+@click.option('--role', default=None, help='Inscribir a todos los usuarios con este rol.')
+@click.option('--csv', 'csv_file', type=click.File('rb'), default=None,
+              help='CSV con una columna username o email.')
+@click.argument('students', nargs=-1)
+def enroll_students_command(course_ids, role, csv_file, students):
+    """Inscribe en bloque estudiantes (nombres de usuario o correos) en uno o más cursos."""
+    identifiers = list(students) + (read_identifiers_csv(csv_file.read()) if csv_file else [])
+    result = _enroll_cohort(course_ids, identifiers, role)
+    for identifier in result['unknown']:
+        click.echo(f'No es un estudiante: {identifier}')
+    click.echo(f"Cursos: {result['courses']}, inscripciones nuevas: {result['enrolled']}, "
+               f"ya inscritos: {result['already_enrolled']}")
+
+@app.cli.command('gc-uploads')
+@click.option('--dry-run', is_flag=True, help='Solo informar, sin borrar ni corregir nada.')
+def gc_uploads_command(dry_run):
+    """Corrige las referencias de los archivos subidos y borra los que no usa ningún contenido."""
+    fixed, removed = collect_garbage(dry_run=dry_run)
+    action = 'detectados' if dry_run else 'borrados'
+    print(f"Referencias corregidas: {fixed}, archivos huérfanos {action}: {removed}")
+
+@app.cli.command('sqlite-maintenance')
+def sqlite_maintenance_command():
+    """Vuelca y trunca el WAL y actualiza las estadísticas de SQLite (programarlo periódicamente)."""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('La base de datos no es SQLite.')
+    checkpointed, pending, broken = run_maintenance(db.engine)
+    print(f"Páginas volcadas del WAL: {checkpointed}, pendientes: {pending}")
+    if broken:
+        print(f"Filas con claves foráneas rotas: {broken} (ver PRAGMA foreign_key_check)")
+
+@app.cli.command('check-query-plans')
+@click.option('--verbose', is_flag=True, help='Mostrar el plan completo de cada consulta.')
+def check_query_plans_command(verbose):
+    """Comprueba con EXPLAIN QUERY PLAN que las consultas calientes usan índices (falla si alguna no)."""
+    results = check_query_plans()
+    for name, plan, scans in results:
+        click.echo(f"{'RECORRIDO' if scans else 'ok':>9}  {name}")
+        for detail in plan if verbose else scans:
+            click.echo(f'           {detail}')
+    failed = [name for name, _, scans in results if scans]
+    if failed:
+        raise click.ClickException(f'{len(failed)} consultas recorren tablas completas.')
+    click.echo(f'Consultas comprobadas: {len(results)}')
+
+@app.cli.command('benchmark-sqlite')
+@click.option('--threads', default=8, show_default=True, help='Hilos concurrentes.')
+@click.option('--seconds', default=5.0, show_default=True, help='Duración de cada medición.')
+@click.option('--write-ratio', default=0.2, show_default=True, help='Fracción de operaciones que escriben.')
+def benchmark_sqlite_command(threads, seconds, write_ratio):
+    """Mide el rendimiento con carga mixta de lecturas y escrituras, con y sin el perfil de SQLite."""
+    for profiled in (False, True):
+        result = benchmark(app.config['SQLITE_PRAGMAS'], profiled, threads, seconds, write_ratio)
+        elapsed = result['elapsed']
+        click.echo(f"{'con perfil' if profiled else 'sin perfil'}: {result['reads'] / elapsed:.0f} lecturas/s, "
+                   f"{result['writes'] / elapsed:.0f} escrituras/s, {result['errors']} errores por bloqueo")
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Compila el SCSS y publica los recursos estáticos con huella y precomprimidos."""
+    manifest = build_assets(app.static_folder)
+    print(f"Recursos publicados: {len(manifest)}")
+
+@app.cli.command('refresh-metrics')
+def refresh_metrics_command():
+    """Recalcula la tabla materializada de métricas por curso."""
+    refreshed = refresh_course_metrics()
+    print(f"Cursos actualizados: {refreshed}")
+
+# Recursos estáticos con huella (ver assets.py): se cachean como inmutables
+@app.route('/assets/<path:filename>')
+def asset(filename):
+    return send_asset(filename)
 
 # Login Route
 @app.route('/', methods=['GET', 'POST'])
@@ -101,7 +274,12 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
         user = User.query.filter_by(username=username).first()
-        if user and bcrypt.check_password_hash(user.password, password):
+        if user and check_password(user.password, password):
+            if needs_rehash(user.password):
+                # Rehash al coste configurado; UPDATE directo para no invalidar las sesiones del usuario
+                db.session.execute(db.update(User).where(User.id == user.id).values(password=hash_password(password)))
+                db.session.commit()
+                invalidate_identity(user.id)
             login_user(user)
             flash('Login successful.', 'success')
             if user.role.name == 'admin':
@@ -121,6 +299,52 @@ def logout():
     flash('Logged out successfully.', 'success')
     return redirect(url_for('login'))
 
+def _enroll_cohort(course_ids, identifiers=(), role=None):
+    """Inscribe a todos los usuarios de `role` o a los estudiantes de `identifiers` en los cursos."""
+    if role:
+        result = enroll_students(course_ids, role=role)
+        result['unknown'] = []
+        return result
+    student_ids, unknown = resolve_students(identifiers)
+    result = enroll_students(course_ids, student_ids=student_ids)
+    result['unknown'] = unknown
+    return result
+
+def _json_payload():
+    payload = request.get_json(silent=True)
+    return payload if isinstance(payload, dict) else {}
+
+def _json_course_ids():
+    """Ids de curso del JSON (enteros o cadenas de dígitos); lista vacía si alguno no es válido."""
+    values = _json_payload().get('course_ids')
+    if not isinstance(values, list):
+        return []
+    if not all(isinstance(value, (int, str)) and not isinstance(value, bool) and str(value).strip().isdigit()
+               for value in values):
+        return []
+    return [int(value) for value in values]
+
+def _cohort_from_request():
+    """Lee de la petición (JSON o formulario con CSV opcional) los estudiantes y el rol a inscribir."""
+    if request.is_json:
+        payload = _json_payload()
+        students = payload.get('students')
+        role = payload.get('role')
+        return ([str(value) for value in students] if isinstance(students, list) else [],
+                role if isinstance(role, str) and role else None)
+    identifiers = parse_identifiers(request.form.get('students'))
+    file = request.files.get('file')
+    if file and file.filename:
+        identifiers += read_identifiers_csv(file.read())
+    return identifiers, request.form.get('role') or None
+
+def _flash_enrollment_result(result):
+    flash(f"Inscripciones nuevas: {result['enrolled']}. Ya estaban inscritos: {result['already_enrolled']}.", 'success')
+    if result['unknown']:
+        shown = ', '.join(result['unknown'][:10])
+        more = f" y {len(result['unknown']) - 10} más" if len(result['unknown']) > 10 else ''
+        flash(f'No se encontraron estudiantes: {shown}{more}.', 'warning')
+
 # -------------------- Rutas de Administrador -------------------- #
 
 @app.route('/admin/dashboard')
@@ -143,7 +367,7 @@ def register_user():
     if request.method == 'POST':
         username = request.form['username']
         email = request.form['email']
-        password = bcrypt.generate_password_hash(request.form['password']).decode('utf-8')
+        password = hash_password(request.form['password'])
         role_name = request.form['role']
         role = Role.query.filter_by(name=role_name).first()
         if not role:
@@ -157,20 +381,92 @@ def register_user():
     roles = Role.query.all()
     return render_template('admin/register_user.html', roles=roles)
 
+@app.route('/admin/import_users', methods=['GET', 'POST'])
+@login_required
+@role_required('admin')
+def import_users():
+    """Importación masiva de usuarios desde CSV como tarea en segundo plano."""
+    if request.method == 'POST':
+        file = request.files.get('file')
+        if not file or not file.filename.lower().endswith('.csv'):
+            flash('Selecciona un archivo CSV.', 'danger')
+            return redirect(url_for('import_users'))
+        import_id = save_import_file(file.read())
+        job = submit_job(app, 'import_users', run_import, import_id, owner_id=current_user.id)
+        flash(f'Importación iniciada (tarea {job.id}).', 'info')
+        return redirect(url_for('import_users', job=job.id))
+    return render_template('admin/import_users.html', job=get_job(request.args.get('job', '')))
+
+@app.route('/admin/import_users/<import_id>/passwords', methods=['GET'])
+@login_required
+@role_required('admin')
+def import_passwords(import_id):
+    """Descarga las contraseñas generadas durante una importación (una sola vez: luego se borran)."""
+    data = take_generated_passwords(import_id)
+    if data is None:
+        abort(404)
+    return send_file(io.BytesIO(data), mimetype='text/csv', as_attachment=True,
+                     download_name=f'contrasenas_{import_id[:8]}.csv')
+
+@app.route('/admin/enroll_students', methods=['GET', 'POST'])
+@login_required
+@role_required('admin')
+def admin_enroll_students():
+    """Inscripción masiva de una cohorte en uno o más cursos (formulario o JSON)."""
+    if request.method == 'POST':
+        if request.is_json:
+            # Ids no válidos ("abc", null...) se responden con el mismo error 400 que la falta de cursos
+            course_ids = _json_course_ids()
+        else:
+            course_ids = request.form.getlist('course_ids', type=int)
+        identifiers, role = _cohort_from_request()
+        if not course_ids or not (identifiers or role):
+            if request.is_json:
+                return jsonify({'error': 'Indica los cursos y los estudiantes o el rol.'}), 400
+            flash('Selecciona al menos un curso y los estudiantes o el rol a inscribir.', 'danger')
+            return redirect(url_for('admin_enroll_students'))
+        result = _enroll_cohort(course_ids, identifiers, role)
+        if request.is_json:
+            return jsonify(result)
+        _flash_enrollment_result(result)
+        return redirect(url_for('admin_enroll_students'))
+    courses = db.session.query(Course.id, Course.name).order_by(Course.name).all()
+    roles = Role.query.order_by(Role.name).all()
+    return render_template('admin/enroll_students.html', courses=courses, roles=roles)
+
 @app.route('/admin/view_users', methods=['GET', 'POST'])
 @login_required
 @role_required('admin')
 def view_users():
-    users = User.query.all()
+    role_name = request.args.get('role') or None
+    search = (request.args.get('q') or '').strip()
+    after = request.args.get('after', type=int)
+
+    # Filtros en el servidor con paginación por cursor (id) y el rol cargado en la misma consulta
+    query = User.query.options(joinedload(User.role)).order_by(User.id)
+    if role_name:
+        query = query.filter(User.role_id == db.select(Role.id).where(Role.name == role_name).scalar_subquery())
+    if search:
+        query = query.filter(db.or_(prefix_match(User.username, search), prefix_match(User.email, search)))
+    users, next_cursor = keyset_page(query, User.id, 'id', after=after, per_page=ADMIN_PAGE_SIZE)
+
     form = DeleteUserForm()  # Formulario con CSRF
-    return render_template('admin/view_users.html', users=users, form=form)
+    roles = Role.query.order_by(Role.name).all()
+    return render_template('admin/view_users.html', users=users, form=form, roles=roles,
+                           role=role_name, q=search, next_cursor=next_cursor)
 
 @app.route('/admin/manage_courses', methods=['GET', 'POST'])
 @login_required
 @role_required('admin')
 def manage_courses():
-    courses = Course.query.all()  # Obtén todos los cursos
-    return render_template('admin/manage_courses.html', courses=courses)
+    search = (request.args.get('q') or '').strip()
+    after = request.args.get('after', type=int)
+
+    query = Course.query.options(joinedload(Course.instructor)).order_by(Course.id)
+    if search:
+        query = query.filter(prefix_match(Course.name, search))
+    courses, next_cursor = keyset_page(query, Course.id, 'id', after=after, per_page=ADMIN_PAGE_SIZE)
+    return render_template('admin/manage_courses.html', courses=courses, q=search, next_cursor=next_cursor)
 
 @app.route('/admin/course/<int:course_id>', methods=['GET'])
 @login_required
@@ -197,6 +493,43 @@ def delete_user(user_id):
         flash('Token CSRF inválido o formulario no válido.', 'danger')
     return redirect(url_for('view_users'))
 
+@app.route('/admin/maintenance/recompute_progress', methods=['POST'])
+@login_required
+@role_required('admin')
+def recompute_progress():
+    """Lanza el recálculo de progreso de inscripciones en segundo plano."""
+    since = request.form.get('since')
+    try:
+        since = datetime.strptime(since, '%Y-%m-%d') if since else None
+    except ValueError:
+        flash('Invalid date format. Use YYYY-MM-DD.', 'danger')
+        return redirect(url_for('admin_dashboard'))
+
+    def run(job):
+        reconcile_course_content_counts()
+        return recompute_enrollment_progress(since=since, job=job)
+
+    job = submit_job(app, 'recompute_progress', run)
+    flash(f'Recálculo de progreso iniciado (tarea {job.id}).', 'info')
+    return redirect(url_for('admin_dashboard'))
+
+@app.route('/admin/fragment_cache', methods=['GET'])
+@login_required
+@role_required('admin')
+def fragment_cache():
+    """Aciertos, fallos y tamaño de la caché de fragmentos de este proceso en formato JSON."""
+    return jsonify(fragment_cache_stats())
+
+@app.route('/admin/jobs/<job_id>', methods=['GET'])
+@login_required
+@role_required('admin')
+def job_status(job_id):
+    """Estado de una tarea en segundo plano en formato JSON."""
+    job = get_job(job_id)
+    if not job:
+        abort(404)
+    return jsonify(job.to_dict())
+
 # -------------------- Rutas de Instructor -------------------- #
 
 # Panel principal del Instructor
@@ -205,79 +538,16 @@ def delete_user(user_id):
 @role_required('instructor')
 def instructor_dashboard():
     """Dashboard del instructor con comparación de cursos"""
-    # Obtiene todos los cursos del instructor
-    courses = Course.query.filter_by(instructor_id=current_user.id).all()
-
-    # Lista para almacenar métricas de los cursos
-    course_metrics = []
-
-    for course in courses:
-        # Total de estudiantes inscritos
-        total_students = len(course.enrollments)
-
-        # Variables para cálculo de métricas
-        total_scores = 0  # Suma de calificaciones
-        total_responses = 0  # Total de respuestas evaluadas
-        students_completed_course = 0  # Estudiantes que completaron todos los quizzes
-
-        # Total de quizzes en el curso
-        total_quizzes = sum(
-            1 for module in course.modules for content in module.content_items if content.type == 'quiz'
-        )
-
-        # Verificar progreso de cada estudiante
-        for enrollment in course.enrollments:
-            # Número de quizzes completados por el estudiante
-            completed_quizzes = db.session.query(
-                ContentItem.id
-            ).join(StudentResponse).filter(
-                StudentResponse.student_id == enrollment.student_id,
-                StudentResponse.completed == True,
-                ContentItem.module_id.in_([module.id for module in course.modules])
-            ).group_by(ContentItem.id).count()
-            # Aseguramos que no cuente duplicados
-
-            # Si el estudiante completó todos los quizzes del curso, cuenta como completado
-            if total_quizzes > 0 and completed_quizzes == total_quizzes:
-                students_completed_course += 1
-
-            # Calcular promedio de calificaciones
-            for response in enrollment.student.responses:
-                if (
-                    response.content_item
-                    and response.content_item.module
-                    and response.content_item.module.course_id == course.id
-                ):
-                    if response.score is not None:
-                        total_scores += response.score
-                        total_responses += 1
-
-        # Cálculo del promedio de calificaciones
-        average_score = (
-            round(total_scores / total_responses, 2) if total_responses > 0 else 0
-        )
-
-        # Cálculo del porcentaje de finalización
-        completion_rate = (
-            round((students_completed_course / total_students) * 100, 2)
-            if total_students > 0 else 0
-        )
-
-        # Agregar métricas a la lista
-        course_metrics.append({
-            'course': course,
-            'total_students': total_students,
-            'average_score': average_score,
-            'completion_rate': completion_rate
-        })
+    # Métricas materializadas de los cursos del instructor (una sola lectura indexada)
+    course_metrics = instructor_course_metrics(current_user.id)
 
     # Ordenar cursos por número de estudiantes, promedio de notas y porcentaje de finalización
     sorted_courses = sorted(
         course_metrics,
         key=lambda x: (
-            0.4 * x['total_students'] +
-            0.4 * x['average_score'] +
-            0.2 * x['completion_rate']
+            0.4 * x.total_students +
+            0.4 * x.average_score +
+            0.2 * x.completion_rate
         ),
         reverse=True
     )
@@ -285,7 +555,7 @@ def instructor_dashboard():
     # Renderizar el dashboard del instructor
     return render_template(
         'instructor/instructor_dashboard.html',
-        courses=courses,
+        courses=[metric.course for metric in course_metrics],
         course_metrics=sorted_courses
     )
 
@@ -384,27 +654,33 @@ def course_details(course_id):
         flash('No tienes permiso para acceder a este curso.', 'danger')
         return redirect(url_for('instructor_courses'))
 
-    # Recupera los módulos relacionados
-    modules = course.get_modules_sorted()
-
-    return render_template(
-        'instructor/course_details.html',
-        course=course,
-        modules=modules
-    )
+    # Índice de módulos cacheado por versión de contenidos del curso
+    outline = cached_fragment(('instructor_course', course.id), course, lambda: render_template(
+        'instructor/course_outline.html', course=course, modules=course.get_modules_sorted()
+    ))
+    return render_template('instructor/course_details.html', course=course, outline=outline)
 
 @app.route('/instructor/module/<int:module_id>', methods=['GET'])
 @login_required
 @role_required('instructor')
 def module_details(module_id):
     """Ver los detalles de un módulo específico."""
-    module = Module.query.get_or_404(module_id)
-    if module.course.instructor_id != current_user.id:
+    course_id = db.session.query(Module.course_id).filter(Module.id == module_id).scalar()
+    if course_id is None:
+        abort(404)
+    course = db.session.get(Course, course_id)
+    if course.instructor_id != current_user.id:
         flash('No tienes permiso para acceder a este módulo.', 'danger')
         return redirect(url_for('instructor_dashboard'))
 
+    def render():
+        module = db.session.get(Module, module_id)
+        return render_template('instructor/module_outline.html', module=module,
+                               content_items=module.get_content_items_sorted())
+
     # Los contenidos del módulo se mostrarán en esta vista.
-    return render_template('instructor/module_details.html', module=module)
+    outline = cached_fragment(('instructor_module', module_id), course, render)
+    return render_template('instructor/module_details.html', module_id=module_id, course=course, outline=outline)
 
 
 # Crear un nuevo módulo en un curso
@@ -426,8 +702,8 @@ def new_module(course_id):
             flash('Por favor, completa todos los campos.', 'danger')
             return redirect(url_for('new_module', course_id=course_id))
 
-        last_order = max([m.order for m in course.modules], default=0)
-        module = Module(title=title, description=description, order=last_order + 1, course_id=course.id)
+        module = Module(title=title, description=description, order=course.get_next_module_order(),
+                        course_id=course.id)
         db.session.add(module)
         db.session.commit()
         flash('Módulo creado exitosamente.', 'success')
@@ -476,51 +752,45 @@ def delete_module(module_id):
 @login_required
 @role_required('instructor')
 def instructor_courses_completed():
-    if request.method == 'POST':
-        start_date = request.form.get('start_date')
-        end_date = request.form.get('end_date')
-
+    start_date = request.values.get('start_date')
+    end_date = request.values.get('end_date')
+    if request.method == 'POST' or start_date or end_date:
         # Validate dates
         if not start_date or not end_date:
             flash('Please provide both start and end dates.', 'danger')
             return redirect(url_for('instructor_courses_completed'))
 
         try:
-            start_date = datetime.strptime(start_date, '%Y-%m-%d')
-            end_date = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+            start = datetime.strptime(start_date, '%Y-%m-%d')
+            end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
         except ValueError:
             flash('Invalid date format. Use YYYY-MM-DD.', 'danger')
             return redirect(url_for('instructor_courses_completed'))
 
-        # Query completed courses
-        completed_courses = Course.query.join(CourseEnrollment).filter(
-            Course.instructor_id == current_user.id,
-            CourseEnrollment.completed == True,
-            CourseEnrollment.completion_date.between(start_date, end_date)
-        ).all()
-
-        courses_with_modules = []
-        for course in completed_courses:
-            modules_data = []
-            for module in course.modules:
-                module_responses = StudentResponse.query.filter(
-                    StudentResponse.content_item_id.in_([item.id for item in module.content_items]),
-                    StudentResponse.completed == True
-                ).all()
-                for response in module_responses:
-                    modules_data.append({
-                        'module_title': module.title,
-                        'student_id': response.student_id,
-                        'completion_date': response.completion_date
-                    })
-            courses_with_modules.append({
-                'course': course,
-                'modules_data': modules_data
-            })
+        # Una sola consulta con joins para la vista HTML y las exportaciones
+        query = completed_courses_query(current_user.id, start, end)
+
+        export_format = request.values.get('format')
+        if export_format in ('csv', 'jsonl'):
+            filename = f'cursos_completados_{start_date}_{end_date}.{export_format}'
+            if export_format == 'csv':
+                rows, mimetype = stream_csv(query, COMPLETED_COURSES_COLUMNS), 'text/csv'
+            else:
+                rows, mimetype = stream_jsonl(query), 'application/x-ndjson'
+            return Response(
+                stream_with_context(rows),
+                mimetype=mimetype,
+                headers={'Content-Disposition': f'attachment; filename={filename}'}
+            )
+
+        # Paginación por cursor (id de la respuesta)
+        after = request.args.get('after', type=int)
+        rows, next_cursor = keyset_page(query, StudentResponse.id, 'response_id', after=after)
 
         return render_template(
             'instructor/courses_completed.html',
-            courses=courses_with_modules,
+            rows=rows,
+            next_cursor=next_cursor,
             start_date=start_date,
             end_date=end_date
         )
@@ -542,40 +812,25 @@ def instructor_modules_completed():
 
         try:
             start_date = datetime.strptime(start_date, '%Y-%m-%d')
-            end_date = datetime.strptime(end_date, '%Y-%m-%d')
+            end_date = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
         except ValueError:
             flash('Invalid date format. Use YYYY-MM-DD.', 'danger')
             return redirect(url_for('instructor_modules_completed'))
 
-        # Get completed modules within the date range
-        completed_modules = []
-        for module in Module.query.all():
-            # Check if all content items in the module are completed
-            module_content_ids = [item.id for item in module.content_items]
-            total_content = len(module_content_ids)
-            completed_content = StudentResponse.query.filter(
-                StudentResponse.content_item_id.in_(module_content_ids),
-                StudentResponse.completed == True
-            ).distinct(StudentResponse.content_item_id).count()
-
-            if total_content > 0 and completed_content == total_content:
-                last_completion_date = StudentResponse.query.filter(
-                    StudentResponse.content_item_id.in_(module_content_ids),
-                    StudentResponse.completed == True
-                ).order_by(StudentResponse.completion_date.desc()).first().completion_date
-
-                # Add the module to the list if within the date range
-                if start_date <= last_completion_date <= end_date:
-                    completed_modules.append({
-                        'module': module,
-                        'completion_date': last_completion_date
-                    })
+        # Finalizaciones de módulos del instructor en el rango (recorrido del índice instructor/fecha)
+        completed_modules = ModuleCompletion.query.options(
+            joinedload(ModuleCompletion.module).joinedload(Module.course)
+        ).filter(
+            ModuleCompletion.instructor_id == current_user.id,
+            ModuleCompletion.completed_at >= start_date,
+            ModuleCompletion.completed_at < end_date
+        ).order_by(ModuleCompletion.completed_at).all()
 
         return render_template(
             'instructor/modules_completed.html',
             modules=completed_modules,
             start_date=start_date,
-            end_date=end_date
+            end_date=end_date - timedelta(days=1)
         )
 
     return render_template('instructor/modules_completed_form.html')
@@ -591,6 +846,10 @@ def new_content(module_id):
         return redirect(url_for('instructor_courses'))
 
     if request.method == 'POST':
+        # Termina la transacción de lectura antes de recibir el cuerpo, que puede tardar minutos
+        db.session.rollback()
+        # Los archivos van directo a disco, así que esta ruta admite más que el límite general
+        request.max_content_length = app.config['MAX_UPLOAD_SIZE']
         title = request.form.get('title')
         content_type = request.form.get('content_type')
         text_content = request.form.get('text_content')
@@ -612,18 +871,16 @@ def new_content(module_id):
         elif content_type == 'video':
             content = video_url
         elif content_type == 'file' and file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(file_path)
+            # Se guarda por su hash: el mismo archivo subido varias veces ocupa espacio una sola vez
+            file_path = save_upload(file)
 
         # Guardar contenido en la base de datos
-        last_order = max([c.order for c in module.content_items], default=0)
         new_content = ContentItem(
             title=title,
             type=content_type,
             content=content,
             file_path=file_path,
-            order=last_order + 1,
+            order=module.get_next_content_order(),
             module_id=module_id
         )
         db.session.add(new_content)
@@ -671,6 +928,45 @@ def delete_content(content_id):
     return redirect(url_for('module_details', module_id=module_id))
 
 # Rutas relacionadas con quizzes
+def parse_question_pool(form):
+    """Lee del formulario cuántas preguntas se sortean por intento y si se estratifica por etiqueta.
+
+    Lanza ValueError si el número de preguntas no es un entero positivo.
+    """
+    value = (form.get('questions_per_attempt') or '').strip()
+    count = int(value) if value else None
+    if count is not None and count < 1:
+        raise ValueError('El número de preguntas por intento debe ser positivo.')
+    return count, bool(form.get('stratify_by_tag'))
+
+
+# Campos de pregunta del formulario de edición: questions[<id o new_N>][campo] y questions[...][options][<n>]
+QUESTION_FIELD = re.compile(r'^questions\[([^\]]+)\]\[(text|type|correct|tag|options)\](?:\[(\d+)\])?$')
+
+
+def parse_quiz_questions(form):
+    """Agrupa por pregunta los campos del formulario de edición de un quiz, en el orden del formulario.
+
+    Devuelve un OrderedDict {clave: {'text', 'type', 'correct', 'tag', 'options'}}, donde la clave es
+    el id de una pregunta existente o `new_N` para las añadidas.
+    """
+    questions = OrderedDict()
+    for name, value in form.items(multi=True):
+        match = QUESTION_FIELD.match(name)
+        if not match:
+            continue
+        key, field, index = match.groups()
+        question = questions.setdefault(key, {'text': '', 'type': 'multiple_choice', 'correct': None, 'tag': '', 'options': {}})
+        if field == 'options':
+            if index is not None:
+                question['options'][int(index)] = value
+        else:
+            question[field] = value
+    for question in questions.values():
+        question['options'] = [question['options'][index] for index in sorted(question['options'])]
+    return questions
+
+
 @app.route('/instructor/module/<int:module_id>/quiz/new', methods=['GET', 'POST'])
 @login_required
 @role_required('instructor')
@@ -683,20 +979,25 @@ def new_quiz(module_id):
             title = request.form.get('title')
             question_texts = request.form.getlist('questions[]')
             question_types = request.form.getlist('question_types[]')
+            question_tags = request.form.getlist('question_tags[]')
             options = request.form.to_dict(flat=False).get('options', {})
 
             if not title:
                 flash('El título del quiz es obligatorio.', 'danger')
                 return redirect(url_for('new_quiz', module_id=module_id))
 
+            try:
+                questions_per_attempt, stratify_by_tag = parse_question_pool(request.form)
+            except ValueError:
+                flash('El número de preguntas por intento debe ser un entero positivo.', 'danger')
+                return redirect(url_for('new_quiz', module_id=module_id))
+
             if not question_texts:
                 flash('Debe incluir al menos una pregunta.', 'danger')
                 return redirect(url_for('new_quiz', module_id=module_id))
 
-            next_order = module.get_next_content_order()
-            print(f"El siguiente número de orden es: {next_order}")
-
-            quiz = ContentItem(title=title, type='quiz', module_id=module.id, order=next_order)
+            quiz = ContentItem(title=title, type='quiz', module_id=module.id, order=module.get_next_content_order(),
+                               questions_per_attempt=questions_per_attempt, stratify_by_tag=stratify_by_tag)
             db.session.add(quiz)
             db.session.flush()
             print(f"Quiz creado con ID: {quiz.id}")
@@ -725,6 +1026,7 @@ def new_quiz(module_id):
                     question_type=question_type,
                     correct_answer=correct_answer or '',
                     options=options_json,
+                    tag=(question_tags[idx].strip() or None) if idx < len(question_tags) else None,
                     content_item_id=quiz.id
                 )
                 db.session.add(question)
@@ -764,55 +1066,78 @@ def edit_quiz(quiz_id):
                 flash('El título del quiz no puede estar vacío.', 'danger')
                 return render_template('instructor/edit_quiz.html', quiz=quiz)
 
-            quiz.title = title
-
-            # Procesar preguntas
-            existing_questions = {str(q.id): q for q in quiz.questions}
-            question_ids = request.form.getlist('question_ids[]')  # IDs de preguntas existentes
-            question_texts = request.form.getlist('questions[]')
-            question_types = request.form.getlist('question_types[]')
-            correct_answers = request.form.getlist('correct_answers[]')
-            options = request.form.to_dict(flat=False).get('options', {})
-
-            if not (len(question_texts) == len(question_types) == len(correct_answers)):
-                flash('Los datos de las preguntas no son consistentes.', 'danger')
+            try:
+                questions_per_attempt, stratify_by_tag = parse_question_pool(request.form)
+            except ValueError:
+                flash('El número de preguntas por intento debe ser un entero positivo.', 'danger')
                 return render_template('instructor/edit_quiz.html', quiz=quiz)
 
-            # Actualizar preguntas existentes y agregar nuevas
-            updated_questions = set()
-            for idx, question_text in enumerate(question_texts):
-                question_type = question_types[idx]
-                correct_answer = correct_answers[idx] if idx < len(correct_answers) else None
-                question_options = options.get(f'options[{idx + 1}]', [])
+            questions = parse_quiz_questions(request.form)
+            if not questions:
+                flash('Debe incluir al menos una pregunta.', 'danger')
+                return render_template('instructor/edit_quiz.html', quiz=quiz)
+            for number, question_data in enumerate(questions.values(), start=1):
+                if question_data['type'] == 'multiple_choice' and not question_data['options']:
+                    flash(f'La pregunta {number} requiere opciones.', 'danger')
+                    return render_template('instructor/edit_quiz.html', quiz=quiz)
 
-                question_id = question_ids[idx] if idx < len(question_ids) else None
+            previous_key = AnswerKey.compile(quiz)
+            quiz.title = title
+            quiz.questions_per_attempt, quiz.stratify_by_tag = questions_per_attempt, stratify_by_tag
 
-                if question_id and question_id in existing_questions:
-                    # Actualizar pregunta existente
-                    question = existing_questions[question_id]
-                    question.question_text = question_text
+            # Actualizar preguntas existentes y agregar nuevas
+            existing_questions = {str(q.id): q for q in quiz.questions}
+            for key, question_data in questions.items():
+                question_type = question_data['type']
+                question_options = json.dumps(question_data['options']) if question_type == 'multiple_choice' else None
+                if key in existing_questions:
+                    question = existing_questions.pop(key)
+                    question.question_text = question_data['text']
                     question.question_type = question_type
-                    question.correct_answer = correct_answer
-                    question.options = json.dumps(question_options) if question_type == 'multiple_choice' else None
-                    updated_questions.add(question_id)
+                    question.correct_answer = question_data['correct'] or ''
+                    question.options = question_options
+                    question.tag = question_data['tag'].strip() or None
                 else:
-                    # Crear nueva pregunta
-                    new_question = QuizQuestion(
-                        question_text=question_text,
+                    db.session.add(QuizQuestion(
+                        question_text=question_data['text'],
                         question_type=question_type,
-                        correct_answer=correct_answer,
-                        options=json.dumps(question_options) if question_type == 'multiple_choice' else None,
+                        correct_answer=question_data['correct'] or '',
+                        options=question_options,
+                        tag=question_data['tag'].strip() or None,
                         content_item_id=quiz.id
-                    )
-                    db.session.add(new_question)
+                    ))
 
-            # Eliminar preguntas que no fueron incluidas
-            for question_id, question in existing_questions.items():
-                if question_id not in updated_questions:
-                    db.session.delete(question)
+            # Eliminar las preguntas que se quitaron del formulario
+            for question in existing_questions.values():
+                db.session.delete(question)
+
+            db.session.flush()
+            new_key = AnswerKey.compile(quiz)
+            answers_changed = (
+                {q.id: q.answer for q in previous_key.questions} != {q.id: q.answer for q in new_key.questions}
+            )
+            if (previous_key.questions != new_key.questions
+                    or (previous_key.questions_per_attempt, previous_key.stratify_by_tag)
+                    != (new_key.questions_per_attempt, new_key.stratify_by_tag)):
+                quiz.version = (quiz.version or 0) + 1  # Invalida la clave de respuestas compilada
 
             db.session.commit()
+            invalidate_answer_key(quiz.id)
             flash('Quiz actualizado exitosamente.', 'success')
+
+            # Re-calificar en segundo plano los intentos existentes, solo si cambiaron las respuestas
+            if request.form.get('regrade'):
+                if not answers_changed:
+                    flash('Las respuestas correctas no cambiaron: no hay intentos que re-calificar.', 'info')
+                else:
+                    def run(job, quiz_id):
+                        try:
+                            return regrade_quiz(job, quiz_id)
+                        finally:
+                            invalidate_item_analysis(quiz_id)
+
+                    job = submit_job(app, 'regrade_quiz', run, quiz.id, owner_id=current_user.id)
+                    flash(f'Re-calificación iniciada (tarea {job.id}).', 'info')
             return redirect(url_for('list_quizzes', module_id=quiz.module_id))
 
         except Exception as e:
@@ -833,6 +1158,36 @@ def list_quizzes(module_id):
     return render_template('instructor/list_quizzes.html', module=module, quizzes=quizzes)
 
 
+@app.route('/instructor/quiz/<int:quiz_id>/analysis', methods=['GET'])
+@login_required
+@role_required('instructor')
+def quiz_analysis(quiz_id):
+    """Análisis de ítems de un quiz: dificultad, discriminación y distractores."""
+    quiz = ContentItem.query.get_or_404(quiz_id)
+    if quiz.type != 'quiz' or quiz.module.course.instructor_id != current_user.id:
+        flash('No tienes acceso a este quiz.', 'danger')
+        return redirect(url_for('instructor_courses'))
+
+    reports = [(quiz, quiz_item_analysis(quiz))]
+    return render_template('instructor/item_analysis.html', title=quiz.title, reports=reports,
+                           back_url=url_for('list_quizzes', module_id=quiz.module_id))
+
+
+@app.route('/instructor/course/<int:course_id>/analysis', methods=['GET'])
+@login_required
+@role_required('instructor')
+def course_analysis(course_id):
+    """Análisis de ítems de todos los quizzes de un curso."""
+    course = Course.query.get_or_404(course_id)
+    if course.instructor_id != current_user.id:
+        flash('No tienes acceso a este curso.', 'danger')
+        return redirect(url_for('instructor_dashboard'))
+
+    return render_template('instructor/item_analysis.html', title=course.name,
+                           reports=course_item_analysis(course.id),
+                           back_url=url_for('course_students', course_id=course.id))
+
+
 @app.route('/instructor/quiz/<int:quiz_id>/delete', methods=['POST'])
 @login_required
 @role_required('instructor')
@@ -853,6 +1208,7 @@ def delete_quiz(quiz_id):
         # Eliminar el quiz después de borrar las preguntas
         db.session.delete(quiz)
         db.session.commit()
+        invalidate_answer_key(quiz.id)
         flash('Quiz eliminado exitosamente.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -871,36 +1227,58 @@ def course_students(course_id):
         flash('No tienes acceso a este curso.', 'danger')
         return redirect(url_for('instructor_dashboard'))
 
-    # Obtener los estudiantes inscritos y sus calificaciones en quizzes
-    enrollments = CourseEnrollment.query.filter_by(course_id=course_id).all()
-    students_data = []
-
-    for enrollment in enrollments:
-        student = enrollment.student
-
-        # Obtener quizzes completados por el estudiante
-        completed_quizzes = StudentResponse.query.filter_by(
-            student_id=student.id,
-            completed=True
-        ).join(ContentItem).filter(
-            ContentItem.module.has(course_id=course_id),
-            ContentItem.type == 'quiz'
-        ).all()
-
-        # Preparar datos del estudiante y sus quizzes
-        quizzes = [
-            {'title': quiz.content_item.title, 'score': quiz.score}
-            for quiz in completed_quizzes
-        ]
-
-        students_data.append({
-            'student': student,
-            'quizzes': quizzes
-        })
+    # Estudiantes inscritos y su mejor intento en cada quiz (dos consultas en total)
+    enrollments = CourseEnrollment.query.filter_by(course_id=course_id).options(
+        joinedload(CourseEnrollment.student)
+    ).all()
+    quizzes_by_student = {}
+    for student_id, title, best_score, attempt_count, passed in db.session.query(
+        QuizAttemptSummary.student_id, ContentItem.title, QuizAttemptSummary.best_score,
+        QuizAttemptSummary.attempt_count, QuizAttemptSummary.passed,
+    ).join(ContentItem, ContentItem.id == QuizAttemptSummary.quiz_id).filter(
+        QuizAttemptSummary.course_id == course_id
+    ).order_by(QuizAttemptSummary.student_id, ContentItem.id):
+        quizzes_by_student.setdefault(student_id, []).append(
+            {'title': title, 'score': best_score, 'attempts': attempt_count, 'passed': passed}
+        )
+
+    students_data = [
+        {'student': enrollment.student, 'quizzes': quizzes_by_student.get(enrollment.student_id, [])}
+        for enrollment in enrollments
+    ]
 
     return render_template('instructor/course_students.html', course=course, students=students_data)
 
 
+@app.route('/instructor/course/<int:course_id>/enroll', methods=['POST'])
+@login_required
+@role_required('instructor')
+def instructor_enroll_students(course_id):
+    """Inscribe en bloque estudiantes en un curso del instructor (formulario o JSON)."""
+    course = Course.query.get_or_404(course_id)
+    if course.instructor_id != current_user.id:
+        abort(403)
+    identifiers, role = _cohort_from_request()
+    if role not in (None, 'student'):
+        abort(400)
+    result = _enroll_cohort([course.id], identifiers, role)
+    if request.is_json:
+        return jsonify(result)
+    _flash_enrollment_result(result)
+    return redirect(url_for('course_students', course_id=course.id))
+
+
+@app.route('/instructor/jobs/<job_id>', methods=['GET'])
+@login_required
+@role_required('instructor')
+def instructor_job_status(job_id):
+    """Estado de una tarea lanzada por el instructor en formato JSON."""
+    job = get_job(job_id)
+    if not job or job.owner_id != current_user.id:
+        abort(404)
+    return jsonify(job.to_dict())
+
+
 # -------------------- Rutas de Estudiante -------------------- #
 
 @app.route('/student/dashboard')
@@ -908,14 +1286,29 @@ def course_students(course_id):
 @role_required('student')
 def student_dashboard():
     """Panel principal del estudiante con sus cursos inscritos."""
-    enrollments = CourseEnrollment.query.filter_by(student_id=current_user.id).all()
-    
-    # Añadir progreso al contexto de los cursos
+    enrollments = CourseEnrollment.query.filter_by(student_id=current_user.id).options(
+        joinedload(CourseEnrollment.course)
+    ).all()
+
+    # Quizzes intentados y aprobados por curso, leídos de los resúmenes de intentos
+    quiz_totals = {
+        course_id: (attempted, passed or 0)
+        for course_id, attempted, passed in db.session.query(
+            QuizAttemptSummary.course_id,
+            db.func.count(),
+            db.func.sum(db.case((QuizAttemptSummary.passed == True, 1), else_=0)),
+        ).filter(QuizAttemptSummary.student_id == current_user.id).group_by(QuizAttemptSummary.course_id)
+    }
+
+    # Añadir progreso al contexto de los cursos, calculado con los contadores actuales: el
+    # guardado en la inscripción no cambia al añadir o quitar contenidos hasta el recálculo
     courses_with_progress = [
         {
             'course': enrollment.course,
-            'progress': enrollment.progress,
-            'completed': enrollment.completed
+            'progress': enrollment.get_progress(),
+            'completed': enrollment.get_progress() == 100,
+            'quizzes_attempted': quiz_totals.get(enrollment.course_id, (0, 0))[0],
+            'quizzes_passed': quiz_totals.get(enrollment.course_id, (0, 0))[1],
         }
         for enrollment in enrollments
     ]
@@ -926,9 +1319,21 @@ def student_dashboard():
 @role_required('student')
 def explore_courses():
     """Ver todos los cursos disponibles para inscripción."""
-    enrolled_courses = [enrollment.course_id for enrollment in current_user.enrollments]
-    available_courses = Course.query.filter(~Course.id.in_(enrolled_courses)).all()  # Cursos no inscritos
-    return render_template('student/explore_courses.html', courses=available_courses)
+    page = max(request.args.get('page', 1, type=int), 1)
+    # Catálogo cacheado menos los cursos inscritos (diferencia de conjuntos en memoria)
+    courses, has_next = available_courses(current_user.id, page=page)
+    return render_template('student/explore_courses.html', courses=courses, page=page, has_next=has_next)
+
+
+@app.route('/student/search')
+@login_required
+@role_required('student')
+def search_courses():
+    """Buscar en cursos, módulos y contenidos."""
+    query = (request.args.get('q') or '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    results, has_next = search(query, current_user.id, page=page) if query else ([], False)
+    return render_template('student/search.html', q=query, results=results, page=page, has_next=has_next)
 
 
 @app.route('/student/my_courses')
@@ -943,6 +1348,7 @@ def my_courses():
 @app.route('/student/courses/<int:course_id>', methods=['GET'])
 @login_required
 @role_required('student')
+@conditional_on_course
 def course_content(course_id):
     """Ver contenido de un curso inscrito."""
     course = Course.query.get_or_404(course_id)
@@ -951,31 +1357,39 @@ def course_content(course_id):
         flash('No estás inscrito en este curso.', 'danger')
         return redirect(url_for('student_dashboard'))
 
-    modules = course.get_modules_sorted()
-    return render_template('student/course_content.html', course=course, modules=modules)
+    # El índice es igual para todos los inscritos: se cachea por versión de contenidos del curso
+    outline = cached_fragment(('student_course', course.id), course, lambda: render_template(
+        'student/course_outline.html', course=course, modules=course.get_modules_sorted()
+    ))
+    return render_template('student/course_content.html', course=course, outline=outline)
 
 @app.route('/student/courses/<int:course_id>/modules/<int:module_id>', methods=['GET'])
 @login_required
 @role_required('student')
+@conditional_on_course
 def view_module_content(course_id, module_id):
     """Ver contenido de un módulo."""
-    module = Module.query.get_or_404(module_id)
-    if module.course_id != course_id:
-        flash('No tienes permiso para ver este contenido.', 'danger')
-        return redirect(url_for('student_dashboard'))
-
-    content_items = module.get_content_items_sorted()
+    course = Course.query.get_or_404(course_id)
 
-    # Depuración
-    for content in content_items:
-        print(content.title, content.type, content.content)  # Verifica los valores
+    def render():
+        module = Module.query.get_or_404(module_id)
+        if module.course_id != course_id:
+            return None
+        return render_template('student/module_outline.html', module=module,
+                               content_items=module.get_content_items_sorted())
 
-    return render_template('student/module_content.html', module=module, content_items=content_items)
+    # Con la caché caliente solo se lee la fila del curso
+    outline = cached_fragment(('student_module', module_id), course, render)
+    if outline is None:
+        flash('No tienes permiso para ver este contenido.', 'danger')
+        return redirect(url_for('student_dashboard'))
+    return render_template('student/module_content.html', outline=outline)
 
 
 @app.route('/student/courses/<int:course_id>/modules/<int:module_id>/content/<int:content_id>', methods=['GET'])
 @login_required
 @role_required('student')
+@conditional_on_course
 def content_view(course_id, module_id, content_id):
     """Ver un contenido específico del módulo."""
     content = ContentItem.query.get_or_404(content_id)
@@ -1001,59 +1415,61 @@ def take_quiz(quiz_id):
         flash('El contenido seleccionado no es un quiz.', 'danger')
         return redirect(url_for('student_dashboard'))
 
-    # Verificar si el estudiante ya obtuvo una nota mayor o igual a 7
-    existing_response = StudentResponse.query.filter_by(
-        student_id=current_user.id,
-        content_item_id=quiz_id
-    ).filter(StudentResponse.score >= 7).first()
+    if request.method == 'POST':
+        # Retirar el intento es la primera escritura: los límites se leen ya dentro de esa
+        # transacción, y dos envíos simultáneos no pueden saltárselos
+        attempt = claim_attempt(current_user.id, quiz.id)
 
-    if existing_response:
-        flash('Ya obtuviste una nota mayor o igual a 7 en este quiz. No puedes intentarlo nuevamente.', 'info')
+    # Aprobado previo, máximo de intentos y espera entre intentos (lectura por clave del resumen)
+    block_reason = attempt_block_reason(current_user.id, quiz_id)
+    if block_reason:
+        db.session.rollback()
+        flash(block_reason, 'info')
         return redirect(url_for('student_dashboard'))
 
-    if request.method == 'POST':
-        total_questions = len(quiz.questions)
-        correct_answers = 0
-
-        for question in quiz.questions:
-            student_answer = request.form.get(f'question_{question.id}')
-            print(f"Pregunta {question.id}: Respuesta del estudiante: {student_answer}")  # Depuración
-            if student_answer and question.is_answer_correct(student_answer):
-                correct_answers += 1
+    # Clave de respuestas compilada y cacheada (sin acceso al ORM por pregunta)
+    answer_key = get_answer_key(quiz)
 
-        # Calcular el puntaje
-        score = (correct_answers / total_questions) * 10
-        print(f"Puntaje obtenido: {score}")  # Depuración
+    if request.method == 'POST':
+        # Se califica con el sorteo y la clave fijados al empezar el intento
+        if attempt is None:
+            flash('El intento expiró. Vuelve a realizar el quiz.', 'warning')
+            return redirect(url_for('take_quiz', quiz_id=quiz.id))
+        seed, revision = attempt
+        if revision != answer_key.revision:
+            db.session.commit()
+            flash('El quiz se modificó mientras lo realizabas. Vuelve a realizarlo con las preguntas actuales.',
+                  'warning')
+            return redirect(url_for('take_quiz', quiz_id=quiz.id))
+        correct_answers, total_questions, score, graded = answer_key.draw(seed).grade(request.form)
 
-        # Guardar la respuesta del estudiante
+        # Guardar el intento y sus respuestas por pregunta (una inserción masiva)
         response = StudentResponse(
             student_id=current_user.id,
             content_item_id=quiz.id,
-            response=json.dumps(request.form),  # Guardar todas las respuestas como JSON
             score=score,
-            completed=True,
-            completion_date=datetime.utcnow()
+            seed=seed
         )
         db.session.add(response)
+        db.session.flush()
+        save_attempt_answers(response.id, graded)
 
-        # Actualizar progreso del curso
-        enrollment = CourseEnrollment.query.filter_by(
-            student_id=current_user.id, course_id=quiz.module.course.id
-        ).first()
-        if enrollment:
-            enrollment.update_progress()
-
+        # Marcar como completado y actualizar progreso del curso (contadores O(1))
+        response.mark_as_completed()
         db.session.commit()
 
         # Mostrar mensaje según el puntaje
-        if score >= 7:
+        if score >= QUIZ_PASSING_SCORE:
             flash('¡Felicidades! Has aprobado el curso y obtendrás tu certificado.', 'success')
         else:
             flash('No alcanzaste la nota mínima. Intenta nuevamente.', 'danger')
 
         return redirect(url_for('student_dashboard'))
 
-    return render_template('student/quiz.html', quiz=quiz)
+    # Empezar (o retomar) el intento: recargar la página no cambia las preguntas sorteadas
+    seed = start_attempt(current_user.id, answer_key)
+    db.session.commit()
+    return render_template('student/quiz.html', quiz=quiz, answer_key=answer_key.draw(seed))
 
 @app.route('/student/enroll/<int:course_id>', methods=['POST'])
 @login_required
@@ -1061,19 +1477,11 @@ def take_quiz(quiz_id):
 def enroll_course(course_id):
     """Permitir que el estudiante se inscriba en un curso."""
     course = Course.query.get_or_404(course_id)
-    enrollment = CourseEnrollment.query.filter_by(student_id=current_user.id, course_id=course_id).first()
-
-    if enrollment:
-        flash('Ya estás inscrito en este curso.', 'warning')
-    else:
-        new_enrollment = CourseEnrollment(
-            student_id=current_user.id,
-            course_id=course_id,
-            enrollment_date=datetime.utcnow()
-        )
-        db.session.add(new_enrollment)
-        db.session.commit()
+    # Inserción que ignora la inscripción existente: dos clics simultáneos no la duplican
+    if enroll_students([course.id], student_ids=[current_user.id])['enrolled']:
         flash(f'Te has inscrito exitosamente en el curso: {course.name}', 'success')
+    else:
+        flash('Ya estás inscrito en este curso.', 'warning')
 
     return redirect(url_for('student_dashboard'))
 
@@ -1100,37 +1508,7 @@ def loads_filter(value):
     except (TypeError, ValueError):
         return {}
 
-with app.app_context():
-    enrollments = CourseEnrollment.query.all()
-    for enrollment in enrollments:
-        # Recalcular progreso y marcar como completado si corresponde
-        total_content = sum(len(module.content_items) for module in enrollment.course.modules)
-        completed_content = StudentResponse.query.filter_by(student_id=enrollment.student_id, completed=True).count()
-        enrollment.progress = (completed_content / total_content) * 100 if total_content > 0 else 0
-
-        if enrollment.progress == 100:
-            enrollment.completed = True
-            enrollment.completion_date = datetime.utcnow()  # Establecer fecha actual como finalización
-        else:
-            enrollment.completed = False
-            enrollment.completion_date = None
-        db.session.commit()
-
-    print("Datos existentes actualizados correctamente.")
-
-def update_completion_dates():
-    # Obtener todas las inscripciones con progreso al 100% pero sin fecha de finalización
-    enrollments = CourseEnrollment.query.filter_by(completed=True, completion_date=None).all()
-    
-    for enrollment in enrollments:
-        # Calcular la fecha más reciente en las respuestas del estudiante
-        student_responses = StudentResponse.query.filter_by(student_id=enrollment.student_id).all()
-        if student_responses:
-            latest_completion_date = max([response.completion_date for response in student_responses if response.completed])
-            enrollment.completion_date = latest_completion_date or datetime.utcnow()
-            db.session.add(enrollment)
-        db.session.commit()
-
-
 if __name__ == '__main__':
+    with app.app_context():
+        init_db()
     app.run(debug=True)
\ No newline at end of file
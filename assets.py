@@ -0,0 +1,136 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import threading
+from flask import current_app, request, send_from_directory, url_for
+
+# Recursos estáticos con huella: `flask build-assets` compila el SCSS, copia cada archivo a
+# `static/dist` con el hash de su contenido en el nombre y genera versiones .gz y .br. El
+# manifiesto traduce el nombre lógico ("css/login.css") al publicado, que se sirve como inmutable.
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+# Carpetas de `static` que no son recursos publicables
+SOURCE_DIRS = ('sass', 'uploads', DIST_DIR)
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.map')
+ASSET_MAX_AGE = 365 * 24 * 3600
+_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_lock = threading.Lock()
+_manifest = None
+_manifest_mtime = None
+
+
+def _fingerprinted(name, data):
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+
+def _sources(static_folder):
+    """Recursos a publicar: los CSS compilados desde el SCSS y el resto de archivos estáticos."""
+    import sass  # Solo se necesita al compilar, no en tiempo de ejecución
+
+    sources = {}
+    for dirpath, dirnames, filenames in os.walk(static_folder):
+        relative_dir = os.path.relpath(dirpath, static_folder)
+        if relative_dir.split(os.sep)[0] in SOURCE_DIRS:
+            dirnames[:] = []
+            continue
+        for filename in filenames:
+            if filename.endswith('.map'):
+                continue
+            logical = os.path.normpath(os.path.join(relative_dir, filename)).replace(os.sep, '/')
+            with open(os.path.join(dirpath, filename), 'rb') as f:
+                sources[logical] = f.read()
+
+    sass_dir = os.path.join(static_folder, 'sass')
+    for filename in sorted(os.listdir(sass_dir)) if os.path.isdir(sass_dir) else ():
+        if filename.endswith('.scss') and not filename.startswith('_'):
+            css = sass.compile(filename=os.path.join(sass_dir, filename), output_style='compressed')
+            sources[f'css/{filename[:-5]}.css'] = css.encode('utf-8')
+    return sources
+
+
+def build_assets(static_folder):
+    """Compila, publica con huella y precomprime los recursos estáticos.
+
+    Reemplaza la carpeta `dist` y escribe su manifiesto. Devuelve el manifiesto generado.
+    """
+    import brotli  # Solo se necesita al compilar, no en tiempo de ejecución
+
+    dist = os.path.join(static_folder, DIST_DIR)
+    staging = dist + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    manifest = {}
+    for logical, data in sorted(_sources(static_folder).items()):
+        published = _fingerprinted(logical, data)
+        target = os.path.join(staging, published)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+        if published.endswith(COMPRESSIBLE):
+            with open(target + '.gz', 'wb') as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            with open(target + '.br', 'wb') as f:
+                f.write(brotli.compress(data, quality=11))
+        manifest[logical] = published
+    with open(os.path.join(staging, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    shutil.rmtree(dist, ignore_errors=True)
+    os.replace(staging, dist)
+    return manifest
+
+
+def _manifest_path():
+    return os.path.join(current_app.static_folder, DIST_DIR, MANIFEST_NAME)
+
+
+def manifest_version():
+    """Marca de la última compilación de recursos (None sin compilar); cambia las URLs con huella."""
+    try:
+        return os.path.getmtime(_manifest_path())
+    except OSError:
+        return None
+
+
+def _load_manifest():
+    """Manifiesto en memoria, recargado si `build-assets` lo reescribió."""
+    global _manifest, _manifest_mtime
+    path = _manifest_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    with _lock:
+        if _manifest is None or mtime != _manifest_mtime:
+            with open(path, encoding='utf-8') as f:
+                _manifest, _manifest_mtime = json.load(f), mtime
+        return _manifest
+
+
+def asset_url(filename):
+    """URL de un recurso estático con huella; sin compilar, la URL normal de `static`."""
+    published = _load_manifest().get(filename)
+    if published is None:
+        return url_for('static', filename=filename)
+    return url_for('asset', filename=published)
+
+
+def send_asset(filename):
+    """Sirve un recurso con huella, precomprimido si el cliente lo acepta, e inmutable."""
+    dist = os.path.join(current_app.static_folder, DIST_DIR)
+    accepted = request.accept_encodings
+    for encoding, suffix in _ENCODINGS:
+        if accepted[encoding] and os.path.isfile(os.path.join(dist, filename + suffix)):
+            response = send_from_directory(dist, filename + suffix, max_age=ASSET_MAX_AGE,
+                                           mimetype=mimetypes.guess_type(filename)[0])
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(dist, filename, max_age=ASSET_MAX_AGE)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,76 @@
+import threading
+import time
+from flask import current_app
+from models import db, Course, CourseEnrollment
+
+# Instantánea en memoria del catálogo de cursos (igual para todos los estudiantes)
+_lock = threading.Lock()
+_snapshot = None
+_loaded_at = 0.0
+# Se incrementa con cada invalidación: una lectura que empezó antes no guarda su instantánea
+_generation = 0
+
+
+def _load_snapshot():
+    """Lee solo los campos que muestra la plantilla del catálogo."""
+    rows = db.session.query(Course.id, Course.name, Course.description).order_by(Course.id).all()
+    return tuple({'id': course_id, 'name': name, 'description': description} for course_id, name, description in rows)
+
+
+def get_catalog():
+    """Devuelve el catálogo cacheado, recargándolo si fue invalidado o expiró su TTL.
+
+    El TTL acota el tiempo que otros procesos pueden servir un catálogo desactualizado,
+    ya que la invalidación solo afecta al proceso que hizo el cambio.
+    """
+    global _snapshot, _loaded_at
+    ttl = current_app.config.get('CATALOG_CACHE_TTL', 60)
+    with _lock:
+        if _snapshot is not None and time.monotonic() - _loaded_at < ttl:
+            return _snapshot
+        generation = _generation
+    snapshot = _load_snapshot()
+    with _lock:
+        if generation == _generation:
+            _snapshot, _loaded_at = snapshot, time.monotonic()
+    return snapshot
+
+
+def invalidate_catalog():
+    global _snapshot, _generation
+    with _lock:
+        _snapshot = None
+        _generation += 1
+
+
+def available_courses(student_id, page=1, per_page=24):
+    """Cursos del catálogo en los que el estudiante no está inscrito, paginados.
+
+    La exclusión se hace como diferencia de conjuntos en memoria sobre la instantánea.
+    Devuelve la lista de cursos de la página y si existe una página siguiente.
+    """
+    enrolled = {
+        course_id for (course_id,) in
+        db.session.query(CourseEnrollment.course_id).filter(CourseEnrollment.student_id == student_id)
+    }
+    courses = [course for course in get_catalog() if course['id'] not in enrolled]
+    start = (page - 1) * per_page
+    return courses[start:start + per_page], len(courses) > start + per_page
+
+
+@db.event.listens_for(db.session, 'after_flush')
+def _mark_catalog_changes(session, flush_context):
+    changed = (session.new | session.dirty | session.deleted)
+    if any(isinstance(obj, Course) for obj in changed):
+        session.info['catalog_changed'] = True
+
+
+@db.event.listens_for(db.session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('catalog_changed', False):
+        invalidate_catalog()
+
+
+@db.event.listens_for(db.session, 'after_rollback')
+def _discard_catalog_changes(session):
+    session.info.pop('catalog_changed', False)
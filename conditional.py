@@ -0,0 +1,57 @@
+import hashlib
+from functools import wraps
+from flask import request, session, make_response
+from flask_login import current_user
+from models import db, Course, CourseEnrollment
+from assets import manifest_version
+
+# Peticiones condicionales para las páginas de estudiante de un curso. Su HTML solo depende de
+# la versión de contenidos del curso (que suben los eventos de módulos, contenidos y preguntas),
+# del estudiante y de su inscripción, así que con una consulta por clave se decide si el
+# navegador ya tiene la página y se responde 304 sin consultar módulos ni renderizar plantillas.
+
+
+def course_stamp(course_id, student_id):
+    """(versión, fecha de modificación, inscripción, completado) del curso, o None si no existe."""
+    return db.session.query(
+        Course.content_version, Course.updated_at, CourseEnrollment.id, CourseEnrollment.completed
+    ).outerjoin(CourseEnrollment, db.and_(
+        CourseEnrollment.course_id == Course.id, CourseEnrollment.student_id == student_id
+    )).filter(Course.id == course_id).first()
+
+
+def course_etag(stamp, student_id):
+    version, _, enrollment_id, completed = stamp
+    key = f'{version}:{student_id}:{enrollment_id}:{completed}:{manifest_version()}'
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def conditional_on_course(view):
+    """Responde 304 a una vista GET de estudiante con `course_id` si su ETag débil no cambió.
+
+    El 304 se decide solo por el ETag: `Last-Modified` se envía como referencia, pero no
+    refleja los cambios de inscripción y por eso no se usa `If-Modified-Since`. Las respuestas
+    que no son 200 (redirecciones) y las que llevan mensajes flash pendientes no se etiquetan.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        stamp = course_stamp(kwargs['course_id'], current_user.id)
+        if stamp is None or '_flashes' in session:
+            return view(*args, **kwargs)
+        etag = course_etag(stamp, current_user.id)
+
+        if request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        if stamp.updated_at is not None:
+            response.last_modified = stamp.updated_at
+        # Cada visita se revalida, pero el navegador reutiliza su copia si no cambió
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+        return response
+    return wrapper
@@ -6,6 +6,33 @@ class Config:
     SQLALCHEMY_DATABASE_URI = 'sqlite:///cursos.db'  # Asegúrate de que el URI esté correcto
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     WTF_CSRF_ENABLED = False  
-
-
-
+    CATALOG_CACHE_TTL = 60  # Segundos que se reutiliza el catálogo de cursos en memoria
+    QUIZ_KEY_CACHE_SIZE = 256  # Número máximo de claves de respuestas compiladas en memoria
+    ITEM_ANALYSIS_CACHE_SIZE = 128  # Número máximo de informes de análisis de ítems en memoria
+    FRAGMENT_CACHE_SIZE = 512  # Número máximo de fragmentos HTML (índices de cursos y módulos) en memoria
+    QUIZ_MAX_ATTEMPTS = None  # Intentos permitidos por quiz (None: sin límite)
+    QUIZ_ATTEMPT_COOLDOWN = 0  # Segundos de espera entre intentos de un mismo quiz
+    IDENTITY_CACHE_TTL = 30  # Segundos que se reutiliza en memoria el usuario autenticado y su rol
+    IDENTITY_CACHE_SIZE = 1024  # Número máximo de usuarios en la caché de identidades
+    BCRYPT_LOG_ROUNDS = 12  # Coste de bcrypt (ver `flask --app app benchmark-bcrypt`); los hashes se actualizan al iniciar sesión
+    PASSWORD_HASH_WORKERS = 4  # Hilos dedicados a hashear y verificar contraseñas
+    PASSWORD_HASH_QUEUE = 16  # Verificaciones en espera antes de responder 503
+    PASSWORD_HASH_TIMEOUT = 10  # Segundos máximos de espera por una verificación
+    JOB_RESULT_TTL = 3600  # Segundos que se conserva el estado de una tarea en segundo plano terminada
+    JOB_HISTORY_LIMIT = 200  # Tareas terminadas que se conservan como máximo en memoria
+    IMPORT_PASSWORDS_MAX_AGE = 24 * 3600  # Segundos que se conservan sin descargar las contraseñas generadas de una importación
+    MAX_UPLOAD_SIZE = 2 * 1024 * 1024 * 1024  # Tamaño máximo de un archivo subido como contenido (bytes)
+    UPLOAD_CACHE_MAX_AGE = 365 * 24 * 3600  # Caché de los archivos subidos (su URL incluye el hash del contenido)
+    UPLOAD_ACCEL_REDIRECT = None  # Prefijo de una location interna de nginx para X-Accel-Redirect (None: desactivado)
+    USE_X_SENDFILE = False  # Delegar el envío de archivos con X-Sendfile (Apache mod_xsendfile, lighttpd)
+    SQLITE_PROFILE = True  # Perfil de producción de SQLite: WAL, pragmas y pool de solo lectura (ver sqlite_profile.py)
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',  # Con WAL solo se sincroniza en los checkpoints; no corrompe la base de datos
+        'cache_size': -64000,  # Caché de páginas por conexión, en KiB (negativo)
+        'mmap_size': 268435456,  # Bytes de la base de datos leídos con mmap
+        'busy_timeout': 5000,  # Milisegundos esperando el bloqueo de escritura antes de fallar
+        'foreign_keys': 'ON',
+        'temp_store': 'MEMORY',
+    }
+    SQLITE_READ_POOL_SIZE = 8  # Conexiones de solo lectura
@@ -0,0 +1,112 @@
+import csv
+import io
+import re
+from datetime import datetime
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, User, Role, Course, CourseEnrollment, CourseMetrics, scores_in_course
+
+# Estudiantes por sentencia al inscribir o resolver identificadores
+ENROLL_CHUNK_SIZE = 500
+
+
+def parse_identifiers(text):
+    """Separa una lista de nombres de usuario o correos (por líneas, comas o espacios)."""
+    return [value for value in re.split(r'[\s,;]+', text or '') if value]
+
+
+def read_identifiers_csv(data):
+    """Identificadores de un CSV: su columna `username` o `email`, o la primera columna."""
+    rows = list(csv.reader(io.StringIO(data.decode('utf-8-sig'))))
+    if not rows:
+        return []
+    header = [column.strip().lower() for column in rows[0]]
+    for name in ('username', 'email'):
+        if name in header:
+            index = header.index(name)
+            return [row[index].strip() for row in rows[1:] if len(row) > index and row[index].strip()]
+    return [row[0].strip() for row in rows if row and row[0].strip()]
+
+
+def resolve_students(identifiers):
+    """Busca estudiantes por nombre de usuario o correo con consultas por bloques.
+
+    Devuelve (ids encontrados, identificadores que no son de ningún estudiante).
+    """
+    identifiers = list(dict.fromkeys(identifiers))
+    student_role = db.select(Role.id).where(Role.name == 'student').scalar_subquery()
+    found, ids = set(), set()
+    for start in range(0, len(identifiers), ENROLL_CHUNK_SIZE):
+        chunk = identifiers[start:start + ENROLL_CHUNK_SIZE]
+        for user_id, username, email in db.session.query(User.id, User.username, User.email).filter(
+            User.role_id == student_role, db.or_(User.username.in_(chunk), User.email.in_(chunk))
+        ):
+            ids.add(user_id)
+            found.update((username, email))
+    return sorted(ids), [value for value in identifiers if value not in found]
+
+
+def _insert_enrollments(connection, course_id, students, now):
+    """Inscribe a los usuarios de la subconsulta `students` en el curso con una sola sentencia.
+
+    Las inscripciones existentes se omiten gracias al índice único (estudiante, curso), por lo
+    que dos inscripciones simultáneas no pueden duplicarse. Devuelve las filas insertadas.
+    """
+    table = CourseEnrollment.__table__
+    columns = ['student_id', 'course_id', 'enrollment_date', 'completed', 'progress', 'completed_items']
+    rows = db.select(
+        students.c.id, db.literal(course_id), db.literal(now, table.c.enrollment_date.type),
+        db.literal(False), db.literal(0.0), db.literal(0),
+    ).where(students.c.id.isnot(None))  # SQLite exige un WHERE antes de ON CONFLICT en un INSERT ... SELECT
+    dialect = {'sqlite': sqlite, 'postgresql': postgresql}.get(connection.dialect.name)
+    if dialect is not None:
+        statement = dialect.insert(table).from_select(columns, rows).on_conflict_do_nothing(
+            index_elements=[table.c.student_id, table.c.course_id]
+        )
+    else:
+        statement = db.insert(table).from_select(columns, rows.where(~db.exists().where(
+            table.c.student_id == students.c.id, table.c.course_id == course_id
+        )))
+    return connection.execute(statement).rowcount
+
+
+def enroll_students(course_ids, student_ids=None, role=None):
+    """Inscribe en bloque una lista de estudiantes, o a todos los usuarios de un rol, en los cursos.
+
+    Cada curso se procesa con un INSERT ... SELECT que ignora las inscripciones existentes.
+    Como las inserciones masivas no disparan los eventos de métricas, el total de estudiantes
+    y las notas de cada curso se actualizan aquí en la misma transacción. Devuelve los contadores de
+    inscripciones nuevas y ya existentes.
+    """
+    course_ids = [course_id for (course_id,) in db.session.query(Course.id).filter(Course.id.in_(course_ids))]
+    if role is not None:
+        users = db.select(User.id).join(Role, Role.id == User.role_id).where(Role.name == role)
+        chunks = [users]
+        requested = db.session.execute(db.select(db.func.count()).select_from(users.subquery())).scalar()
+    else:
+        student_ids = sorted(set(student_ids or ()))
+        chunks = [
+            db.select(User.id).where(User.id.in_(student_ids[start:start + ENROLL_CHUNK_SIZE]))
+            for start in range(0, len(student_ids), ENROLL_CHUNK_SIZE)
+        ]
+        requested = len(student_ids)
+
+    connection = db.session.connection()
+    metrics = CourseMetrics.__table__
+    now = datetime.utcnow()
+    enrolled = 0
+    for course_id in course_ids:
+        added = sum(_insert_enrollments(connection, course_id, users.subquery(), now) for users in chunks)
+        if added:
+            # Las notas previas de los estudiantes que se vuelven a inscribir cuentan de nuevo
+            score_sum, score_count = scores_in_course(course_id)
+            connection.execute(metrics.update().where(metrics.c.course_id == course_id).values(
+                total_students=metrics.c.total_students + added, score_sum=score_sum, score_count=score_count,
+                updated_at=now
+            ))
+        enrolled += added
+    db.session.commit()
+    return {
+        'courses': len(course_ids),
+        'enrolled': enrolled,
+        'already_enrolled': requested * len(course_ids) - enrolled,
+    }
@@ -0,0 +1,43 @@
+import threading
+from collections import OrderedDict
+from flask import current_app
+from markupsafe import Markup
+
+# Caché LRU de fragmentos HTML (índices de cursos y listados de módulos), indexada por nombre
+# del fragmento y validada con la versión de contenidos del curso al que pertenece y la fecha de
+# su último cambio (un curso creado con el id de otro borrado puede repetir su versión).
+# Un acierto solo lee la fila del curso; los módulos y contenidos se consultan al renderizar de nuevo.
+_lock = threading.Lock()
+_fragments = OrderedDict()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def cached_fragment(key, course, render):
+    """Devuelve el fragmento `key` del curso, renderizándolo solo si cambió su versión.
+
+    `render()` devuelve el HTML, o None si el fragmento no existe (no se guarda).
+    """
+    stamp = (course.id, course.content_version, course.updated_at)
+    with _lock:
+        entry = _fragments.get(key)
+        if entry is not None and entry[:3] == stamp:
+            _fragments.move_to_end(key)
+            _stats['hits'] += 1
+            return entry[3]
+        _stats['misses'] += 1
+    html = render()
+    if html is None:
+        return None
+    html = Markup(html)
+    max_size = current_app.config.get('FRAGMENT_CACHE_SIZE', 512)
+    with _lock:
+        _fragments[key] = stamp + (html,)
+        _fragments.move_to_end(key)
+        while len(_fragments) > max_size:
+            _fragments.popitem(last=False)
+    return html
+
+
+def fragment_cache_stats():
+    with _lock:
+        return dict(_stats, size=len(_fragments))
@@ -0,0 +1,335 @@
+import json
+import random
+import threading
+from collections import OrderedDict, namedtuple
+from operator import attrgetter
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.dialects import postgresql, sqlite
+from models import (db, Module, ContentItem, QuizQuestion, StudentResponse, AttemptAnswer, QuizAttemptSummary,
+                    PendingQuizAttempt, QUIZ_PASSING_SCORE)
+from progress import recompute_enrollment_progress
+from metrics import refresh_course_metrics
+
+# Intentos re-calificados por lote
+REGRADE_BATCH_SIZE = 1000
+
+CompiledQuestion = namedtuple('CompiledQuestion', ['id', 'question_text', 'question_type', 'options', 'answer', 'tag'])
+
+
+def normalize_answer(value):
+    """Normaliza una respuesta para compararla (igual que `QuizQuestion.is_answer_correct`)."""
+    return str(value).strip().lower()
+
+
+def _parse_options(options):
+    try:
+        return tuple(json.loads(options)) if options else ()
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Error al procesar las opciones: {e}")
+
+
+class AnswerKey:
+    """Clave de respuestas compilada de un quiz: respuestas normalizadas y opciones ya parseadas."""
+
+    def __init__(self, quiz_id, version, revision, questions, questions_per_attempt=None, stratify_by_tag=False):
+        self.quiz_id = quiz_id
+        self.version = version
+        self.revision = revision
+        self.questions = tuple(questions)
+        self.questions_per_attempt = questions_per_attempt
+        self.stratify_by_tag = stratify_by_tag
+        # Estratos por etiqueta, calculados una vez por versión para que el sorteo no recorra el banco
+        self.strata = _group_by_tag(self.questions) if stratify_by_tag else None
+
+    @classmethod
+    def compile(cls, quiz):
+        rows = db.session.query(
+            QuizQuestion.id, QuizQuestion.question_text, QuizQuestion.question_type,
+            QuizQuestion.options, QuizQuestion.correct_answer, QuizQuestion.tag
+        ).filter(QuizQuestion.content_item_id == quiz.id).order_by(QuizQuestion.id)
+        return cls(quiz.id, quiz.version, quiz.revision, (
+            CompiledQuestion(
+                question_id, question_text, question_type, _parse_options(options),
+                normalize_answer(correct_answer), tag or ''
+            )
+            for question_id, question_text, question_type, options, correct_answer, tag in rows
+        ), quiz.questions_per_attempt, quiz.stratify_by_tag)
+
+    @property
+    def is_pool(self):
+        """Indica si cada intento usa solo una parte del banco de preguntas."""
+        return bool(self.questions_per_attempt) and self.questions_per_attempt < len(self.questions)
+
+    def draw(self, seed):
+        """Devuelve la clave con las preguntas sorteadas para la semilla del intento.
+
+        El sorteo es reproducible (mismo resultado para la misma semilla y versión) y su
+        coste depende del número de preguntas sorteadas, no del tamaño del banco.
+        """
+        if not self.is_pool:
+            return self
+        rng = random.Random(seed)
+        count = self.questions_per_attempt
+        if self.strata:
+            drawn = _stratified_sample(rng, self.strata, count, len(self.questions))
+        else:
+            drawn = rng.sample(self.questions, count)
+        return AnswerKey(self.quiz_id, self.version, self.revision, sorted(drawn, key=attrgetter('id')))
+
+    def grade(self, answers):
+        """Califica un envío en una sola pasada.
+
+        Devuelve (correctas, total, nota sobre 10, respuestas), donde respuestas es una
+        lista de (id de pregunta, respuesta elegida, es correcta) lista para insertar.
+        """
+        correct = 0
+        graded = []
+        for question in self.questions:
+            answer = answers.get(f'question_{question.id}')
+            is_correct = bool(answer) and normalize_answer(answer) == question.answer
+            if is_correct:
+                correct += 1
+            graded.append((question.id, answer, is_correct))
+        total = len(self.questions)
+        score = (correct / total) * 10 if total > 0 else 0
+        return correct, total, score, graded
+
+
+def _group_by_tag(questions):
+    strata = OrderedDict()
+    for question in questions:
+        strata.setdefault(question.tag, []).append(question)
+    return tuple((tag, tuple(items)) for tag, items in strata.items())
+
+
+def _stratified_sample(rng, strata, count, total):
+    """Sorteo proporcional al tamaño de cada estrato (método del mayor resto)."""
+    quotas = [count * len(items) // total for _, items in strata]
+    remainders = sorted(
+        range(len(strata)), key=lambda index: (-(count * len(strata[index][1]) % total), index)
+    )
+    for index in remainders[:count - sum(quotas)]:
+        quotas[index] += 1
+    drawn = []
+    for (_, items), quota in zip(strata, quotas):
+        drawn.extend(rng.sample(items, quota))
+    return drawn
+
+
+def new_attempt_seed():
+    """Semilla aleatoria para el sorteo de preguntas de un intento."""
+    return random.SystemRandom().getrandbits(31)
+
+
+def start_attempt(student_id, answer_key):
+    """Devuelve la semilla del intento en curso del estudiante, empezándolo si hace falta.
+
+    El intento se guarda en la base de datos con la revisión de la clave mostrada: recargar la
+    página no cambia el sorteo y el envío se califica con las mismas preguntas. Un intento
+    empezado con una revisión anterior se reemplaza. No hace commit: lo hace quien llama.
+    """
+    table = PendingQuizAttempt.__table__
+    key = (table.c.student_id == student_id, table.c.quiz_id == answer_key.quiz_id)
+    values = {
+        'seed': new_attempt_seed() if answer_key.is_pool else None,
+        'revision': answer_key.revision,
+        'started_at': datetime.utcnow(),
+    }
+    connection = db.session.connection()
+    dialect = {'sqlite': sqlite, 'postgresql': postgresql}.get(connection.dialect.name)
+    if dialect is not None:
+        # Dos cargas simultáneas de la misma revisión conservan la primera semilla
+        statement = dialect.insert(table).values(student_id=student_id, quiz_id=answer_key.quiz_id, **values)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.student_id, table.c.quiz_id], set_=values,
+            where=table.c.revision != answer_key.revision,
+        ))
+    elif not db.session.execute(
+        table.update().where(*key, table.c.revision != answer_key.revision).values(**values)
+    ).rowcount and db.session.execute(db.select(table.c.seed).where(*key)).first() is None:
+        db.session.execute(table.insert().values(student_id=student_id, quiz_id=answer_key.quiz_id, **values))
+    return db.session.execute(db.select(table.c.seed).where(*key)).scalar()
+
+
+def claim_attempt(student_id, quiz_id):
+    """Retira el intento en curso para calificarlo y devuelve (semilla, revisión), o None si no hay.
+
+    El borrado y la lectura son una sola sentencia: dos envíos simultáneos no califican el
+    mismo intento dos veces.
+    """
+    table = PendingQuizAttempt.__table__
+    return db.session.execute(db.delete(table).where(
+        table.c.student_id == student_id, table.c.quiz_id == quiz_id
+    ).returning(table.c.seed, table.c.revision)).first()
+
+
+def save_attempt_answers(response_id, graded):
+    """Guarda las respuestas de un intento con una única inserción masiva.
+
+    Se inserta sobre la tabla: la inserción masiva del ORM agrupa aparte las filas con la
+    respuesta en blanco (None) y haría dos sentencias.
+    """
+    if graded:
+        db.session.execute(AttemptAnswer.__table__.insert(), [
+            {'response_id': response_id, 'question_id': question_id, 'answer': answer, 'is_correct': is_correct}
+            for question_id, answer, is_correct in graded
+        ])
+
+
+def regrade_quiz(job, quiz_id):
+    """Re-califica los intentos guardados del quiz con su clave de respuestas actual.
+
+    Recorre los intentos por lotes ordenados por id, recalcula cada respuesta y escribe
+    solo los aciertos y notas que cambian con actualizaciones masivas. Cada intento se
+    califica sobre sus respuestas guardadas a preguntas que siguen existiendo (las que se le
+    mostraron), no sobre el número actual de preguntas; los intentos sin ninguna se dejan
+    como están. Al terminar incrementa `grading_revision` del quiz para que todos los
+    procesos descarten sus análisis de ítems. Devuelve el número de notas modificadas. Un
+    quiz sin preguntas no se re-califica: dejaría todas las notas en cero.
+    """
+    quiz = db.session.get(ContentItem, quiz_id)
+    if quiz is None:
+        return 0
+    answer_key = AnswerKey.compile(quiz)
+    expected = {question.id: question.answer for question in answer_key.questions}
+    if not expected:
+        return 0
+
+    # Los intentos posteriores al inicio ya se califican con la clave nueva
+    total, last_id = db.session.query(
+        db.func.count(StudentResponse.id), db.func.max(StudentResponse.id)
+    ).filter(StudentResponse.content_item_id == quiz_id).one()
+    job.report(0, total)
+
+    done = changed = 0
+    after = 0
+    while total:
+        batch = db.session.query(StudentResponse.id, StudentResponse.score).filter(
+            StudentResponse.content_item_id == quiz_id,
+            StudentResponse.id > after,
+            StudentResponse.id <= last_id,
+        ).order_by(StudentResponse.id).limit(REGRADE_BATCH_SIZE).all()
+        if not batch:
+            break
+
+        correct, asked = {}, {}
+        answer_changes = []
+        for answer_id, response_id, question_id, answer, is_correct in db.session.query(
+            AttemptAnswer.id, AttemptAnswer.response_id, AttemptAnswer.question_id,
+            AttemptAnswer.answer, AttemptAnswer.is_correct,
+        ).filter(AttemptAnswer.response_id.in_([response_id for response_id, _ in batch])):
+            correct.setdefault(response_id, 0)
+            if question_id not in expected:
+                continue
+            asked[response_id] = asked.get(response_id, 0) + 1
+            now_correct = bool(answer) and normalize_answer(answer) == expected[question_id]
+            correct[response_id] += now_correct
+            if now_correct != is_correct:
+                answer_changes.append({'id': answer_id, 'is_correct': now_correct})
+
+        score_changes = []
+        for response_id, score in batch:
+            if response_id not in correct:
+                continue
+            # Cada intento se califica sobre las preguntas que respondió (las guardadas que siguen existiendo)
+            questions = asked.get(response_id, 0)
+            if not questions:
+                continue
+            new_score = (correct[response_id] / questions) * 10
+            if score is None or round(score, 6) != round(new_score, 6):
+                score_changes.append({'id': response_id, 'score': new_score})
+
+        if answer_changes:
+            db.session.execute(db.update(AttemptAnswer), answer_changes)
+        if score_changes:
+            db.session.execute(db.update(StudentResponse), score_changes)
+        db.session.commit()
+
+        changed += len(score_changes)
+        done += len(batch)
+        after = batch[-1][0]
+        job.report(done)
+
+    # Las actualizaciones masivas no disparan los eventos de métricas ni de resúmenes: se recalculan al final
+    course_id = db.session.query(Module.course_id).filter(Module.id == quiz.module_id).scalar()
+    # Sobre la tabla, sin los eventos del modelo: no es un cambio de contenido del curso
+    content_items = ContentItem.__table__
+    db.session.execute(content_items.update().where(content_items.c.id == quiz_id).values(
+        grading_revision=content_items.c.grading_revision + 1
+    ))
+    db.session.commit()
+    recompute_enrollment_progress(course_ids=[course_id])
+    if changed:
+        refresh_course_metrics([course_id])
+        rebuild_attempt_summaries(quiz_id, course_id)
+    return changed
+
+
+def rebuild_attempt_summaries(quiz_id, course_id):
+    """Reconstruye los resúmenes de intentos de un quiz con una única consulta agrupada."""
+    summaries = QuizAttemptSummary.__table__
+    best_score = db.func.max(StudentResponse.score)
+    db.session.execute(db.delete(summaries).where(summaries.c.quiz_id == quiz_id))
+    db.session.execute(db.insert(summaries).from_select(
+        ['student_id', 'quiz_id', 'course_id', 'best_score', 'attempt_count', 'last_attempt_at', 'passed'],
+        db.select(
+            StudentResponse.student_id, db.literal(quiz_id), db.literal(course_id), best_score,
+            db.func.count(StudentResponse.id), db.func.max(StudentResponse.completion_date),
+            best_score >= QUIZ_PASSING_SCORE,
+        ).where(
+            StudentResponse.content_item_id == quiz_id, StudentResponse.score.isnot(None)
+        ).group_by(StudentResponse.student_id)
+    ))
+    db.session.commit()
+
+
+def attempt_block_reason(student_id, quiz_id):
+    """Comprueba si el estudiante puede intentar el quiz leyendo solo su fila de resumen.
+
+    Aplica el aprobado previo, el máximo de intentos (`QUIZ_MAX_ATTEMPTS`) y la espera
+    entre intentos (`QUIZ_ATTEMPT_COOLDOWN`, en segundos). Devuelve None si puede
+    intentarlo o el mensaje que explica por qué no.
+    """
+    summary = db.session.get(QuizAttemptSummary, (student_id, quiz_id))
+    if summary is None:
+        return None
+    if summary.passed:
+        return f'Ya obtuviste una nota mayor o igual a {QUIZ_PASSING_SCORE} en este quiz. No puedes intentarlo nuevamente.'
+    max_attempts = current_app.config.get('QUIZ_MAX_ATTEMPTS')
+    if max_attempts and summary.attempt_count >= max_attempts:
+        return f'Alcanzaste el máximo de {max_attempts} intentos en este quiz.'
+    cooldown = current_app.config.get('QUIZ_ATTEMPT_COOLDOWN', 0)
+    if cooldown and summary.last_attempt_at:
+        wait = summary.last_attempt_at + timedelta(seconds=cooldown) - datetime.utcnow()
+        if wait > timedelta(0):
+            return f'Debes esperar {int(wait.total_seconds() // 60) + 1} minuto(s) antes de volver a intentarlo.'
+    return None
+
+
+# Caché LRU en memoria de claves compiladas, indexada por quiz y validada con su revisión
+# (única aunque SQLite reutilice el id de un quiz borrado)
+_lock = threading.Lock()
+_keys = OrderedDict()
+
+
+def get_answer_key(quiz):
+    """Devuelve la clave compilada del quiz, recompilándola si su revisión cambió."""
+    with _lock:
+        key = _keys.get(quiz.id)
+        if key is not None and key.revision == quiz.revision:
+            _keys.move_to_end(quiz.id)
+            return key
+    key = AnswerKey.compile(quiz)
+    max_size = current_app.config.get('QUIZ_KEY_CACHE_SIZE', 256)
+    with _lock:
+        _keys[quiz.id] = key
+        _keys.move_to_end(quiz.id)
+        while len(_keys) > max_size:
+            _keys.popitem(last=False)
+    return key
+
+
+def invalidate_answer_key(quiz_id):
+    with _lock:
+        _keys.pop(quiz_id, None)
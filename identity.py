@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy.orm import joinedload, make_transient_to_detached
+from models import db, User, Role
+
+# Caché LRU en memoria de usuarios autenticados (con su rol), indexada por id de usuario.
+# Cada entrada guarda una copia desligada de la sesión que se incorpora a la sesión de
+# cada petición con merge(load=False), sin ejecutar consultas.
+_lock = threading.Lock()
+_users = OrderedDict()
+
+
+def _detached_copy(user):
+    """Copia del usuario y su rol como objetos persistentes desligados de cualquier sesión."""
+    role = Role(id=user.role.id, name=user.role.name)
+    make_transient_to_detached(role)
+    copy = User(**{column.key: getattr(user, column.key) for column in User.__table__.columns})
+    copy.role = role
+    make_transient_to_detached(copy)
+    return copy
+
+
+def _parse_session_id(session_id):
+    """Separa el id de usuario y la versión de credenciales guardados en la sesión ("id:versión").
+
+    Las sesiones anteriores a la versión solo contienen el id.
+    """
+    user_id, _, version = str(session_id).partition(':')
+    return int(user_id), int(version) if version else None
+
+
+def load_identity(session_id):
+    """Devuelve el usuario autenticado de la petición, o None si ya no es válido.
+
+    Con la caché caliente no hay consultas; si no, se carga el usuario junto con su rol
+    en una sola consulta. Una versión de credenciales distinta a la de la sesión (cambio
+    de contraseña o de rol) invalida la sesión.
+    """
+    try:
+        user_id, version = _parse_session_id(session_id)
+    except ValueError:
+        return None
+
+    ttl = current_app.config.get('IDENTITY_CACHE_TTL', 30)
+    with _lock:
+        entry = _users.get(user_id)
+        if entry is not None and time.monotonic() - entry[0] < ttl:
+            _users.move_to_end(user_id)
+            cached = entry[1]
+        else:
+            cached = None
+    if cached is not None and version in (None, cached.auth_version):
+        return db.session.merge(cached, load=False)
+
+    user = db.session.execute(
+        db.select(User).options(joinedload(User.role)).where(User.id == user_id)
+    ).scalar_one_or_none()
+    if user is None or version not in (None, user.auth_version):
+        invalidate_identity(user_id)
+        return None
+
+    max_size = current_app.config.get('IDENTITY_CACHE_SIZE', 1024)
+    with _lock:
+        _users[user_id] = (time.monotonic(), _detached_copy(user))
+        _users.move_to_end(user_id)
+        while len(_users) > max_size:
+            _users.popitem(last=False)
+    return user
+
+
+def invalidate_identity(user_id=None):
+    """Elimina un usuario de la caché, o todos si no se indica id."""
+    with _lock:
+        if user_id is None:
+            _users.clear()
+        else:
+            _users.pop(user_id, None)
+
+
+@db.event.listens_for(User, 'before_update')
+def _bump_auth_version(mapper, connection, target):
+    """Un cambio de contraseña o de rol invalida las sesiones abiertas del usuario."""
+    state = db.inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in ('password', 'role_id', 'role')):
+        target.auth_version = (target.auth_version or 0) + 1
+
+
+@db.event.listens_for(db.session, 'after_flush')
+def _mark_identity_changes(session, flush_context):
+    changed = session.info.setdefault('identity_changes', set())
+    for obj in session.dirty | session.deleted:
+        if isinstance(obj, User):
+            changed.add(obj.id)
+        elif isinstance(obj, Role):
+            changed.add(None)
+
+
+@db.event.listens_for(db.session, 'after_commit')
+def _invalidate_after_commit(session):
+    changed = session.info.pop('identity_changes', set())
+    if None in changed:
+        invalidate_identity()
+        return
+    for user_id in changed:
+        invalidate_identity(user_id)
+
+
+@db.event.listens_for(db.session, 'after_rollback')
+def _discard_identity_changes(session):
+    session.info.pop('identity_changes', None)
@@ -0,0 +1,189 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from flask import current_app
+from models import db, Module, ContentItem, QuizQuestion, StudentResponse, AttemptAnswer
+from grading import get_answer_key
+
+# Umbrales para señalar preguntas problemáticas en el informe
+HARD_P_VALUE = 0.3
+EASY_P_VALUE = 0.9
+LOW_DISCRIMINATION = 0.2
+
+
+def _attempt_stamps(quiz_ids):
+    """Marca de los intentos de cada quiz: (número de intentos, id del último intento)."""
+    rows = db.session.query(
+        StudentResponse.content_item_id, db.func.count(StudentResponse.id), db.func.max(StudentResponse.id)
+    ).filter(StudentResponse.content_item_id.in_(quiz_ids)).group_by(StudentResponse.content_item_id)
+    stamps = {quiz_id: (count, max_id) for quiz_id, count, max_id in rows}
+    return {quiz_id: stamps.get(quiz_id, (0, None)) for quiz_id in quiz_ids}
+
+
+def _load_answers(answer_key):
+    """Carga todas las respuestas del quiz en una sola consulta como un array de enteros.
+
+    Cada fila es (intento, pregunta, acierto, opción elegida); la opción se codifica en
+    SQL (0 si está en blanco o no es una opción) para que todas las columnas sean enteras
+    y el array se construya directamente desde el cursor, sin procesar filas en Python.
+    """
+    answers = AttemptAnswer.__table__.c
+    max_options = max((len(question.options) for question in answer_key.questions), default=0)
+    option = db.case(
+        {str(index): index for index in range(1, max_options + 1)},
+        value=db.func.trim(answers.answer), else_=0
+    ) if max_options else db.literal(0)
+    result = db.session.connection().execute(
+        db.select(
+            answers.response_id, answers.question_id, db.cast(answers.is_correct, db.Integer), option
+        ).where(answers.question_id.in_(
+            db.select(QuizQuestion.id).where(QuizQuestion.content_item_id == answer_key.quiz_id)
+        ))
+    )
+    rows = result.cursor.fetchall()
+    result.close()
+    return np.array(rows, dtype=np.int64).reshape(-1, 4)
+
+
+def _point_biserial(correct, present):
+    """Correlación punto-biserial de cada pregunta con la nota del resto del quiz.
+
+    Se usa la nota sin la propia pregunta para no inflar la discriminación. Las
+    columnas sin varianza devuelven NaN.
+    """
+    x = correct.astype(np.float64)
+    mask = present.astype(np.float64)
+    rest = x.sum(axis=1, keepdims=True) - x
+    n = mask.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = (x * mask).sum(axis=0) / n
+        mean_rest = (rest * mask).sum(axis=0) / n
+        cov = (x * rest * mask).sum(axis=0) / n - mean_x * mean_rest
+        var_x = mean_x - mean_x ** 2
+        var_rest = (rest ** 2 * mask).sum(axis=0) / n - mean_rest ** 2
+        return cov / np.sqrt(var_x * var_rest)
+
+
+def _as_float(value):
+    return None if np.isnan(value) else float(value)
+
+
+def analyze_quiz(answer_key, data):
+    """Calcula dificultad (p), discriminación y frecuencia de opciones de cada pregunta."""
+    questions = answer_key.questions
+    if not len(data) or not questions:
+        return {'attempts': 0, 'questions': [
+            {'question': question, 'answered': 0, 'p_value': None, 'discrimination': None,
+             'options': [], 'other': 0, 'flags': []}
+            for question in questions
+        ]}
+    response_ids, question_ids, correct, choices = data.T
+
+    # Descarta respuestas a preguntas que ya no existen y mapea ids a columnas
+    key_ids = np.fromiter((question.id for question in questions), dtype=np.int64, count=len(questions))
+    order = np.argsort(key_ids)
+    positions = np.searchsorted(key_ids, question_ids, sorter=order).clip(max=len(key_ids) - 1)
+    columns = order[positions]
+    valid = key_ids[columns] == question_ids
+    columns, response_ids, correct, choices = columns[valid], response_ids[valid], correct[valid], choices[valid]
+
+    attempts, rows = np.unique(response_ids, return_inverse=True)
+    present = np.zeros((len(attempts), len(questions)), dtype=bool)
+    matrix = np.zeros_like(present)
+    present[rows, columns] = True
+    matrix[rows, columns] = correct.astype(bool)
+
+    answered = present.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p_values = matrix.sum(axis=0) / answered
+    discrimination = _point_biserial(matrix, present)
+
+    # Frecuencia de opciones; la columna 0 cuenta respuestas en blanco o fuera de rango
+    option_counts = np.array([len(question.options) for question in questions], dtype=np.int64)
+    width = option_counts.max() + 1
+    choices = np.where(choices > option_counts[columns], 0, choices)
+    counts = np.bincount(columns * width + choices, minlength=len(questions) * width).reshape(-1, width)
+
+    report = []
+    for index, question in enumerate(questions):
+        total = int(answered[index])
+        p_value = _as_float(p_values[index])
+        disc = _as_float(discrimination[index])
+        flags = []
+        if p_value is not None and p_value < HARD_P_VALUE:
+            flags.append('Muy difícil')
+        if p_value is not None and p_value > EASY_P_VALUE:
+            flags.append('Muy fácil')
+        if disc is not None and disc < LOW_DISCRIMINATION:
+            flags.append('Baja discriminación')
+        options = []
+        if question.question_type == 'multiple_choice':
+            for option_index, label in enumerate(question.options, start=1):
+                count = int(counts[index, option_index])
+                options.append({
+                    'label': label,
+                    'count': count,
+                    'share': count / total if total else 0.0,
+                    'is_correct': str(option_index) == question.answer,
+                })
+                if count == 0 and total and str(option_index) != question.answer:
+                    flags.append(f'Opción {option_index} sin elegir')
+        report.append({
+            'question': question,
+            'answered': total,
+            'p_value': p_value,
+            'discrimination': disc,
+            'options': options,
+            'other': int(counts[index, 0]) if options else 0,
+            'flags': flags,
+        })
+    return {'attempts': len(attempts), 'questions': report}
+
+
+# Caché LRU de informes, indexada por quiz y validada con su revisión, su re-calificación
+# (datos de la base de datos, comunes a todos los procesos) y sus intentos
+_lock = threading.Lock()
+_reports = OrderedDict()
+
+
+def _cached_report(quiz, attempts_stamp):
+    stamp = (quiz.revision, quiz.grading_revision, attempts_stamp)
+    with _lock:
+        cached = _reports.get(quiz.id)
+        if cached is not None and cached[0] == stamp:
+            _reports.move_to_end(quiz.id)
+            return cached[1]
+    answer_key = get_answer_key(quiz)
+    data = _load_answers(answer_key) if attempts_stamp[0] else np.empty((0, 4), dtype=np.int64)
+    report = analyze_quiz(answer_key, data)
+    max_size = current_app.config.get('ITEM_ANALYSIS_CACHE_SIZE', 128)
+    with _lock:
+        _reports[quiz.id] = (stamp, report)
+        _reports.move_to_end(quiz.id)
+        while len(_reports) > max_size:
+            _reports.popitem(last=False)
+    return report
+
+
+def invalidate_item_analysis(quiz_id):
+    with _lock:
+        _reports.pop(quiz_id, None)
+
+
+def quiz_item_analysis(quiz):
+    """Informe de análisis de ítems de un quiz, recalculado solo si hay intentos nuevos."""
+    return _cached_report(quiz, _attempt_stamps([quiz.id])[quiz.id])
+
+
+def course_item_analysis(course_id):
+    """Informes de todos los quizzes del curso, en el orden de sus módulos.
+
+    Devuelve una lista de pares (quiz, informe).
+    """
+    quizzes = ContentItem.query.join(Module, Module.id == ContentItem.module_id).filter(
+        Module.course_id == course_id, ContentItem.type == 'quiz'
+    ).order_by(Module.order, ContentItem.order, ContentItem.id).all()
+    if not quizzes:
+        return []
+    stamps = _attempt_stamps([quiz.id for quiz in quizzes])
+    return [(quiz, _cached_report(quiz, stamps[quiz.id])) for quiz in quizzes]
@@ -0,0 +1,96 @@
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# Ejecutor compartido para tareas largas que no deben bloquear una petición.
+# El estado de las tareas vive en la memoria de este proceso (ver README).
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='elearning-job')
+_jobs = {}
+_lock = threading.Lock()
+
+
+class Job:
+    """Estado de una tarea en segundo plano (progreso, resultado y errores)."""
+
+    def __init__(self, name, owner_id=None):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.owner_id = owner_id
+        self.status = 'pending'
+        self.done = 0
+        self.total = None
+        self.result = None
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+
+    def report(self, done, total=None):
+        """Actualiza el avance de la tarea."""
+        self.done = done
+        if total is not None:
+            self.total = total
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'done': self.done,
+            'total': self.total,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+def _prune(ttl, limit):
+    """Olvida las tareas terminadas hace más de `ttl` segundos y, si quedan más de `limit`, las terminadas más antiguas.
+
+    Se llama con `_lock` tomado. Las tareas pendientes o en curso no se olvidan nunca.
+    """
+    deadline = datetime.utcnow() - timedelta(seconds=ttl)
+    finished = sorted((job for job in _jobs.values() if job.finished_at), key=lambda job: job.finished_at)
+    # Sitio para la tarea que se va a añadir
+    excess = len(_jobs) + 1 - limit
+    for job in finished:
+        if job.finished_at >= deadline and excess <= 0:
+            break
+        del _jobs[job.id]
+        excess -= 1
+
+
+def submit_job(app, name, func, *args, owner_id=None, **kwargs):
+    """Ejecuta `func(job, *args, **kwargs)` en segundo plano dentro del contexto de la app.
+
+    `owner_id` identifica al usuario que lanzó la tarea para que pueda consultar su estado.
+    """
+    job = Job(name, owner_id)
+    with _lock:
+        _prune(app.config.get('JOB_RESULT_TTL', 3600), app.config.get('JOB_HISTORY_LIMIT', 200))
+        _jobs[job.id] = job
+
+    def run():
+        job.status = 'running'
+        with app.app_context():
+            try:
+                job.result = func(job, *args, **kwargs)
+                job.status = 'done'
+            except Exception as e:
+                from models import db
+                db.session.rollback()
+                job.error = str(e)
+                job.status = 'failed'
+                app.logger.exception('Error en la tarea %s', name)
+            finally:
+                job.finished_at = datetime.utcnow()
+
+    _executor.submit(run)
+    return job
+
+
+def get_job(job_id):
+    """Devuelve la tarea con el id dado o None."""
+    with _lock:
+        return _jobs.get(job_id)
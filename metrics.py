@@ -0,0 +1,76 @@
+from datetime import datetime
+from sqlalchemy import func, case
+from sqlalchemy.orm import contains_eager
+from models import db, Course, Module, ContentItem, CourseEnrollment, StudentResponse, CourseMetrics
+
+
+def refresh_course_metrics(course_ids=None):
+    """Recalcula las métricas materializadas con consultas agrupadas.
+
+    La nota media solo cuenta las respuestas de los estudiantes inscritos en el curso. Si no
+    se indican cursos se recalculan todos. Devuelve el número de cursos procesados.
+    """
+    courses = db.session.query(Course.id, Course.instructor_id)
+    enrollments = db.session.query(
+        CourseEnrollment.course_id,
+        func.count(CourseEnrollment.id),
+        func.sum(case((CourseEnrollment.completed == True, 1), else_=0)),
+    ).group_by(CourseEnrollment.course_id)
+    scores = db.session.query(
+        Module.course_id,
+        func.sum(StudentResponse.score),
+        func.count(StudentResponse.score),
+    ).join(
+        ContentItem, ContentItem.id == StudentResponse.content_item_id
+    ).join(
+        Module, Module.id == ContentItem.module_id
+    ).join(
+        # Solo cuentan las notas de los estudiantes inscritos en el curso
+        CourseEnrollment, db.and_(
+            CourseEnrollment.course_id == Module.course_id,
+            CourseEnrollment.student_id == StudentResponse.student_id,
+        )
+    ).group_by(Module.course_id)
+
+    if course_ids is not None:
+        courses = courses.filter(Course.id.in_(course_ids))
+        enrollments = enrollments.filter(CourseEnrollment.course_id.in_(course_ids))
+        scores = scores.filter(Module.course_id.in_(course_ids))
+
+    enrollment_totals = {course_id: (total, completed or 0) for course_id, total, completed in enrollments}
+    score_totals = {course_id: (score_sum or 0.0, score_count) for course_id, score_sum, score_count in scores}
+    existing = {
+        course_id for (course_id,) in db.session.query(CourseMetrics.course_id).filter(
+            CourseMetrics.course_id.in_(courses.with_entities(Course.id))
+        )
+    }
+
+    now = datetime.utcnow()
+    inserts, updates = [], []
+    for course_id, instructor_id in courses:
+        total_students, completed_students = enrollment_totals.get(course_id, (0, 0))
+        score_sum, score_count = score_totals.get(course_id, (0.0, 0))
+        row = {
+            'course_id': course_id,
+            'instructor_id': instructor_id,
+            'total_students': total_students,
+            'completed_students': completed_students,
+            'score_sum': score_sum,
+            'score_count': score_count,
+            'updated_at': now,
+        }
+        (updates if course_id in existing else inserts).append(row)
+
+    if inserts:
+        db.session.execute(db.insert(CourseMetrics), inserts)
+    if updates:
+        db.session.execute(db.update(CourseMetrics), updates)
+    db.session.commit()
+    return len(inserts) + len(updates)
+
+
+def instructor_course_metrics(instructor_id):
+    """Métricas de los cursos de un instructor leídas de la tabla materializada."""
+    return CourseMetrics.query.join(CourseMetrics.course).options(
+        contains_eager(CourseMetrics.course)
+    ).filter(CourseMetrics.instructor_id == instructor_id).all()
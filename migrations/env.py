@@ -97,6 +97,12 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        if connection.dialect.name == 'sqlite':
+            # Con claves foráneas activas, recrear una tabla en modo batch borraría en cascada
+            # las filas que la referencian; el pragma no tiene efecto dentro de una transacción
+            cursor = connection.connection.cursor()
+            cursor.execute('PRAGMA foreign_keys = OFF')
+            cursor.close()
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
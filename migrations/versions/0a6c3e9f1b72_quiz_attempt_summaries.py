@@ -0,0 +1,58 @@
+"""quiz attempt summaries
+
+Revision ID: 0a6c3e9f1b72
+Revises: f5b8d2c16a47
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a6c3e9f1b72'
+down_revision = 'f5b8d2c16a47'
+branch_labels = None
+depends_on = None
+
+# Nota mínima de aprobado vigente al crear la tabla
+PASSING_SCORE = 7
+
+
+def upgrade():
+    op.create_table('quiz_attempt_summaries',
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('quiz_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('best_score', sa.Float(), nullable=False),
+    sa.Column('attempt_count', sa.Integer(), nullable=False),
+    sa.Column('last_attempt_at', sa.DateTime(), nullable=True),
+    sa.Column('passed', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['quiz_id'], ['content_items.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['student_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('student_id', 'quiz_id')
+    )
+    with op.batch_alter_table('quiz_attempt_summaries', schema=None) as batch_op:
+        batch_op.create_index('ix_quiz_attempt_summaries_course_student', ['course_id', 'student_id'], unique=False)
+
+    # Resúmenes de los intentos existentes con una única consulta agrupada
+    op.execute(sa.text("""
+        INSERT INTO quiz_attempt_summaries
+            (student_id, quiz_id, course_id, best_score, attempt_count, last_attempt_at, passed)
+        SELECT student_responses.student_id, student_responses.content_item_id, modules.course_id,
+               MAX(student_responses.score), COUNT(*), MAX(student_responses.completion_date),
+               CASE WHEN MAX(student_responses.score) >= :passing THEN :passed ELSE :failed END
+        FROM student_responses
+        JOIN content_items ON content_items.id = student_responses.content_item_id
+        JOIN modules ON modules.id = content_items.module_id
+        WHERE student_responses.score IS NOT NULL
+        GROUP BY student_responses.student_id, student_responses.content_item_id, modules.course_id
+    """).bindparams(passing=PASSING_SCORE, passed=True, failed=False))
+
+
+def downgrade():
+    with op.batch_alter_table('quiz_attempt_summaries', schema=None) as batch_op:
+        batch_op.drop_index('ix_quiz_attempt_summaries_course_student')
+
+    op.drop_table('quiz_attempt_summaries')
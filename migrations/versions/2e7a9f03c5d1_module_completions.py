@@ -0,0 +1,57 @@
+"""module completions
+
+Revision ID: 2e7a9f03c5d1
+Revises: 8c4f2d61e9b3
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2e7a9f03c5d1'
+down_revision = '8c4f2d61e9b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('module_completions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('module_id', sa.Integer(), nullable=False),
+    sa.Column('instructor_id', sa.Integer(), nullable=False),
+    sa.Column('completed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['instructor_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['module_id'], ['modules.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['student_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('student_id', 'module_id', name='uq_module_completions_student_module')
+    )
+    with op.batch_alter_table('module_completions', schema=None) as batch_op:
+        batch_op.create_index('ix_module_completions_instructor_completed_at', ['instructor_id', 'completed_at'], unique=False)
+
+    # Registrar los módulos ya completados con la fecha de su último contenido
+    op.execute(sa.text("""
+        INSERT INTO module_completions (student_id, module_id, instructor_id, completed_at)
+        SELECT student_responses.student_id, modules.id, courses.instructor_id,
+               MAX(student_responses.completion_date)
+        FROM student_responses
+        JOIN content_items ON content_items.id = student_responses.content_item_id
+        JOIN modules ON modules.id = content_items.module_id
+        JOIN courses ON courses.id = modules.course_id
+        WHERE student_responses.completed = :completed
+          AND student_responses.completion_date IS NOT NULL
+        GROUP BY student_responses.student_id, modules.id, courses.instructor_id
+        HAVING COUNT(DISTINCT student_responses.content_item_id) = (
+            SELECT COUNT(*) FROM content_items WHERE content_items.module_id = modules.id
+        )
+    """).bindparams(completed=True))
+
+
+def downgrade():
+    with op.batch_alter_table('module_completions', schema=None) as batch_op:
+        batch_op.drop_index('ix_module_completions_instructor_completed_at')
+
+    op.drop_table('module_completions')
@@ -0,0 +1,47 @@
+"""unique course enrollment
+
+Revision ID: 3c8e5a1f7b20
+Revises: 1b7d4f2a8c95
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c8e5a1f7b20'
+down_revision = '1b7d4f2a8c95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Conservar la inscripción más antigua de cada estudiante en cada curso
+    op.execute(sa.text("""
+        DELETE FROM course_enrollments
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM course_enrollments GROUP BY student_id, course_id
+        )
+    """))
+    # Ajustar las métricas materializadas a las inscripciones que quedan
+    op.execute(sa.text("""
+        UPDATE course_metrics SET
+            total_students = (
+                SELECT COUNT(*) FROM course_enrollments
+                WHERE course_enrollments.course_id = course_metrics.course_id
+            ),
+            completed_students = (
+                SELECT COUNT(*) FROM course_enrollments
+                WHERE course_enrollments.course_id = course_metrics.course_id
+                  AND course_enrollments.completed = :completed
+            )
+    """).bindparams(completed=True))
+
+    with op.batch_alter_table('course_enrollments', schema=None) as batch_op:
+        batch_op.create_index('ix_course_enrollments_student_course', ['student_id', 'course_id'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('course_enrollments', schema=None) as batch_op:
+        batch_op.drop_index('ix_course_enrollments_student_course')
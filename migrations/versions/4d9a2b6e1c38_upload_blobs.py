@@ -0,0 +1,29 @@
+"""upload blobs
+
+Revision ID: 4d9a2b6e1c38
+Revises: 3c8e5a1f7b20
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d9a2b6e1c38'
+down_revision = '3c8e5a1f7b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('upload_blobs',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('ref_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+
+
+def downgrade():
+    op.drop_table('upload_blobs')
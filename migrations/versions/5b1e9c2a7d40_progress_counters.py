@@ -0,0 +1,51 @@
+"""progress counters
+
+Revision ID: 5b1e9c2a7d40
+Revises: f3132d723adf
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e9c2a7d40'
+down_revision = 'f3132d723adf'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_count', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('course_enrollments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('completed_items', sa.Integer(), server_default='0', nullable=False))
+
+    # Rellenar los contadores con los datos existentes
+    op.execute("""
+        UPDATE courses SET content_count = (
+            SELECT COUNT(content_items.id) FROM content_items
+            JOIN modules ON modules.id = content_items.module_id
+            WHERE modules.course_id = courses.id
+        )
+    """)
+    op.execute(sa.text("""
+        UPDATE course_enrollments SET completed_items = (
+            SELECT COUNT(DISTINCT student_responses.content_item_id) FROM student_responses
+            JOIN content_items ON content_items.id = student_responses.content_item_id
+            JOIN modules ON modules.id = content_items.module_id
+            WHERE modules.course_id = course_enrollments.course_id
+              AND student_responses.student_id = course_enrollments.student_id
+              AND student_responses.completed = :completed
+        )
+    """).bindparams(completed=True))
+
+
+def downgrade():
+    with op.batch_alter_table('course_enrollments', schema=None) as batch_op:
+        batch_op.drop_column('completed_items')
+
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.drop_column('content_count')
@@ -0,0 +1,33 @@
+"""course updated_at
+
+Revision ID: 6a3c9e1d4b57
+Revises: 5e2f8c4a7d19
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a3c9e1d4b57'
+down_revision = '5e2f8c4a7d19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # Los cursos existentes toman la fecha de la migración como última modificación
+    op.execute(sa.text('UPDATE courses SET updated_at = :now').bindparams(
+        sa.bindparam('now', datetime.utcnow(), type_=sa.DateTime())
+    ))
+
+
+def downgrade():
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,93 @@
+"""hot path indexes
+
+Revision ID: 7b4e1f9c2d63
+Revises: 6a3c9e1d4b57
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b4e1f9c2d63'
+down_revision = '6a3c9e1d4b57'
+branch_labels = None
+depends_on = None
+
+
+def _renumber(table, parent):
+    """Renumera 1..n el `order` de los grupos que tengan posiciones repetidas, sin alterar el orden."""
+    op.execute(sa.text(f"""
+        UPDATE {table} SET "order" = (
+            SELECT COUNT(*) FROM {table} AS other
+            WHERE other.{parent} = {table}.{parent}
+              AND (other."order" < {table}."order" OR (other."order" = {table}."order" AND other.id <= {table}.id))
+        )
+        WHERE {parent} IN (
+            SELECT {parent} FROM {table} GROUP BY {parent}, "order" HAVING COUNT(*) > 1
+        )
+    """))
+
+
+def upgrade():
+    # Dos altas simultáneas pudieron repetir una posición antes de exigirla única
+    _renumber('modules', 'course_id')
+    _renumber('content_items', 'module_id')
+
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_courses_instructor_id'), ['instructor_id'], unique=False)
+
+    with op.batch_alter_table('modules', schema=None) as batch_op:
+        batch_op.create_index('ix_modules_course_order', ['course_id', 'order'], unique=True)
+
+    with op.batch_alter_table('content_items', schema=None) as batch_op:
+        batch_op.create_index('ix_content_items_module_order', ['module_id', 'order'], unique=True)
+
+    with op.batch_alter_table('quiz_questions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_quiz_questions_content_item_id'), ['content_item_id'], unique=False)
+
+    with op.batch_alter_table('course_enrollments', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_course_enrollments_course_id'), ['course_id'], unique=False)
+
+    with op.batch_alter_table('student_responses', schema=None) as batch_op:
+        batch_op.create_index('ix_student_responses_student_content_completed',
+                              ['student_id', 'content_item_id', 'completed'], unique=False)
+        batch_op.create_index(batch_op.f('ix_student_responses_content_item_id'), ['content_item_id'], unique=False)
+
+    with op.batch_alter_table('module_completions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_module_completions_module_id'), ['module_id'], unique=False)
+
+    with op.batch_alter_table('quiz_attempt_summaries', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_quiz_attempt_summaries_quiz_id'), ['quiz_id'], unique=False)
+
+    # Estadísticas para que el planificador de SQLite elija bien entre los índices nuevos
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute(sa.text('ANALYZE'))
+
+
+def downgrade():
+    with op.batch_alter_table('quiz_attempt_summaries', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_quiz_attempt_summaries_quiz_id'))
+
+    with op.batch_alter_table('module_completions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_module_completions_module_id'))
+
+    with op.batch_alter_table('student_responses', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_student_responses_content_item_id'))
+        batch_op.drop_index('ix_student_responses_student_content_completed')
+
+    with op.batch_alter_table('course_enrollments', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_course_enrollments_course_id'))
+
+    with op.batch_alter_table('quiz_questions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_quiz_questions_content_item_id'))
+
+    with op.batch_alter_table('content_items', schema=None) as batch_op:
+        batch_op.drop_index('ix_content_items_module_order')
+
+    with op.batch_alter_table('modules', schema=None) as batch_op:
+        batch_op.drop_index('ix_modules_course_order')
+
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_courses_instructor_id'))
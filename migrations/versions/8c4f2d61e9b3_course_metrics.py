@@ -0,0 +1,61 @@
+"""course metrics
+
+Revision ID: 8c4f2d61e9b3
+Revises: 5b1e9c2a7d40
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4f2d61e9b3'
+down_revision = '5b1e9c2a7d40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('course_metrics',
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('instructor_id', sa.Integer(), nullable=False),
+    sa.Column('total_students', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('completed_students', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('score_sum', sa.Float(), server_default='0', nullable=False),
+    sa.Column('score_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['instructor_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('course_id')
+    )
+    with op.batch_alter_table('course_metrics', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_course_metrics_instructor_id'), ['instructor_id'], unique=False)
+
+    # Rellenar las métricas con los datos existentes
+    op.execute(sa.text("""
+        INSERT INTO course_metrics (course_id, instructor_id, total_students, completed_students,
+                                    score_sum, score_count, updated_at)
+        SELECT courses.id, courses.instructor_id,
+               (SELECT COUNT(*) FROM course_enrollments
+                WHERE course_enrollments.course_id = courses.id),
+               (SELECT COUNT(*) FROM course_enrollments
+                WHERE course_enrollments.course_id = courses.id AND course_enrollments.completed = :completed),
+               (SELECT COALESCE(SUM(student_responses.score), 0) FROM student_responses
+                JOIN content_items ON content_items.id = student_responses.content_item_id
+                JOIN modules ON modules.id = content_items.module_id
+                WHERE modules.course_id = courses.id),
+               (SELECT COUNT(student_responses.score) FROM student_responses
+                JOIN content_items ON content_items.id = student_responses.content_item_id
+                JOIN modules ON modules.id = content_items.module_id
+                WHERE modules.course_id = courses.id),
+               CURRENT_TIMESTAMP
+        FROM courses
+    """).bindparams(completed=True))
+
+
+def downgrade():
+    with op.batch_alter_table('course_metrics', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_course_metrics_instructor_id'))
+
+    op.drop_table('course_metrics')
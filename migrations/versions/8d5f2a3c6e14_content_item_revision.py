@@ -0,0 +1,37 @@
+"""content item revision
+
+Revision ID: 8d5f2a3c6e14
+Revises: 7b4e1f9c2d63
+Create Date: 2026-10-18 23:30:00.000000
+
+"""
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d5f2a3c6e14'
+down_revision = '7b4e1f9c2d63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('content_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('revision', sa.String(length=32), nullable=True))
+
+    connection = op.get_bind()
+    for (content_id,) in connection.execute(sa.text('SELECT id FROM content_items')).all():
+        connection.execute(sa.text('UPDATE content_items SET revision = :revision WHERE id = :id').bindparams(
+            revision=uuid.uuid4().hex, id=content_id
+        ))
+
+    with op.batch_alter_table('content_items', schema=None) as batch_op:
+        batch_op.alter_column('revision', existing_type=sa.String(length=32), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('content_items', schema=None) as batch_op:
+        batch_op.drop_column('revision')
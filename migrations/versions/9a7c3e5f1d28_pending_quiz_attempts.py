@@ -0,0 +1,38 @@
+"""pending quiz attempts
+
+Revision ID: 9a7c3e5f1d28
+Revises: 8d5f2a3c6e14
+Create Date: 2026-10-18 23:45:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a7c3e5f1d28'
+down_revision = '8d5f2a3c6e14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('pending_quiz_attempts',
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('quiz_id', sa.Integer(), nullable=False),
+    sa.Column('seed', sa.Integer(), nullable=True),
+    sa.Column('revision', sa.String(length=32), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['quiz_id'], ['content_items.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['student_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('student_id', 'quiz_id')
+    )
+    with op.batch_alter_table('pending_quiz_attempts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_pending_quiz_attempts_quiz_id'), ['quiz_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('pending_quiz_attempts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_pending_quiz_attempts_quiz_id'))
+
+    op.drop_table('pending_quiz_attempts')
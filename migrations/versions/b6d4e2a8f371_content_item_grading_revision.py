@@ -0,0 +1,26 @@
+"""content item grading revision
+
+Revision ID: b6d4e2a8f371
+Revises: 9a7c3e5f1d28
+Create Date: 2026-10-18 23:55:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d4e2a8f371'
+down_revision = '9a7c3e5f1d28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('content_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('grading_revision', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('content_items', schema=None) as batch_op:
+        batch_op.drop_column('grading_revision')
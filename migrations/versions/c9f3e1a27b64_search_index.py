@@ -0,0 +1,49 @@
+"""search index
+
+Revision ID: c9f3e1a27b64
+Revises: a41d6b8e2f57
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9f3e1a27b64'
+down_revision = 'a41d6b8e2f57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 solo está disponible en SQLite
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+            title, body, course_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """)
+    # El rowid codifica el tipo (1 curso, 2 módulo, 3 contenido) y el id del objeto
+    op.execute("""
+        INSERT INTO search_index (rowid, title, body, course_id)
+        SELECT id * 4 + 1, name, description, id FROM courses
+    """)
+    op.execute("""
+        INSERT INTO search_index (rowid, title, body, course_id)
+        SELECT id * 4 + 2, title, description, course_id FROM modules
+    """)
+    op.execute("""
+        INSERT INTO search_index (rowid, title, body, course_id)
+        SELECT content_items.id * 4 + 3, content_items.title,
+               CASE WHEN content_items.type = 'text' THEN COALESCE(content_items.content, '') ELSE '' END,
+               modules.course_id
+        FROM content_items JOIN modules ON modules.id = content_items.module_id
+    """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("DROP TABLE IF EXISTS search_index")
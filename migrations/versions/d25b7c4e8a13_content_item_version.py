@@ -0,0 +1,26 @@
+"""content item version
+
+Revision ID: d25b7c4e8a13
+Revises: c9f3e1a27b64
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd25b7c4e8a13'
+down_revision = 'c9f3e1a27b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('content_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('content_items', schema=None) as batch_op:
+        batch_op.drop_column('version')
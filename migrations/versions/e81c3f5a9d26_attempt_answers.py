@@ -0,0 +1,93 @@
+"""attempt answers
+
+Revision ID: e81c3f5a9d26
+Revises: d25b7c4e8a13
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+import json
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e81c3f5a9d26'
+down_revision = 'd25b7c4e8a13'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def _normalize(value):
+    return str(value).strip().lower()
+
+
+def upgrade():
+    attempt_answers = op.create_table('attempt_answers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('response_id', sa.Integer(), nullable=False),
+    sa.Column('question_id', sa.Integer(), nullable=False),
+    sa.Column('answer', sa.Text(), nullable=True),
+    sa.Column('is_correct', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['question_id'], ['quiz_questions.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['response_id'], ['student_responses.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('attempt_answers', schema=None) as batch_op:
+        batch_op.create_index('ix_attempt_answers_question_correct', ['question_id', 'is_correct'], unique=False)
+        batch_op.create_index(batch_op.f('ix_attempt_answers_response_id'), ['response_id'], unique=False)
+
+    # Pasar los envíos guardados como JSON a filas por pregunta, por lotes
+    connection = op.get_bind()
+    answer_keys = {}
+    last_id = 0
+    while True:
+        rows = connection.execute(sa.text("""
+            SELECT student_responses.id, student_responses.content_item_id, student_responses.response
+            FROM student_responses
+            JOIN content_items ON content_items.id = student_responses.content_item_id
+            WHERE student_responses.id > :last_id
+              AND student_responses.response IS NOT NULL
+              AND content_items.type = 'quiz'
+            ORDER BY student_responses.id
+            LIMIT :limit
+        """), {'last_id': last_id, 'limit': BATCH_SIZE}).all()
+        if not rows:
+            break
+
+        inserts = []
+        for response_id, quiz_id, blob in rows:
+            if quiz_id not in answer_keys:
+                answer_keys[quiz_id] = {
+                    question_id: _normalize(correct_answer)
+                    for question_id, correct_answer in connection.execute(
+                        sa.text("SELECT id, correct_answer FROM quiz_questions WHERE content_item_id = :quiz_id"),
+                        {'quiz_id': quiz_id}
+                    )
+                }
+            try:
+                submitted = json.loads(blob)
+            except (TypeError, ValueError):
+                continue
+            if not isinstance(submitted, dict):
+                continue
+            for question_id, correct_answer in answer_keys[quiz_id].items():
+                answer = submitted.get(f'question_{question_id}')
+                inserts.append({
+                    'response_id': response_id,
+                    'question_id': question_id,
+                    'answer': answer,
+                    'is_correct': bool(answer) and _normalize(answer) == correct_answer,
+                })
+        if inserts:
+            op.bulk_insert(attempt_answers, inserts)
+        last_id = rows[-1][0]
+
+
+def downgrade():
+    with op.batch_alter_table('attempt_answers', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_attempt_answers_response_id'))
+        batch_op.drop_index('ix_attempt_answers_question_correct')
+
+    op.drop_table('attempt_answers')
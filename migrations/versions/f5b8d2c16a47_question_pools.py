@@ -0,0 +1,40 @@
+"""question pools
+
+Revision ID: f5b8d2c16a47
+Revises: e81c3f5a9d26
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5b8d2c16a47'
+down_revision = 'e81c3f5a9d26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('content_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('questions_per_attempt', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('stratify_by_tag', sa.Boolean(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('quiz_questions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('tag', sa.String(length=50), nullable=True))
+
+    with op.batch_alter_table('student_responses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('seed', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('student_responses', schema=None) as batch_op:
+        batch_op.drop_column('seed')
+
+    with op.batch_alter_table('quiz_questions', schema=None) as batch_op:
+        batch_op.drop_column('tag')
+
+    with op.batch_alter_table('content_items', schema=None) as batch_op:
+        batch_op.drop_column('stratify_by_tag')
+        batch_op.drop_column('questions_per_attempt')
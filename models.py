@@ -1,9 +1,17 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy.dialects import postgresql, sqlite
 from datetime import datetime
+from types import SimpleNamespace
 import json
+import uuid
+from sqlite_profile import RoutingSession
 
-db = SQLAlchemy()
+# Las lecturas pueden ir al pool de solo lectura de SQLite (ver sqlite_profile.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Nota mínima para aprobar un quiz
+QUIZ_PASSING_SCORE = 7
 
 # Modelo de Roles (Admin, Instructor, Estudiante)
 class Role(db.Model):
@@ -21,65 +29,98 @@ class User(UserMixin, db.Model):
     username = db.Column(db.String(150), unique=True, nullable=False)
     email = db.Column(db.String(150), unique=True, nullable=False)
     password = db.Column(db.String(150), nullable=False)
-    role_id = db.Column(db.Integer, db.ForeignKey('roles.id'), nullable=False)
+    role_id = db.Column(db.Integer, db.ForeignKey('roles.id'), nullable=False, index=True)
+    auth_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Cambia con la contraseña o el rol
     role = db.relationship('Role')
     courses = db.relationship('Course', backref='instructor', cascade='all, delete-orphan')  # Cursos que enseña
     enrollments = db.relationship('CourseEnrollment', backref='student', cascade='all, delete-orphan')  # Inscripciones
     responses = db.relationship('StudentResponse', backref='student', cascade='all, delete-orphan')  # Respuestas
+    module_completions = db.relationship(
+        'ModuleCompletion', foreign_keys='ModuleCompletion.student_id', back_populates='student', cascade='all, delete-orphan'
+    )  # Módulos completados
 
     def __repr__(self):
         return f'<User {self.username}>'
 
+    def get_id(self):
+        """Id guardado en la sesión: incluye la versión de credenciales para invalidarla al cambiarlas."""
+        return f'{self.id}:{self.auth_version or 1}'
+
 # Modelo de Curso
 class Course(db.Model):
     __tablename__ = 'courses'
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(200), nullable=False)
+    name = db.Column(db.String(200), nullable=False, index=True)
     description = db.Column(db.String(500), nullable=False)
-    instructor_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    modules = db.relationship('Module', back_populates='course', lazy=True, cascade='all, delete-orphan')
+    instructor_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    content_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Total de contenidos (desnormalizado)
+    content_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Cambia con sus módulos y contenidos
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow)  # Fecha del último cambio de versión
+    modules = db.relationship(
+        'Module', back_populates='course', lazy=True, cascade='all, delete-orphan', order_by='Module.order'
+    )
     enrollments = db.relationship(
         'CourseEnrollment', back_populates='course', lazy=True, cascade='all, delete-orphan'
     )
+    metrics = db.relationship('CourseMetrics', back_populates='course', uselist=False, cascade='all, delete-orphan')
 
     def __repr__(self):
         return f'<Course {self.name}>'
 
     def get_modules_sorted(self):
-        return sorted(self.modules, key=lambda x: x.order)
+        """Devuelve los módulos ordenados por el campo `order` (ya vienen ordenados de la consulta)."""
+        return list(self.modules)
 
     def get_total_content(self):
         """Retorna el número total de ítems de contenido en el curso."""
-        total_content = 0
-        for module in self.modules:
-            total_content += len(module.content_items)
-        return total_content
+        return self.content_count or 0
+
+    def get_next_module_order(self):
+        """Expresión SQL del próximo número de orden para un nuevo módulo.
+
+        Se asigna al atributo `order` y se evalúa dentro del propio INSERT: dos altas
+        simultáneas no leen el mismo máximo ni chocan con el índice único (curso, orden).
+        """
+        return db.select(db.func.coalesce(db.func.max(Module.order), 0) + 1).where(
+            Module.course_id == self.id
+        ).scalar_subquery()
 
 # Modelo de Módulo
 class Module(db.Model):
     __tablename__ = 'modules'
+    __table_args__ = (
+        db.Index('ix_modules_course_order', 'course_id', 'order', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.String(500), nullable=False)
     order = db.Column(db.Integer, nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete="CASCADE"), nullable=False)
-    content_items = db.relationship('ContentItem', back_populates='module', lazy=True, cascade='all, delete-orphan')
+    content_items = db.relationship(
+        'ContentItem', back_populates='module', lazy=True, cascade='all, delete-orphan', order_by='ContentItem.order'
+    )
+    completions = db.relationship('ModuleCompletion', back_populates='module', lazy=True, cascade='all, delete-orphan')
     course = db.relationship('Course', back_populates='modules')
 
     def __repr__(self):
         return f'<Module {self.title}>'
 
     def get_content_items_sorted(self):
-        """Devuelve los contenidos ordenados por el campo `order`."""
-        return sorted(self.content_items, key=lambda x: x.order)
+        """Devuelve los contenidos ordenados por el campo `order` (ya vienen ordenados de la consulta)."""
+        return list(self.content_items)
 
     def get_next_content_order(self):
-        """Calcula el próximo número de orden para un nuevo contenido."""
-        return max((content.order for content in self.content_items), default=0) + 1
+        """Expresión SQL del próximo número de orden para un nuevo contenido (evaluada en el INSERT)."""
+        return db.select(db.func.coalesce(db.func.max(ContentItem.order), 0) + 1).where(
+            ContentItem.module_id == self.id
+        ).scalar_subquery()
 
 # Modelo de Contenido
 class ContentItem(db.Model):
     __tablename__ = 'content_items'
+    __table_args__ = (
+        db.Index('ix_content_items_module_order', 'module_id', 'order', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     type = db.Column(db.String(50), nullable=False)  # "text", "video", "file", "quiz"
@@ -87,21 +128,42 @@ class ContentItem(db.Model):
     file_path = db.Column(db.String(255), nullable=True)
     order = db.Column(db.Integer, nullable=False)
     module_id = db.Column(db.Integer, db.ForeignKey('modules.id', ondelete="CASCADE"), nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Se incrementa al editar el quiz
+    # Identifica cada versión sin repetirse nunca (SQLite reutiliza el id de un quiz borrado)
+    revision = db.Column(db.String(32), nullable=False, default=lambda: uuid.uuid4().hex)
+    # Se incrementa al terminar de re-calificar los intentos guardados (invalida los análisis de ítems)
+    grading_revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    questions_per_attempt = db.Column(db.Integer, nullable=True)  # Preguntas sorteadas por intento (None: todas)
+    stratify_by_tag = db.Column(db.Boolean, nullable=False, default=False, server_default='0')  # Sorteo proporcional por etiqueta
     questions = db.relationship('QuizQuestion', backref='content_item', cascade='all, delete-orphan', lazy=True)
     module = db.relationship('Module', back_populates='content_items')
 
     def __repr__(self):
         return f'<ContentItem {self.title}>'
 
+# Archivos subidos guardados por su SHA-256 y cuántos contenidos los referencian
+class UploadBlob(db.Model):
+    __tablename__ = 'upload_blobs'
+    sha256 = db.Column(db.String(64), primary_key=True)
+    ref_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<UploadBlob {self.sha256[:12]} x{self.ref_count}>'
+
 # Modelo de Preguntas del Quiz
 class QuizQuestion(db.Model):
     __tablename__ = 'quiz_questions'
     id = db.Column(db.Integer, primary_key=True)
     question_text = db.Column(db.Text, nullable=False)
-    content_item_id = db.Column(db.Integer, db.ForeignKey('content_items.id', ondelete="CASCADE"), nullable=False)
+    content_item_id = db.Column(db.Integer, db.ForeignKey('content_items.id', ondelete="CASCADE"), nullable=False, index=True)
     question_type = db.Column(db.String(50), default="multiple_choice")
     correct_answer = db.Column(db.Text, nullable=True)
     options = db.Column(db.Text, nullable=True)
+    tag = db.Column(db.String(50), nullable=True)  # Tema o dificultad, para sortear por estratos
+    attempt_answers = db.relationship(
+        'AttemptAnswer', back_populates='question', lazy=True, cascade='all, delete-orphan', passive_deletes=True
+    )
 
     def __repr__(self):
         return f'<QuizQuestion {self.question_text[:50]}>'
@@ -112,7 +174,8 @@ class QuizQuestion(db.Model):
             "question_text": self.question_text,
             "question_type": self.question_type,
             "correct_answer": self.correct_answer,
-            "options": self.get_options()
+            "options": self.get_options(),
+            "tag": self.tag
         }
 
     def get_options(self):
@@ -127,56 +190,499 @@ class QuizQuestion(db.Model):
 # Modelo de Inscripción a Cursos
 class CourseEnrollment(db.Model):
     __tablename__ = 'course_enrollments'
+    __table_args__ = (
+        db.Index('ix_course_enrollments_student_course', 'student_id', 'course_id', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete="CASCADE"), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete="CASCADE"), nullable=False, index=True)
     enrollment_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     completed = db.Column(db.Boolean, default=False)
     progress = db.Column(db.Float, default=0.0)
     completion_date = db.Column(db.DateTime, nullable=True)  # Nueva columna
+    completed_items = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Contenidos completados (desnormalizado)
     course = db.relationship('Course', back_populates='enrollments')
 
+    def get_progress(self):
+        """Progreso calculado con los contadores actuales del curso y de la inscripción."""
+        total_content = self.course.get_total_content()
+        return min((self.completed_items or 0) * 100.0 / total_content, 100) if total_content > 0 else 0
+
     def update_progress(self):
-        total_content = sum(len(module.content_items) for module in self.course.modules)
-        completed_content = StudentResponse.query.filter_by(student_id=self.student_id, completed=True).filter(
-            StudentResponse.content_item_id.in_([content.id for module in self.course.modules for content in module.content_items])
-        ).count()
-        self.progress = (completed_content / total_content) * 100 if total_content > 0 else 0
+        """Recalcula el progreso a partir de los contadores del curso y de la inscripción."""
+        self.progress = self.get_progress()
         if self.progress == 100:
-            self.completed = True
-            self.completion_date = datetime.utcnow()  # Actualizar la fecha de finalización
-        db.session.commit()
+            if not self.completed:
+                self.completed = True
+                self.completion_date = datetime.utcnow()  # Actualizar la fecha de finalización
+        else:
+            self.completed = False
+            self.completion_date = None
 
 # Modelo de Respuestas de Estudiantes
 class StudentResponse(db.Model):
     __tablename__ = 'student_responses'
+    __table_args__ = (
+        # Respuestas completadas de un estudiante en un contenido (progreso y finalización de módulos)
+        db.Index('ix_student_responses_student_content_completed', 'student_id', 'content_item_id', 'completed'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
-    content_item_id = db.Column(db.Integer, db.ForeignKey('content_items.id', ondelete="CASCADE"), nullable=False)
+    content_item_id = db.Column(db.Integer, db.ForeignKey('content_items.id', ondelete="CASCADE"), nullable=False, index=True)
     response = db.Column(db.Text, nullable=True)
     score = db.Column(db.Float, nullable=True)
     completed = db.Column(db.Boolean, default=False)
     completion_date = db.Column(db.DateTime, nullable=True)
-    content_item = db.relationship('ContentItem', backref='responses')
+    seed = db.Column(db.Integer, nullable=True)  # Semilla del sorteo de preguntas del intento
+    content_item = db.relationship('ContentItem', backref=db.backref('responses', cascade='all, delete-orphan'))
+    answers = db.relationship('AttemptAnswer', back_populates='response', lazy=True, cascade='all, delete-orphan')
 
     def mark_as_completed(self):
-        """Marca el contenido como completado y actualiza el progreso del módulo y curso."""
+        """Marca el contenido como completado y actualiza el progreso del curso.
+
+        Solo la primera respuesta completada de un contenido incrementa el contador
+        de la inscripción, por lo que el coste no depende del tamaño del curso.
+        No hace commit: lo hace quien llama.
+        """
+        if self.completed:
+            return
+        already_completed = db.session.query(StudentResponse.query.filter_by(
+            student_id=self.student_id, content_item_id=self.content_item_id, completed=True
+        ).exists()).scalar()
+
         self.completed = True
         self.completion_date = datetime.utcnow()
-        db.session.commit()
-
-        # Verificar si todos los contenidos del módulo están completados por el estudiante
-        module_contents = self.content_item.module.content_items
-        completed_contents = StudentResponse.query.filter_by(
-            student_id=self.student_id, completed=True
-        ).filter(
-            StudentResponse.content_item_id.in_([item.id for item in module_contents])
-        ).count()
-
-        if completed_contents == len(module_contents):  # Todos los contenidos están completados
-            enrollment = CourseEnrollment.query.filter_by(
-                student_id=self.student_id,
-                course_id=self.content_item.module.course.id
-            ).first()
-            if enrollment:
-                enrollment.update_progress()
+        if already_completed:
+            return
+
+        module_id, course_id, instructor_id = db.session.query(
+            Module.id, Module.course_id, Course.instructor_id
+        ).join(ContentItem, ContentItem.module_id == Module.id).join(Course, Course.id == Module.course_id).filter(
+            ContentItem.id == self.content_item_id
+        ).one()
+        enrollment = CourseEnrollment.query.filter_by(student_id=self.student_id, course_id=course_id).first()
+        if enrollment:
+            enrollment.completed_items = CourseEnrollment.completed_items + 1
+            db.session.flush()
+            enrollment.update_progress()
+
+        # Registrar la finalización del módulo si ya no queda ningún contenido pendiente
+        pending = ContentItem.query.filter(
+            ContentItem.module_id == module_id,
+            ~StudentResponse.query.filter(
+                StudentResponse.content_item_id == ContentItem.id,
+                StudentResponse.student_id == self.student_id,
+                StudentResponse.completed == True
+            ).exists()
+        ).exists()
+        if not db.session.query(pending).scalar():
+            completion = ModuleCompletion.query.filter_by(student_id=self.student_id, module_id=module_id).first()
+            if completion:
+                completion.completed_at = self.completion_date
+            else:
+                db.session.add(ModuleCompletion(
+                    student_id=self.student_id,
+                    module_id=module_id,
+                    instructor_id=instructor_id,
+                    completed_at=self.completion_date
+                ))
+
+
+# Respuesta de un intento a una pregunta concreta del quiz
+class AttemptAnswer(db.Model):
+    __tablename__ = 'attempt_answers'
+    __table_args__ = (
+        db.Index('ix_attempt_answers_question_correct', 'question_id', 'is_correct'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    response_id = db.Column(db.Integer, db.ForeignKey('student_responses.id', ondelete="CASCADE"), nullable=False, index=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('quiz_questions.id', ondelete="CASCADE"), nullable=False)
+    answer = db.Column(db.Text, nullable=True)
+    is_correct = db.Column(db.Boolean, nullable=False, default=False)
+    response = db.relationship('StudentResponse', back_populates='answers')
+    question = db.relationship('QuizQuestion', back_populates='attempt_answers')
+
+    def __repr__(self):
+        return f'<AttemptAnswer {self.response_id}:{self.question_id}>'
+
+
+# Finalización de un módulo por un estudiante (se registra al completar su último contenido)
+class ModuleCompletion(db.Model):
+    __tablename__ = 'module_completions'
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'module_id', name='uq_module_completions_student_module'),
+        db.Index('ix_module_completions_instructor_completed_at', 'instructor_id', 'completed_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
+    module_id = db.Column(db.Integer, db.ForeignKey('modules.id', ondelete="CASCADE"), nullable=False, index=True)
+    instructor_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
+    completed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    module = db.relationship('Module', back_populates='completions')
+    student = db.relationship('User', foreign_keys=[student_id], back_populates='module_completions')
+
+    def __repr__(self):
+        return f'<ModuleCompletion {self.student_id}:{self.module_id}>'
+
+
+# Resumen del mejor intento de cada estudiante en cada quiz
+class QuizAttemptSummary(db.Model):
+    __tablename__ = 'quiz_attempt_summaries'
+    __table_args__ = (
+        db.Index('ix_quiz_attempt_summaries_course_student', 'course_id', 'student_id'),
+    )
+    student_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('content_items.id', ondelete="CASCADE"), primary_key=True, index=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete="CASCADE"), nullable=False)
+    best_score = db.Column(db.Float, nullable=False, default=0.0)
+    attempt_count = db.Column(db.Integer, nullable=False, default=0)
+    last_attempt_at = db.Column(db.DateTime, nullable=True)
+    passed = db.Column(db.Boolean, nullable=False, default=False)
+    quiz = db.relationship('ContentItem')
+
+    def __repr__(self):
+        return f'<QuizAttemptSummary {self.student_id}:{self.quiz_id}>'
+
+
+# Intento de quiz empezado y aún sin enviar: fija el sorteo y la clave con la que se calificará
+class PendingQuizAttempt(db.Model):
+    __tablename__ = 'pending_quiz_attempts'
+    student_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('content_items.id', ondelete="CASCADE"), primary_key=True, index=True)
+    seed = db.Column(db.Integer, nullable=True)  # Semilla del sorteo; None si el quiz no sortea preguntas
+    revision = db.Column(db.String(32), nullable=False)  # Revisión de la clave de respuestas mostrada
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<PendingQuizAttempt {self.student_id}:{self.quiz_id}>'
+
+
+# Métricas materializadas por curso para el panel del instructor
+class CourseMetrics(db.Model):
+    __tablename__ = 'course_metrics'
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete="CASCADE"), primary_key=True)
+    instructor_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), nullable=False, index=True)
+    total_students = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    completed_students = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    score_sum = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    score_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    course = db.relationship('Course', back_populates='metrics')
+
+    def __repr__(self):
+        return f'<CourseMetrics {self.course_id}>'
+
+    @property
+    def average_score(self):
+        return round(self.score_sum / self.score_count, 2) if self.score_count > 0 else 0
+
+    @property
+    def completion_rate(self):
+        return round((self.completed_students / self.total_students) * 100, 2) if self.total_students > 0 else 0
+
+
+def _course_id_for_module(connection, module_id):
+    return connection.execute(
+        db.select(Module.course_id).where(Module.id == module_id)
+    ).scalar()
+
+
+def _bump_content_version(connection, course_id):
+    """Incrementa la versión de contenidos del curso (`course_id` puede ser una subconsulta)."""
+    courses = Course.__table__
+    connection.execute(courses.update().where(courses.c.id == course_id).values(
+        content_version=courses.c.content_version + 1, updated_at=datetime.utcnow()
+    ))
+
+
+def _course_of_module(module_id):
+    return db.select(Module.course_id).where(Module.id == module_id).scalar_subquery()
+
+
+def _course_of_content(content_item_id):
+    return db.select(Module.course_id).join(ContentItem, ContentItem.module_id == Module.id).where(
+        ContentItem.id == content_item_id
+    ).scalar_subquery()
+
+
+def _has_column_changes(mapper, target):
+    state = db.inspect(target)
+    return any(state.attrs[attr.key].history.has_changes() for attr in mapper.column_attrs)
+
+
+@db.event.listens_for(Course, 'before_update')
+def _course_edited(mapper, connection, target):
+    state = db.inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in ('name', 'description')):
+        target.content_version = Course.content_version + 1
+        target.updated_at = datetime.utcnow()
+
+
+@db.event.listens_for(Module, 'after_insert')
+@db.event.listens_for(Module, 'after_delete')
+def _module_added_or_removed(mapper, connection, target):
+    _bump_content_version(connection, target.course_id)
+
+
+@db.event.listens_for(Module, 'after_update')
+def _module_changed(mapper, connection, target):
+    if not _has_column_changes(mapper, target):
+        return
+    _bump_content_version(connection, target.course_id)
+    previous = db.inspect(target).attrs.course_id.history.deleted
+    if previous and previous[0] != target.course_id:
+        _bump_content_version(connection, previous[0])
+
+
+@db.event.listens_for(ContentItem, 'before_update')
+def _content_version_changed(mapper, connection, target):
+    if db.inspect(target).attrs.version.history.has_changes():
+        target.revision = uuid.uuid4().hex
+
+
+@db.event.listens_for(ContentItem, 'after_insert')
+@db.event.listens_for(ContentItem, 'after_delete')
+def _content_added_or_removed(mapper, connection, target):
+    _bump_content_version(connection, _course_of_module(target.module_id))
+
+
+@db.event.listens_for(ContentItem, 'after_update')
+def _content_changed(mapper, connection, target):
+    if not _has_column_changes(mapper, target):
+        return
+    _bump_content_version(connection, _course_of_module(target.module_id))
+    previous = db.inspect(target).attrs.module_id.history.deleted
+    if previous and previous[0] != target.module_id:
+        _bump_content_version(connection, _course_of_module(previous[0]))
+
+
+@db.event.listens_for(QuizQuestion, 'after_insert')
+@db.event.listens_for(QuizQuestion, 'after_delete')
+def _question_added_or_removed(mapper, connection, target):
+    _bump_content_version(connection, _course_of_content(target.content_item_id))
+
+
+@db.event.listens_for(QuizQuestion, 'after_update')
+def _question_changed(mapper, connection, target):
+    if not _has_column_changes(mapper, target):
+        return
+    _bump_content_version(connection, _course_of_content(target.content_item_id))
+    previous = db.inspect(target).attrs.content_item_id.history.deleted
+    if previous and previous[0] != target.content_item_id:
+        _bump_content_version(connection, _course_of_content(previous[0]))
+
+
+@db.event.listens_for(ContentItem, 'after_insert')
+def _content_item_added(mapper, connection, target):
+    """Incrementa el total de contenidos del curso al crear un contenido."""
+    course_id = _course_id_for_module(connection, target.module_id)
+    courses = Course.__table__
+    connection.execute(
+        courses.update().where(courses.c.id == course_id).values(content_count=courses.c.content_count + 1)
+    )
+
+
+@db.event.listens_for(db.session, 'before_flush')
+def _content_items_removed(session, flush_context, instances):
+    """Descuenta los contenidos eliminados del total del curso y de las inscripciones que los completaron.
+
+    Se hace antes del flush porque las respuestas de los estudiantes se eliminan en cascada.
+    El progreso guardado de las inscripciones lo actualiza el recálculo periódico; mientras
+    tanto se muestra el calculado con los contadores (`CourseEnrollment.get_progress`).
+    """
+    removed = [obj for obj in session.deleted if isinstance(obj, ContentItem)]
+    if not removed:
+        return
+    connection = session.connection()
+    courses = Course.__table__
+    enrollments = CourseEnrollment.__table__
+    responses = StudentResponse.__table__
+    for content_item in removed:
+        course_id = _course_id_for_module(connection, content_item.module_id)
+        connection.execute(
+            courses.update().where(courses.c.id == course_id).values(content_count=courses.c.content_count - 1)
+        )
+        completed_by = db.select(responses.c.student_id).where(
+            responses.c.content_item_id == content_item.id, responses.c.completed == True
+        ).distinct()
+        connection.execute(
+            enrollments.update().where(
+                enrollments.c.course_id == course_id, enrollments.c.student_id.in_(completed_by)
+            ).values(completed_items=enrollments.c.completed_items - 1)
+        )
+
+
+def _update_metrics(connection, course_id, student_id=None, **deltas):
+    """Aplica incrementos atómicos a la fila de métricas de un curso.
+
+    Con `student_id` solo se aplican si el estudiante está inscrito en el curso: la nota
+    media cuenta únicamente las respuestas de los inscritos.
+    """
+    metrics = CourseMetrics.__table__
+    values = {name: metrics.c[name] + delta for name, delta in deltas.items()}
+    values['updated_at'] = datetime.utcnow()
+    statement = metrics.update().where(metrics.c.course_id == course_id)
+    if student_id is not None:
+        enrollments = CourseEnrollment.__table__
+        statement = statement.where(db.exists().where(
+            enrollments.c.student_id == student_id, enrollments.c.course_id == course_id
+        ))
+    connection.execute(statement.values(**values))
+
+
+def scores_in_course(course_id, student_id=None):
+    """Subconsultas (suma, número) de las notas del curso de los estudiantes inscritos, o de uno de ellos."""
+    responses = StudentResponse.__table__
+    query = db.select(responses.c.score).join(
+        ContentItem.__table__, ContentItem.__table__.c.id == responses.c.content_item_id
+    ).join(
+        Module.__table__, Module.__table__.c.id == ContentItem.__table__.c.module_id
+    ).where(Module.__table__.c.course_id == course_id, responses.c.score.isnot(None))
+    if student_id is not None:
+        query = query.where(responses.c.student_id == student_id)
+    else:
+        enrollments = CourseEnrollment.__table__
+        query = query.where(db.exists().where(
+            enrollments.c.student_id == responses.c.student_id, enrollments.c.course_id == course_id
+        ))
+    scores = query.subquery()
+    return (
+        db.select(db.func.coalesce(db.func.sum(scores.c.score), 0.0)).scalar_subquery(),
+        db.select(db.func.count(scores.c.score)).scalar_subquery(),
+    )
+
+
+def _course_id_for_content(connection, content_item_id):
+    return connection.execute(
+        db.select(Module.course_id).join(ContentItem, ContentItem.module_id == Module.id)
+        .where(ContentItem.id == content_item_id)
+    ).scalar()
+
+
+@db.event.listens_for(Course, 'after_insert')
+def _course_added(mapper, connection, target):
+    """Crea la fila de métricas vacía de un curso nuevo."""
+    connection.execute(CourseMetrics.__table__.insert().values(
+        course_id=target.id, instructor_id=target.instructor_id, updated_at=datetime.utcnow()
+    ))
+
+
+@db.event.listens_for(CourseEnrollment, 'after_insert')
+def _enrollment_added(mapper, connection, target):
+    """Suma el estudiante y sus notas previas en el curso (si se vuelve a inscribir)."""
+    score_sum, score_count = scores_in_course(target.course_id, target.student_id)
+    _update_metrics(connection, target.course_id, total_students=1, completed_students=1 if target.completed else 0,
+                    score_sum=score_sum, score_count=score_count)
+
+
+@db.event.listens_for(CourseEnrollment, 'after_delete')
+def _enrollment_removed(mapper, connection, target):
+    """Resta el estudiante y sus notas en el curso, que se conservan pero ya no cuentan."""
+    score_sum, score_count = scores_in_course(target.course_id, target.student_id)
+    _update_metrics(connection, target.course_id, total_students=-1, completed_students=-1 if target.completed else 0,
+                    score_sum=-score_sum, score_count=-score_count)
+
+
+@db.event.listens_for(CourseEnrollment, 'after_update')
+def _enrollment_changed(mapper, connection, target):
+    history = db.inspect(target).attrs.completed.history
+    if history.has_changes():
+        was_completed = bool(history.deleted and history.deleted[0])
+        if bool(target.completed) != was_completed:
+            _update_metrics(connection, target.course_id, completed_students=1 if target.completed else -1)
+
+
+def _save_attempt_summary(connection, values, on_conflict):
+    """Inserta el resumen o, si ya existe, aplica `on_conflict(tabla, excluded)` en la misma sentencia.
+
+    En motores sin upsert se actualiza y, si no había fila, se inserta.
+    """
+    table = QuizAttemptSummary.__table__
+    dialect = {'sqlite': sqlite, 'postgresql': postgresql}.get(connection.dialect.name)
+    if dialect is not None:
+        statement = dialect.insert(table).values(**values)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.student_id, table.c.quiz_id],
+            set_=on_conflict(table, statement.excluded),
+        ))
+        return
+    key = db.and_(table.c.student_id == values['student_id'], table.c.quiz_id == values['quiz_id'])
+    new = SimpleNamespace(**{name: db.literal(value, table.c[name].type) for name, value in values.items()})
+    if not connection.execute(db.update(table).where(key).values(**on_conflict(table, new))).rowcount:
+        connection.execute(db.insert(table).values(**values))
+
+
+def _record_attempt(connection, target, course_id):
+    """Suma un intento al resumen del estudiante en el quiz (upsert atómico)."""
+    _save_attempt_summary(connection, {
+        'student_id': target.student_id,
+        'quiz_id': target.content_item_id,
+        'course_id': course_id,
+        'best_score': target.score,
+        'attempt_count': 1,
+        'last_attempt_at': datetime.utcnow(),
+        'passed': target.score >= QUIZ_PASSING_SCORE,
+    }, lambda table, new: {
+        'best_score': db.case((new.best_score > table.c.best_score, new.best_score), else_=table.c.best_score),
+        'attempt_count': table.c.attempt_count + 1,
+        'last_attempt_at': new.last_attempt_at,
+        'passed': db.or_(table.c.passed, new.passed),
+    })
+
+
+def _rebuild_attempt_summary(connection, student_id, quiz_id, course_id):
+    """Recalcula el resumen de un estudiante en un quiz cuando cambia o se borra una nota."""
+    responses = StudentResponse.__table__
+    attempts, best_score, last_attempt_at = connection.execute(
+        db.select(db.func.count(), db.func.max(responses.c.score), db.func.max(responses.c.completion_date))
+        .where(responses.c.student_id == student_id, responses.c.content_item_id == quiz_id,
+               responses.c.score.isnot(None))
+    ).one()
+    table = QuizAttemptSummary.__table__
+    if not attempts:
+        connection.execute(db.delete(table).where(table.c.student_id == student_id, table.c.quiz_id == quiz_id))
+        return
+    values = {
+        'student_id': student_id,
+        'quiz_id': quiz_id,
+        'course_id': course_id,
+        'best_score': best_score,
+        'attempt_count': attempts,
+        'last_attempt_at': last_attempt_at,
+        'passed': best_score >= QUIZ_PASSING_SCORE,
+    }
+    _save_attempt_summary(connection, values, lambda table, new: {
+        key: value for key, value in values.items() if key not in ('student_id', 'quiz_id')
+    })
+
+
+@db.event.listens_for(StudentResponse, 'after_insert')
+def _response_added(mapper, connection, target):
+    if target.score is not None:
+        course_id = _course_id_for_content(connection, target.content_item_id)
+        _update_metrics(connection, course_id, target.student_id, score_sum=target.score, score_count=1)
+        _record_attempt(connection, target, course_id)
+
+
+@db.event.listens_for(StudentResponse, 'after_delete')
+def _response_removed(mapper, connection, target):
+    if target.score is not None:
+        course_id = _course_id_for_content(connection, target.content_item_id)
+        _update_metrics(connection, course_id, target.student_id, score_sum=-target.score, score_count=-1)
+        _rebuild_attempt_summary(connection, target.student_id, target.content_item_id, course_id)
+
+
+@db.event.listens_for(StudentResponse, 'after_update')
+def _response_changed(mapper, connection, target):
+    history = db.inspect(target).attrs.score.history
+    if not history.has_changes():
+        return
+    old_score = history.deleted[0] if history.deleted else None
+    deltas = {'score_sum': (target.score or 0) - (old_score or 0), 'score_count': 0}
+    if old_score is None and target.score is not None:
+        deltas['score_count'] = 1
+    elif old_score is not None and target.score is None:
+        deltas['score_count'] = -1
+    course_id = _course_id_for_content(connection, target.content_item_id)
+    _update_metrics(connection, course_id, target.student_id, **deltas)
+    _rebuild_attempt_summary(connection, target.student_id, target.content_item_id, course_id)
@@ -0,0 +1,91 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import bcrypt
+from flask import current_app
+
+# Pool acotado para el hashing de contraseñas: el coste de bcrypt no debe ocupar todos
+# los workers de la aplicación. Se crea al primer uso con la configuración de la app.
+_lock = threading.Lock()
+_executor = None
+_slots = None
+
+
+class PasswordHasherBusy(Exception):
+    """El pool de hashing y su cola están llenos; la petición debe rechazarse (503)."""
+
+
+def _pool():
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            workers = current_app.config.get('PASSWORD_HASH_WORKERS', 4)
+            queue = current_app.config.get('PASSWORD_HASH_QUEUE', 16)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+            _slots = threading.BoundedSemaphore(workers + queue)
+        return _executor, _slots
+
+
+def _run(func, *args):
+    """Ejecuta `func` en el pool, rechazando de inmediato si no quedan plazas en la cola."""
+    executor, slots = _pool()
+    if not slots.acquire(blocking=False):
+        raise PasswordHasherBusy()
+    try:
+        future = executor.submit(func, *args)
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=current_app.config.get('PASSWORD_HASH_TIMEOUT', 10))
+    except FutureTimeoutError:
+        raise PasswordHasherBusy()
+
+
+def hash_with_rounds(password, rounds):
+    """Hash bcrypt de `password` (bytes) con el coste indicado; función de módulo para poder usarla en procesos."""
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(password_hash, password):
+    try:
+        return bcrypt.checkpw(password, password_hash)
+    except ValueError:
+        return False
+
+
+def configured_rounds():
+    return current_app.config.get('BCRYPT_LOG_ROUNDS', 12)
+
+
+def hash_password(password):
+    """Genera el hash bcrypt de la contraseña con el coste configurado."""
+    return _run(hash_with_rounds, password.encode('utf-8'), configured_rounds())
+
+
+def check_password(password_hash, password):
+    """Comprueba la contraseña contra su hash bcrypt."""
+    return _run(_check, password_hash.encode('utf-8'), password.encode('utf-8'))
+
+
+def needs_rehash(password_hash):
+    """Indica si el hash se generó con un coste distinto del configurado."""
+    try:
+        rounds = int(password_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != configured_rounds()
+
+
+def benchmark_rounds(rounds_range, samples=3):
+    """Mide el tiempo de un hash para cada coste. Devuelve pares (coste, milisegundos)."""
+    results = []
+    for rounds in rounds_range:
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            hash_with_rounds(b'benchmark-password', rounds)
+            timings.append((time.perf_counter() - start) * 1000)
+        results.append((rounds, min(timings)))
+    return results
@@ -0,0 +1,137 @@
+from sqlalchemy import func, or_, exists, and_, update
+from models import db, Course, Module, ContentItem, CourseEnrollment, StudentResponse
+from metrics import refresh_course_metrics
+
+# Tamaño de cada lote de actualizaciones masivas
+BATCH_SIZE = 1000
+
+
+def _completed_by_course():
+    """Contenidos completados (distintos) y última fecha de finalización por estudiante y curso."""
+    return db.session.query(
+        StudentResponse.student_id.label('student_id'),
+        Module.course_id.label('course_id'),
+        func.count(func.distinct(StudentResponse.content_item_id)).label('completed_content'),
+        func.max(StudentResponse.completion_date).label('last_completion'),
+    ).join(
+        ContentItem, ContentItem.id == StudentResponse.content_item_id
+    ).join(
+        Module, Module.id == ContentItem.module_id
+    ).filter(
+        StudentResponse.completed == True
+    ).group_by(StudentResponse.student_id, Module.course_id).subquery()
+
+
+def _total_by_course():
+    """Número total de contenidos por curso."""
+    return db.session.query(
+        Module.course_id.label('course_id'),
+        func.count(ContentItem.id).label('total_content'),
+    ).join(
+        ContentItem, ContentItem.module_id == Module.id
+    ).group_by(Module.course_id).subquery()
+
+
+def _touched_since(since):
+    """Filtro de inscripciones creadas, con respuestas completadas o de cursos con contenidos cambiados desde `since`."""
+    recent_response = exists().where(and_(
+        StudentResponse.student_id == CourseEnrollment.student_id,
+        StudentResponse.completed == True,
+        StudentResponse.completion_date >= since,
+        ContentItem.id == StudentResponse.content_item_id,
+        Module.id == ContentItem.module_id,
+        Module.course_id == CourseEnrollment.course_id,
+    ))
+    content_changed = exists().where(and_(
+        Course.id == CourseEnrollment.course_id,
+        Course.updated_at >= since,
+    ))
+    return or_(CourseEnrollment.enrollment_date >= since, recent_response, content_changed)
+
+
+def reconcile_course_content_counts(dry_run=False):
+    """Corrige `Course.content_count` cuando difiere del número real de contenidos.
+
+    Devuelve el número de cursos con desviación.
+    """
+    totals = _total_by_course()
+    query = db.session.query(
+        Course.id, Course.content_count, func.coalesce(totals.c.total_content, 0)
+    ).outerjoin(totals, totals.c.course_id == Course.id)
+
+    changes = [
+        {'id': course_id, 'content_count': actual}
+        for course_id, stored, actual in query
+        if stored != actual
+    ]
+    if not dry_run:
+        for start in range(0, len(changes), BATCH_SIZE):
+            db.session.execute(update(Course), changes[start:start + BATCH_SIZE])
+            db.session.commit()
+    return len(changes)
+
+
+def recompute_enrollment_progress(since=None, job=None, dry_run=False, course_ids=None):
+    """Recalcula `completed_items`, `progress`, `completed` y `completion_date` de las inscripciones.
+
+    Usa dos consultas agrupadas y actualizaciones masivas por lotes. Si se indica
+    `since`, solo se procesan las inscripciones tocadas desde esa fecha, y si se
+    indica `course_ids`, solo las de esos cursos.
+    Devuelve el número de inscripciones con desviación (corregidas salvo en `dry_run`).
+    """
+    completed = _completed_by_course()
+    totals = _total_by_course()
+
+    query = db.session.query(
+        CourseEnrollment.id,
+        CourseEnrollment.progress,
+        CourseEnrollment.completed,
+        CourseEnrollment.completion_date,
+        CourseEnrollment.completed_items,
+        func.coalesce(completed.c.completed_content, 0),
+        func.coalesce(totals.c.total_content, 0),
+        completed.c.last_completion,
+    ).outerjoin(
+        completed, and_(
+            completed.c.student_id == CourseEnrollment.student_id,
+            completed.c.course_id == CourseEnrollment.course_id,
+        )
+    ).outerjoin(
+        totals, totals.c.course_id == CourseEnrollment.course_id
+    )
+    if since is not None:
+        query = query.filter(_touched_since(since))
+    if course_ids is not None:
+        query = query.filter(CourseEnrollment.course_id.in_(course_ids))
+
+    changes = []
+    for enrollment_id, progress, is_completed, completion_date, completed_items, done, total, last_completion in query:
+        new_progress = done * 100.0 / total if total > 0 else 0
+        new_completed = new_progress == 100
+        if new_completed:
+            new_completion_date = completion_date or last_completion
+        else:
+            new_completion_date = None
+        current = (completed_items, round(progress or 0, 6), bool(is_completed), completion_date)
+        if current != (done, round(new_progress, 6), new_completed, new_completion_date):
+            changes.append({
+                'id': enrollment_id,
+                'completed_items': done,
+                'progress': new_progress,
+                'completed': new_completed,
+                'completion_date': new_completion_date,
+            })
+
+    if dry_run:
+        return len(changes)
+    if job:
+        job.report(0, len(changes))
+    for start in range(0, len(changes), BATCH_SIZE):
+        db.session.execute(update(CourseEnrollment), changes[start:start + BATCH_SIZE])
+        db.session.commit()
+        if job:
+            job.report(min(start + BATCH_SIZE, len(changes)))
+    if changes:
+        refresh_course_metrics(course_ids)
+
+    return len(changes)
@@ -0,0 +1,109 @@
+import sqlite3
+from models import (db, Course, Module, ContentItem, QuizQuestion, CourseEnrollment, StudentResponse,
+                    ModuleCompletion, QuizAttemptSummary)
+
+# Consultas de las rutas más visitadas, construidas como en la aplicación. `check_query_plans`
+# las pasa por EXPLAIN QUERY PLAN y señala las que recorren una tabla entera: sirve para
+# comprobar, tras una migración o un cambio en una consulta, que todas siguen usando índices.
+# Los planes se piden a una copia vacía del esquema, sin estadísticas: con tablas pequeñas,
+# ANALYZE lleva al planificador a preferir recorridos y el resultado dependería de los datos.
+
+
+def _hot_queries(ids):
+    student_id, course_id, module_id, content_id, quiz_id, instructor_id = (
+        ids['student'], ids['course'], ids['module'], ids['content'], ids['quiz'], ids['instructor']
+    )
+    completed_response = db.select(StudentResponse.id).where(
+        StudentResponse.content_item_id == ContentItem.id,
+        StudentResponse.student_id == student_id,
+        StudentResponse.completed == True,
+    )
+    return {
+        'validación de la página del curso (ETag)': db.select(
+            Course.content_version, Course.updated_at, CourseEnrollment.id, CourseEnrollment.completed
+        ).outerjoin(CourseEnrollment, db.and_(
+            CourseEnrollment.course_id == Course.id, CourseEnrollment.student_id == student_id
+        )).where(Course.id == course_id),
+        'módulos de un curso': db.select(Module).where(Module.course_id == course_id).order_by(Module.order),
+        'contenidos de un módulo': db.select(ContentItem).where(
+            ContentItem.module_id == module_id
+        ).order_by(ContentItem.order),
+        'preguntas de un quiz': db.select(QuizQuestion).where(QuizQuestion.content_item_id == quiz_id),
+        'cursos del estudiante': db.select(CourseEnrollment).where(CourseEnrollment.student_id == student_id),
+        'estudiantes de un curso': db.select(CourseEnrollment).where(CourseEnrollment.course_id == course_id),
+        'cursos del instructor': db.select(Course).where(Course.instructor_id == instructor_id),
+        'contenido ya completado': db.select(db.exists().where(
+            StudentResponse.student_id == student_id,
+            StudentResponse.content_item_id == content_id,
+            StudentResponse.completed == True,
+        )),
+        'contenidos pendientes del módulo': db.select(db.exists().where(
+            ContentItem.module_id == module_id, ~completed_response.exists()
+        )),
+        'intentos de un quiz (recalificación)': db.select(StudentResponse.id, StudentResponse.score).where(
+            StudentResponse.content_item_id == quiz_id, StudentResponse.id > 0
+        ).order_by(StudentResponse.id).limit(500),
+        'resúmenes de intentos del estudiante': db.select(QuizAttemptSummary).where(
+            QuizAttemptSummary.student_id == student_id
+        ),
+        'resúmenes de un quiz': db.select(QuizAttemptSummary).where(QuizAttemptSummary.quiz_id == quiz_id),
+        'finalizaciones de un módulo': db.select(ModuleCompletion).where(ModuleCompletion.module_id == module_id),
+    }
+
+
+def _sample_ids():
+    """Ids existentes para las consultas (1 si la tabla está vacía); el plan no depende del valor."""
+    def first(column, *criteria):
+        return db.session.execute(db.select(column).where(*criteria).limit(1)).scalar() or 1
+
+    return {
+        'student': first(CourseEnrollment.student_id),
+        'course': first(Course.id),
+        'module': first(Module.id),
+        'content': first(ContentItem.id),
+        'quiz': first(ContentItem.id, ContentItem.type == 'quiz'),
+        'instructor': first(Course.instructor_id),
+    }
+
+
+def _is_full_scan(detail):
+    # "SCAN tabla" sin índice; las subconsultas materializadas y las filas constantes no cuentan
+    return (detail.startswith('SCAN ') and ' USING ' not in detail
+            and not detail.startswith(('SCAN CONSTANT ROW', 'SCAN (subquery')))
+
+
+def _schema_copy(connection):
+    """Base de datos en memoria con las tablas e índices de la actual (sin filas ni estadísticas)."""
+    rows = connection.exec_driver_sql(
+        "SELECT name, sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+        "ORDER BY type = 'index'"
+    ).all()
+    # Las tablas virtuales (FTS) crean sus propias tablas internas y no intervienen en estos planes
+    virtual = [name for name, sql in rows if sql.upper().startswith('CREATE VIRTUAL')]
+    copy = sqlite3.connect(':memory:')
+    for name, sql in rows:
+        if not any(name == table or name.startswith(f'{table}_') for table in virtual):
+            copy.execute(sql)
+    return copy
+
+
+def check_query_plans():
+    """Devuelve [(nombre, líneas del plan, recorridos completos)] de cada consulta caliente.
+
+    Solo aplica a SQLite; con otro motor devuelve una lista vacía.
+    """
+    connection = db.session.connection()
+    if connection.dialect.name != 'sqlite':
+        return []
+    queries = _hot_queries(_sample_ids())
+    schema = _schema_copy(connection)
+    results = []
+    try:
+        for name, statement in queries.items():
+            compiled = statement.compile(dialect=connection.dialect, compile_kwargs={'render_postcompile': True})
+            params = tuple(compiled.params[key] for key in compiled.positiontup)
+            plan = [row[3] for row in schema.execute(f'EXPLAIN QUERY PLAN {compiled.string}', params)]
+            results.append((name, plan, [detail for detail in plan if _is_full_scan(detail)]))
+    finally:
+        schema.close()
+    return results
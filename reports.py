@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+from models import db, Course, Module, ContentItem, CourseEnrollment, StudentResponse
+
+# Filas leídas del cursor en cada lote al exportar
+EXPORT_BATCH_SIZE = 1000
+COMPLETED_COURSES_COLUMNS = ['response_id', 'course_id', 'course_name', 'module_title', 'student_id', 'completion_date']
+
+
+def completed_courses_query(instructor_id, start_date, end_date):
+    """Respuestas completadas de los estudiantes que finalizaron un curso del instructor en el rango.
+
+    Es una única consulta con joins ordenada por el id de la respuesta, lo que permite
+    paginar por cursor (keyset) y exportar en streaming.
+    """
+    return db.session.query(
+        StudentResponse.id.label('response_id'),
+        Course.id.label('course_id'),
+        Course.name.label('course_name'),
+        Module.title.label('module_title'),
+        StudentResponse.student_id.label('student_id'),
+        StudentResponse.completion_date.label('completion_date'),
+    ).join(
+        ContentItem, ContentItem.id == StudentResponse.content_item_id
+    ).join(
+        Module, Module.id == ContentItem.module_id
+    ).join(
+        Course, Course.id == Module.course_id
+    ).join(
+        CourseEnrollment, db.and_(
+            CourseEnrollment.course_id == Course.id,
+            CourseEnrollment.student_id == StudentResponse.student_id,
+        )
+    ).filter(
+        Course.instructor_id == instructor_id,
+        CourseEnrollment.completed == True,
+        CourseEnrollment.completion_date >= start_date,
+        CourseEnrollment.completion_date < end_date,
+        StudentResponse.completed == True,
+    ).order_by(StudentResponse.id)
+
+
+def keyset_page(query, key_column, key_name, after=None, per_page=50):
+    """Devuelve una página de `query` posterior al cursor `after` y el cursor siguiente.
+
+    `key_column` es la columna por la que está ordenada la consulta y `key_name`
+    el nombre con el que aparece en cada fila.
+    """
+    if after is not None:
+        query = query.filter(key_column > after)
+    rows = query.limit(per_page + 1).all()
+    next_cursor = getattr(rows[per_page - 1], key_name) if len(rows) > per_page else None
+    return rows[:per_page], next_cursor
+
+
+def prefix_match(column, prefix):
+    """Búsqueda por prefijo expresada como rango para que pueda usar el índice de la columna."""
+    return db.and_(column >= prefix, column < prefix + '\U0010ffff')
+
+
+def _stream_rows(query):
+    return query.execution_options(stream_results=True).yield_per(EXPORT_BATCH_SIZE)
+
+
+def _serialize(row):
+    data = row._asdict()
+    if data['completion_date'] is not None:
+        data['completion_date'] = data['completion_date'].isoformat()
+    return data
+
+
+def stream_csv(query, columns):
+    """Generador de líneas CSV a partir de una consulta, sin cargarla en memoria."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in _stream_rows(query):
+        data = _serialize(row)
+        writer.writerow([data[column] for column in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+def stream_jsonl(query):
+    """Generador de líneas JSON (JSON Lines) a partir de una consulta."""
+    for row in _stream_rows(query):
+        yield json.dumps(_serialize(row), ensure_ascii=False) + '\n'
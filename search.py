@@ -0,0 +1,165 @@
+import re
+from markupsafe import Markup, escape
+from sqlalchemy import text
+from models import db, Course, Module, ContentItem
+
+# Índice de búsqueda de texto completo (SQLite FTS5) sobre cursos, módulos y contenidos.
+# El rowid codifica el tipo y el id del objeto para actualizar y borrar sin recorrer el índice.
+KINDS = {'course': 1, 'module': 2, 'content': 3}
+_KIND_NAMES = {code: name for name, code in KINDS.items()}
+
+CREATE_SEARCH_INDEX = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        title, body, course_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2'
+    )
+"""
+# Marcadores de resaltado; se sustituyen por <mark> después de escapar el fragmento
+_HIGHLIGHT_START, _HIGHLIGHT_END = '\x02', '\x03'
+
+
+def _rowid(kind, ref_id):
+    return ref_id * 4 + KINDS[kind]
+
+
+def _is_sqlite(connection):
+    return connection.dialect.name == 'sqlite'
+
+
+def _index_document(connection, kind, ref_id, course_id, title, body):
+    rowid = _rowid(kind, ref_id)
+    connection.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), {'rowid': rowid})
+    connection.execute(
+        text("INSERT INTO search_index (rowid, title, body, course_id) VALUES (:rowid, :title, :body, :course_id)"),
+        {'rowid': rowid, 'title': title or '', 'body': body or '', 'course_id': course_id},
+    )
+
+
+def _content_body(content_item):
+    return content_item.content if content_item.type == 'text' else None
+
+
+def ensure_search_index():
+    """Crea la tabla virtual del índice si no existe."""
+    if _is_sqlite(db.session.connection()):
+        db.session.execute(text(CREATE_SEARCH_INDEX))
+        db.session.commit()
+
+
+def rebuild_search_index():
+    """Reconstruye el índice completo a partir de los datos existentes. Devuelve los documentos indexados."""
+    connection = db.session.connection()
+    if not _is_sqlite(connection):
+        return 0
+    connection.execute(text(CREATE_SEARCH_INDEX))
+    connection.execute(text("DELETE FROM search_index"))
+
+    documents = []
+    for course_id, name, description in db.session.query(Course.id, Course.name, Course.description):
+        documents.append({'rowid': _rowid('course', course_id), 'title': name, 'body': description,
+                          'course_id': course_id})
+    for module_id, title, description, course_id in db.session.query(
+        Module.id, Module.title, Module.description, Module.course_id
+    ):
+        documents.append({'rowid': _rowid('module', module_id), 'title': title, 'body': description,
+                          'course_id': course_id})
+    for content_id, title, content_type, content, course_id in db.session.query(
+        ContentItem.id, ContentItem.title, ContentItem.type, ContentItem.content, Module.course_id
+    ).join(Module, Module.id == ContentItem.module_id):
+        documents.append({'rowid': _rowid('content', content_id), 'title': title,
+                          'body': content if content_type == 'text' else '', 'course_id': course_id})
+
+    if documents:
+        connection.execute(
+            text("INSERT INTO search_index (rowid, title, body, course_id) VALUES (:rowid, :title, :body, :course_id)"),
+            documents,
+        )
+    db.session.commit()
+    return len(documents)
+
+
+def _match_expression(query):
+    """Convierte el texto del usuario en una expresión FTS5 segura (términos por prefijo)."""
+    terms = re.findall(r'\w+', query, flags=re.UNICODE)
+    return ' '.join('"{}"*'.format(term) for term in terms)
+
+
+def _highlight(snippet):
+    """Escapa el fragmento y convierte los marcadores de coincidencia en <mark>."""
+    escaped = str(escape(snippet or ''))
+    return Markup(escaped.replace(_HIGHLIGHT_START, '<mark>').replace(_HIGHLIGHT_END, '</mark>'))
+
+
+def search(query, student_id, page=1, per_page=20):
+    """Busca en el índice y devuelve resultados ordenados por relevancia con fragmentos resaltados.
+
+    Los cursos aparecen siempre (son los del catálogo), pero los módulos y lecciones solo si el
+    estudiante está inscrito en su curso; cada resultado indica si lo está (`enrolled`). Devuelve la lista de resultados de la página y si
+    existe una página siguiente.
+    """
+    expression = _match_expression(query)
+    connection = db.session.connection()
+    if not expression or not _is_sqlite(connection):
+        return [], False
+
+    rows = connection.execute(text("""
+        SELECT search_index.rowid, search_index.title, search_index.course_id, courses.name,
+               snippet(search_index, 1, :start, :end, '…', 16),
+               search_index.course_id IN (
+                   SELECT course_id FROM course_enrollments WHERE student_id = :student_id
+               ) AS enrolled
+        FROM search_index
+        JOIN courses ON courses.id = search_index.course_id
+        WHERE search_index MATCH :expression
+          AND (search_index.rowid % 4 = :course_kind OR enrolled)
+        ORDER BY rank
+        LIMIT :limit OFFSET :offset
+    """), {
+        'expression': expression, 'start': _HIGHLIGHT_START, 'end': _HIGHLIGHT_END,
+        'course_kind': KINDS['course'], 'student_id': student_id,
+        'limit': per_page + 1, 'offset': (page - 1) * per_page,
+    }).all()
+
+    results = [{
+        'kind': _KIND_NAMES[rowid % 4],
+        'id': rowid // 4,
+        'title': title,
+        'course_id': course_id,
+        'course_name': course_name,
+        'snippet': _highlight(snippet),
+        'enrolled': bool(enrolled),
+    } for rowid, title, course_id, course_name, snippet, enrolled in rows[:per_page]]
+    return results, len(rows) > per_page
+
+
+# Sincronización incremental del índice con los cambios del ORM
+@db.event.listens_for(Course, 'after_insert')
+@db.event.listens_for(Course, 'after_update')
+def _index_course(mapper, connection, target):
+    if _is_sqlite(connection):
+        _index_document(connection, 'course', target.id, target.id, target.name, target.description)
+
+
+@db.event.listens_for(Module, 'after_insert')
+@db.event.listens_for(Module, 'after_update')
+def _index_module(mapper, connection, target):
+    if _is_sqlite(connection):
+        _index_document(connection, 'module', target.id, target.course_id, target.title, target.description)
+
+
+@db.event.listens_for(ContentItem, 'after_insert')
+@db.event.listens_for(ContentItem, 'after_update')
+def _index_content(mapper, connection, target):
+    if _is_sqlite(connection):
+        course_id = connection.execute(
+            db.select(Module.course_id).where(Module.id == target.module_id)
+        ).scalar()
+        _index_document(connection, 'content', target.id, course_id, target.title, _content_body(target))
+
+
+@db.event.listens_for(Course, 'after_delete')
+@db.event.listens_for(Module, 'after_delete')
+@db.event.listens_for(ContentItem, 'after_delete')
+def _unindex(mapper, connection, target):
+    if _is_sqlite(connection):
+        kind = {Course: 'course', Module: 'module', ContentItem: 'content'}[mapper.class_]
+        connection.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), {'rowid': _rowid(kind, target.id)})
@@ -0,0 +1,195 @@
+import os
+import random
+import tempfile
+import threading
+import time
+from flask import current_app, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+
+# Perfil de SQLite para producción. Cada conexión usa WAL (los lectores no esperan al escritor),
+# `synchronous=NORMAL`, caché de páginas, mmap, `busy_timeout` y claves foráneas. Las escrituras
+# pasan por el motor principal, cuyas transacciones empiezan con BEGIN IMMEDIATE: toman el bloqueo
+# de escritura al empezar, donde `busy_timeout` las pone en cola, en lugar de fallar con
+# "database is locked" al intentar pasar de lectura a escritura. Las lecturas usan un pool aparte
+# de conexiones de solo lectura hasta que la transacción de la sesión escribe (flush o
+# UPDATE/INSERT/DELETE), así que el bloqueo de escritura solo se toma al escribir y no se mantiene
+# mientras se verifica una contraseña o se recibe un archivo. Lo que decide una escritura se
+# calcula en la propia sentencia (el siguiente orden) o se lee después de la primera escritura
+# (el intento de quiz se retira antes de comprobar sus límites).
+READER_EXTENSION = 'sqlite_reader'
+
+
+def _apply_pragmas(dbapi_connection, pragmas, read_only):
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+    if read_only:
+        cursor.execute('PRAGMA query_only = ON')
+    cursor.close()
+
+
+def profile_engine(engine, pragmas, read_only=False):
+    """Aplica los pragmas a cada conexión del motor y, si escribe, BEGIN IMMEDIATE a cada transacción."""
+    @event.listens_for(engine, 'connect')
+    def _connect(dbapi_connection, connection_record):
+        _apply_pragmas(dbapi_connection, pragmas, read_only)
+        if not read_only:
+            # El driver no abre transacciones por su cuenta: las abre el evento `begin`
+            dbapi_connection.isolation_level = None
+
+    if not read_only:
+        @event.listens_for(engine, 'begin')
+        def _begin(connection):
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+    return engine
+
+
+def init_sqlite_profile(app, db):
+    """Aplica `SQLITE_PRAGMAS` al motor de la aplicación y crea el pool de solo lectura.
+
+    No hace nada si `SQLITE_PROFILE` está desactivado o la base de datos no es un archivo SQLite.
+    """
+    if not app.config.get('SQLITE_PROFILE'):
+        return
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+        return
+    pragmas = app.config['SQLITE_PRAGMAS']
+    profile_engine(engine, pragmas)
+    reader = create_engine(engine.url, pool_size=app.config.get('SQLITE_READ_POOL_SIZE', 5))
+    app.extensions[READER_EXTENSION] = profile_engine(reader, pragmas, read_only=True)
+
+
+def _reads_only(clause):
+    if clause is None:
+        # `session.connection()` sin sentencia: solo se considera de lectura en peticiones GET
+        return has_request_context() and request.method in ('GET', 'HEAD')
+    return getattr(clause, 'is_select', False)
+
+
+class RoutingSession(Session):
+    """Sesión que envía las lecturas al pool de solo lectura hasta que su transacción escribe.
+
+    Desde la primera escritura (flush, UPDATE/INSERT/DELETE o `connection()` fuera de un GET)
+    todo va al motor principal, para que la transacción lea lo que ella misma escribió.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not self.info.get('writing') and has_app_context():
+            reader = current_app.extensions.get(READER_EXTENSION)
+            if reader is not None and _reads_only(clause):
+                return reader
+        self.info['writing'] = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _transaction_ended(session, transaction):
+    # Confirmada o deshecha, las lecturas siguientes ya ven los datos en el pool de lectura
+    if transaction.parent is None:
+        session.info.pop('writing', None)
+
+
+def run_maintenance(engine):
+    """Vuelca el WAL a la base de datos y lo trunca, y actualiza las estadísticas del planificador.
+
+    Devuelve (páginas volcadas, páginas pendientes por lectores activos, filas con claves
+    foráneas rotas).
+    """
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        busy, log_pages, checkpointed = cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+        cursor.execute('PRAGMA optimize')
+        broken = len(cursor.execute('PRAGMA foreign_key_check').fetchall())
+        cursor.close()
+    finally:
+        connection.close()
+    pending = max(log_pages - checkpointed, 0) if log_pages >= 0 else 0
+    return max(checkpointed, 0), pending, broken
+
+
+def _seed_benchmark(engine, students, rows):
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            'CREATE TABLE responses (id INTEGER PRIMARY KEY, student_id INTEGER NOT NULL, score REAL NOT NULL)'
+        )
+        connection.exec_driver_sql('CREATE INDEX ix_responses_student ON responses (student_id)')
+        connection.exec_driver_sql(
+            'CREATE TABLE summaries (student_id INTEGER PRIMARY KEY, attempts INTEGER NOT NULL, best REAL NOT NULL)'
+        )
+        connection.exec_driver_sql(
+            'INSERT INTO summaries (student_id, attempts, best) VALUES (?, 0, 0)',
+            [(student,) for student in range(students)],
+        )
+        connection.exec_driver_sql(
+            'INSERT INTO responses (student_id, score) VALUES (?, ?)',
+            [(random.randrange(students), random.uniform(0, 10)) for _ in range(rows)],
+        )
+
+
+def benchmark(pragmas, profiled, threads=8, seconds=5.0, write_ratio=0.2, students=500):
+    """Mide lecturas y escrituras por segundo con carga mixta sobre una base de datos temporal.
+
+    Cada escritura es un intento de quiz (INSERT de la respuesta y UPDATE del resumen en una
+    transacción); cada lectura, el historial y el resumen de un estudiante. Sin perfil se usan
+    los valores por defecto de SQLite y un solo motor. Devuelve un dict con las operaciones
+    completadas y los errores "database is locked".
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+        writer = create_engine(url, pool_size=threads)
+        reader = writer
+        if profiled:
+            profile_engine(writer, pragmas)
+            reader = profile_engine(create_engine(url, pool_size=threads), pragmas, read_only=True)
+        _seed_benchmark(writer, students, students * 20)
+
+        counts = {'reads': 0, 'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def worker():
+            done = {'reads': 0, 'writes': 0, 'errors': 0}
+            while time.perf_counter() < deadline:
+                student = random.randrange(students)
+                try:
+                    if random.random() < write_ratio:
+                        score = random.uniform(0, 10)
+                        with writer.begin() as connection:
+                            connection.exec_driver_sql(
+                                'INSERT INTO responses (student_id, score) VALUES (?, ?)', (student, score)
+                            )
+                            connection.exec_driver_sql(
+                                'UPDATE summaries SET attempts = attempts + 1, best = max(best, ?) '
+                                'WHERE student_id = ?', (score, student)
+                            )
+                        done['writes'] += 1
+                    else:
+                        with reader.connect() as connection:
+                            connection.exec_driver_sql(
+                                'SELECT count(*), avg(score) FROM responses WHERE student_id = ?', (student,)
+                            ).fetchall()
+                            connection.exec_driver_sql(
+                                'SELECT attempts, best FROM summaries WHERE student_id = ?', (student,)
+                            ).fetchall()
+                        done['reads'] += 1
+                except OperationalError:
+                    done['errors'] += 1
+            with lock:
+                for key, value in done.items():
+                    counts[key] += value
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        counts['elapsed'] = time.perf_counter() - started
+        writer.dispose()
+        reader.dispose()
+    return counts
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# La aplicación se configura al importarla: la base de datos de las pruebas se fija antes
+import config
+
+_database_dir = tempfile.mkdtemp(prefix='cursos-tests-')
+DATABASE_PATH = os.path.join(_database_dir, 'cursos.db')
+config.Config.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + DATABASE_PATH
+config.Config.BCRYPT_LOG_ROUNDS = 4
+config.Config.UPLOAD_STORE = os.path.join(_database_dir, 'uploads')
+
+from app import app as flask_app, init_db  # noqa: E402
+from models import (db, Role, User, Course, Module, ContentItem, QuizQuestion, CourseEnrollment,  # noqa: E402
+                    StudentResponse)
+
+STUDENTS = 6
+COURSES = 3
+MODULES_PER_COURSE = 3
+ITEMS_PER_MODULE = 4
+
+
+def _seed():
+    """Instructor, estudiantes, cursos con módulos, contenidos y quizzes, inscripciones y respuestas."""
+    roles = {role.name: role for role in Role.query.all()}
+    instructor = User(username='instructor', email='instructor@example.com', password='x',
+                      role=roles['instructor'])
+    students = [User(username=f'student{i}', email=f'student{i}@example.com', password='x',
+                     role=roles['student']) for i in range(STUDENTS)]
+    db.session.add(instructor)
+    db.session.add_all(students)
+    db.session.flush()
+
+    for number in range(COURSES):
+        course = Course(name=f'Curso {number}', description='Descripción', instructor_id=instructor.id)
+        db.session.add(course)
+        db.session.flush()
+        for module_number in range(MODULES_PER_COURSE):
+            module = Module(title=f'Módulo {module_number}', description='Descripción',
+                            order=module_number + 1, course_id=course.id)
+            db.session.add(module)
+            db.session.flush()
+            for item_number in range(ITEMS_PER_MODULE):
+                is_quiz = item_number == ITEMS_PER_MODULE - 1
+                item = ContentItem(title=f'Contenido {item_number}', type='quiz' if is_quiz else 'text',
+                                   content='Texto de la lección', order=item_number + 1, module_id=module.id)
+                db.session.add(item)
+                db.session.flush()
+                if is_quiz:
+                    db.session.add_all(QuizQuestion(
+                        question_text=f'Pregunta {i}', question_type='multiple_choice', correct_answer='1',
+                        options='["sí", "no"]', content_item_id=item.id
+                    ) for i in range(3))
+        for student in students[:STUDENTS - 1]:
+            db.session.add(CourseEnrollment(student_id=student.id, course_id=course.id))
+    db.session.commit()
+
+    for student in students[:STUDENTS - 1]:
+        for item in ContentItem.query.filter(ContentItem.type == 'text').limit(5):
+            db.session.add(StudentResponse(student_id=student.id, content_item_id=item.id, completed=True,
+                                           completion_date=datetime.utcnow() - timedelta(days=1)))
+    db.session.commit()
+
+
+@pytest.fixture(scope='session')
+def app():
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with flask_app.app_context():
+        db.create_all()
+        init_db()
+        _seed()
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client_for(app):
+    """Cliente de pruebas con la sesión iniciada como el usuario indicado."""
+    def make(username):
+        client = app.test_client()
+        with app.app_context():
+            user = User.query.filter_by(username=username).one()
+            session_id = user.get_id()
+        with client.session_transaction() as session:
+            session['_user_id'] = session_id
+            session['_fresh'] = True
+        return client
+    return make
+
+
+@pytest.fixture
+def make_quiz(app):
+    """Crea un quiz nuevo en el último curso (con student0..student4 inscritos) y devuelve su id.
+
+    Las preguntas son de opción múltiple con la opción 1 como correcta; `tags` asigna una
+    etiqueta a cada una.
+    """
+    def make(questions=3, questions_per_attempt=None, stratify_by_tag=False, tags=None):
+        with app.app_context():
+            module = Module.query.order_by(Module.id.desc()).first()
+            quiz = ContentItem(title='Quiz de prueba', type='quiz', content='', module_id=module.id,
+                               order=module.get_next_content_order(), questions_per_attempt=questions_per_attempt,
+                               stratify_by_tag=stratify_by_tag)
+            db.session.add(quiz)
+            db.session.flush()
+            db.session.add_all(QuizQuestion(
+                question_text=f'Pregunta {i}', question_type='multiple_choice', correct_answer='1',
+                options='["sí", "no"]', tag=tags[i] if tags else None, content_item_id=quiz.id
+            ) for i in range(questions))
+            db.session.commit()
+            return quiz.id
+    return make
+
+
+@pytest.fixture
+def write_lock_free():
+    """Comprueba desde otra conexión, sin esperar, si se puede tomar el bloqueo de escritura."""
+    def check():
+        connection = sqlite3.connect(DATABASE_PATH, timeout=0, isolation_level=None)
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute('ROLLBACK')
+            return True
+        except sqlite3.OperationalError:
+            return False
+        finally:
+            connection.close()
+    return check
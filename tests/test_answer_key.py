@@ -0,0 +1,46 @@
+import pytest
+
+from grading import AnswerKey, get_answer_key
+from models import db, ContentItem, QuizQuestion
+
+
+def test_compiled_key_normalizes_answers_and_parses_options(app, make_quiz):
+    with app.app_context():
+        quiz = db.session.get(ContentItem, make_quiz(questions=2))
+        first, second = sorted(quiz.questions, key=lambda question: question.id)
+        first.correct_answer = '  Sí '
+        first.question_type = 'text'
+        db.session.commit()
+
+        key = AnswerKey.compile(quiz)
+        assert [question.answer for question in key.questions] == ['sí', '1']
+        assert key.questions[1].options == ('sí', 'no')
+        correct, total, score, graded = key.grade({f'question_{first.id}': 'SÍ', f'question_{second.id}': '2'})
+        assert (correct, total, score) == (1, 2, 5.0)
+        assert graded == [(first.id, 'SÍ', True), (second.id, '2', False)]
+
+
+def test_cached_key_is_recompiled_when_the_quiz_changes(app, make_quiz):
+    with app.app_context():
+        quiz = db.session.get(ContentItem, make_quiz(questions=2))
+        key = get_answer_key(quiz)
+        assert get_answer_key(quiz) is key
+
+        # Editar el quiz incrementa su versión, que cambia la revisión que valida la caché
+        db.session.add(QuizQuestion(question_text='Nueva', question_type='multiple_choice', correct_answer='2',
+                                    options='["sí", "no"]', content_item_id=quiz.id))
+        quiz.version += 1
+        db.session.commit()
+        assert quiz.revision != key.revision
+        new_key = get_answer_key(quiz)
+        assert new_key is not key
+        assert [question.answer for question in new_key.questions] == ['1', '1', '2']
+
+
+def test_invalid_options_are_rejected(app, make_quiz):
+    with app.app_context():
+        quiz = db.session.get(ContentItem, make_quiz(questions=1))
+        quiz.questions[0].options = '["sí", '
+        db.session.commit()
+        with pytest.raises(ValueError):
+            AnswerKey.compile(quiz)
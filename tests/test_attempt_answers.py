@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import event
+
+from models import db, User, ContentItem, StudentResponse, AttemptAnswer
+
+
+def _submit(client, quiz_id, answers):
+    assert client.get(f'/student/quiz/{quiz_id}/take').status_code == 200
+    return client.post(f'/student/quiz/{quiz_id}/take', data=answers)
+
+
+def test_submission_stores_one_row_per_question_in_one_insert(app, client_for, make_quiz):
+    quiz_id = make_quiz(questions=3)
+    with app.app_context():
+        first, second, third = sorted(db.session.get(ContentItem, quiz_id).questions, key=lambda q: q.id)
+        student_id = User.query.filter_by(username='student1').one().id
+    inserts = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('INSERT INTO ATTEMPT_ANSWERS'):
+            inserts.append(statement)
+
+    client = client_for('student1')
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        # Los campos que no son preguntas del quiz no se guardan
+        response = _submit(client, quiz_id, {f'question_{first.id}': '1', f'question_{second.id}': '2',
+                                             'csrf_token': 'x'})
+    finally:
+        with app.app_context():
+            event.remove(db.engine, 'before_cursor_execute', capture)
+    assert response.status_code == 302
+    assert len(inserts) == 1
+
+    with app.app_context():
+        attempt = StudentResponse.query.filter_by(student_id=student_id, content_item_id=quiz_id).one()
+        assert attempt.response is None
+        assert attempt.score == pytest.approx(10 / 3)
+        rows = db.session.query(AttemptAnswer.question_id, AttemptAnswer.answer, AttemptAnswer.is_correct).filter(
+            AttemptAnswer.response_id == attempt.id
+        ).order_by(AttemptAnswer.question_id).all()
+        assert rows == [(first.id, '1', True), (second.id, '2', False), (third.id, None, False)]
+
+
+def test_missed_question_is_an_indexed_query(app, client_for, make_quiz):
+    quiz_id = make_quiz(questions=2)
+    with app.app_context():
+        first, second = sorted(db.session.get(ContentItem, quiz_id).questions, key=lambda q: q.id)
+    _submit(client_for('student2'), quiz_id, {f'question_{first.id}': '1', f'question_{second.id}': '2'})
+    _submit(client_for('student3'), quiz_id, {f'question_{first.id}': '2', f'question_{second.id}': '1'})
+    with app.app_context():
+        missed = db.session.query(User.username).join(
+            StudentResponse, StudentResponse.student_id == User.id
+        ).join(AttemptAnswer, AttemptAnswer.response_id == StudentResponse.id).filter(
+            AttemptAnswer.question_id == second.id, AttemptAnswer.is_correct == False
+        ).all()
+        assert missed == [('student2',)]
@@ -0,0 +1,56 @@
+from models import db, User, ContentItem, QuizAttemptSummary
+
+
+def _attempt(client, quiz_id, questions, correct):
+    """Hace un intento acertando las `correct` primeras preguntas."""
+    client.get(f'/student/quiz/{quiz_id}/take')
+    return client.post(f'/student/quiz/{quiz_id}/take', data={
+        f'question_{question_id}': '1' if index < correct else '2' for index, question_id in enumerate(questions)
+    })
+
+
+def _setup(app, make_quiz, username):
+    quiz_id = make_quiz(questions=4)
+    with app.app_context():
+        questions = sorted(question.id for question in db.session.get(ContentItem, quiz_id).questions)
+        student_id = User.query.filter_by(username=username).one().id
+    return quiz_id, questions, student_id
+
+
+def _summary(app, student_id, quiz_id):
+    with app.app_context():
+        summary = db.session.get(QuizAttemptSummary, (student_id, quiz_id))
+        return summary and (summary.attempt_count, summary.best_score, summary.passed)
+
+
+def test_summary_keeps_the_best_attempt_and_blocks_after_passing(app, client_for, make_quiz):
+    quiz_id, questions, student_id = _setup(app, make_quiz, 'student3')
+    client = client_for('student3')
+    _attempt(client, quiz_id, questions, correct=2)
+    assert _summary(app, student_id, quiz_id) == (1, 5.0, False)
+    _attempt(client, quiz_id, questions, correct=1)
+    assert _summary(app, student_id, quiz_id) == (2, 5.0, False)
+    _attempt(client, quiz_id, questions, correct=3)
+    assert _summary(app, student_id, quiz_id) == (3, 7.5, True)
+
+    response = client.get(f'/student/quiz/{quiz_id}/take')
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/student/dashboard')
+    _attempt(client, quiz_id, questions, correct=0)
+    assert _summary(app, student_id, quiz_id) == (3, 7.5, True)
+
+
+def test_max_attempts_and_cooldown_are_read_from_the_summary(app, client_for, make_quiz, monkeypatch):
+    quiz_id, questions, student_id = _setup(app, make_quiz, 'student4')
+    client = client_for('student4')
+    monkeypatch.setitem(app.config, 'QUIZ_MAX_ATTEMPTS', 2)
+    _attempt(client, quiz_id, questions, correct=0)
+    _attempt(client, quiz_id, questions, correct=0)
+    assert client.get(f'/student/quiz/{quiz_id}/take').status_code == 302
+    assert _summary(app, student_id, quiz_id) == (2, 0.0, False)
+
+    monkeypatch.setitem(app.config, 'QUIZ_MAX_ATTEMPTS', None)
+    monkeypatch.setitem(app.config, 'QUIZ_ATTEMPT_COOLDOWN', 3600)
+    assert client.get(f'/student/quiz/{quiz_id}/take').status_code == 302
+    monkeypatch.setitem(app.config, 'QUIZ_ATTEMPT_COOLDOWN', 0)
+    assert client.get(f'/student/quiz/{quiz_id}/take').status_code == 200
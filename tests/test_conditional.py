@@ -0,0 +1,67 @@
+import pytest
+from sqlalchemy import event
+
+from models import db, Course, Module, ContentItem
+from sqlite_profile import READER_EXTENSION
+
+
+@pytest.fixture(scope='module')
+def ids(app):
+    with app.app_context():
+        course = Course.query.order_by(Course.id).offset(2).first()
+        module = Module.query.filter_by(course_id=course.id).order_by(Module.order).first()
+        return {'course': course.id, 'module': module.id}
+
+
+@pytest.fixture
+def queries(app):
+    """Sentencias SELECT ejecutadas durante la prueba."""
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append(statement)
+
+    with app.app_context():
+        engines = [engine for engine in (db.engine, app.extensions.get(READER_EXTENSION)) if engine is not None]
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', capture)
+    yield statements
+    for engine in engines:
+        event.remove(engine, 'before_cursor_execute', capture)
+
+
+def test_unchanged_page_is_answered_with_304_before_querying_modules(client_for, ids, queries):
+    client = client_for('student0')
+    url = f"/student/courses/{ids['course']}/modules/{ids['module']}"
+    response = client.get(url)
+    assert response.status_code == 200
+    etag, weak = response.get_etag()
+    assert weak and response.last_modified is not None
+
+    queries.clear()
+    response = client.get(url, headers={'If-None-Match': f'W/"{etag}"'})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert not any('FROM modules' in statement or 'FROM content_items' in statement for statement in queries)
+
+
+def test_etag_changes_with_the_course_content_and_the_student(app, client_for, ids):
+    url = f"/student/courses/{ids['course']}"
+    etag = client_for('student0').get(url).get_etag()[0]
+    assert client_for('student1').get(url).get_etag()[0] != etag
+
+    with app.app_context():
+        module = db.session.get(Module, ids['module'])
+        db.session.add(ContentItem(title='Lección nueva', type='text', content='Texto', module_id=module.id,
+                                   order=module.get_next_content_order()))
+        db.session.commit()
+    response = client_for('student0').get(url, headers={'If-None-Match': f'W/"{etag}"'})
+    assert response.status_code == 200
+    assert response.get_etag()[0] != etag
+
+
+def test_unenrolled_student_is_redirected_without_an_etag(client_for, ids):
+    response = client_for('student5').get(f"/student/courses/{ids['course']}")
+    assert response.status_code == 302
+    assert 'ETag' not in response.headers
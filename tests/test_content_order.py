@@ -0,0 +1,27 @@
+from models import db, Course, Module, ContentItem
+
+
+def test_new_modules_get_consecutive_orders_inside_the_insert(app):
+    # Dos altas antes de confirmar: ninguna ve a la otra en memoria, el orden lo calcula cada INSERT
+    with app.app_context():
+        course = Course.query.order_by(Course.id).first()
+        last = db.session.query(db.func.max(Module.order)).filter(Module.course_id == course.id).scalar()
+        first = Module(title='Nuevo A', description='d', order=course.get_next_module_order(), course_id=course.id)
+        second = Module(title='Nuevo B', description='d', order=course.get_next_module_order(), course_id=course.id)
+        db.session.add_all([first, second])
+        db.session.commit()
+        assert (first.order, second.order) == (last + 1, last + 2)
+
+
+def test_new_content_gets_the_next_order_of_its_module(app, client_for):
+    with app.app_context():
+        module = Module.query.order_by(Module.id).first()
+        module_id = module.id
+        last = db.session.query(db.func.max(ContentItem.order)).filter(ContentItem.module_id == module_id).scalar()
+    client = client_for('instructor')
+    response = client.post(f'/instructor/module/{module_id}/content/new',
+                           data={'title': 'Nueva lección', 'content_type': 'text', 'text_content': 'Texto'})
+    assert response.status_code == 302
+    with app.app_context():
+        item = ContentItem.query.filter_by(module_id=module_id, title='Nueva lección').one()
+        assert item.order == last + 1
@@ -0,0 +1,69 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from enrollment import enroll_students
+from models import db, Role, User, Course, CourseEnrollment, CourseMetrics
+
+
+@pytest.fixture(scope='module')
+def cohort(app):
+    """Estudiantes nuevos sin inscripciones y el id del último curso."""
+    with app.app_context():
+        role = Role.query.filter_by(name='student').one()
+        users = [User(username=f'cohort{i}', email=f'cohort{i}@example.com', password='x', role=role)
+                 for i in range(3)]
+        db.session.add_all(users)
+        db.session.commit()
+        return [user.id for user in users], Course.query.order_by(Course.id.desc()).first().id
+
+
+def _total_students(course_id):
+    metrics = CourseMetrics.query.filter_by(course_id=course_id).one()
+    db.session.refresh(metrics)
+    return metrics.total_students
+
+
+def test_bulk_enrollment_counts_new_and_existing_students(app, cohort):
+    student_ids, course_id = cohort
+    with app.app_context():
+        before = _total_students(course_id)
+        assert enroll_students([course_id], student_ids=student_ids[:2]) == {
+            'courses': 1, 'enrolled': 2, 'already_enrolled': 0
+        }
+        assert enroll_students([course_id], student_ids=student_ids) == {
+            'courses': 1, 'enrolled': 1, 'already_enrolled': 2
+        }
+        assert CourseEnrollment.query.filter(CourseEnrollment.student_id.in_(student_ids),
+                                             CourseEnrollment.course_id == course_id).count() == 3
+        assert _total_students(course_id) == before + 3
+
+
+def test_unique_index_rejects_duplicate_enrollments(app, cohort):
+    student_ids, course_id = cohort
+    with app.app_context():
+        enroll_students([course_id], student_ids=student_ids[:1])
+        db.session.add(CourseEnrollment(student_id=student_ids[0], course_id=course_id))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+
+def test_json_api_reports_counts_and_unknown_students(app, client_for, cohort):
+    _, course_id = cohort
+    response = client_for('admin').post('/admin/enroll_students', json={
+        'course_ids': [str(course_id)], 'students': ['cohort0', 'cohort1@example.com', 'nadie'],
+    })
+    assert response.status_code == 200
+    assert response.get_json() == {'courses': 1, 'enrolled': 0, 'already_enrolled': 2, 'unknown': ['nadie']}
+
+
+@pytest.mark.parametrize('body', [
+    '{"course_ids": [1], "students": ["cohort0"]',
+    '{"course_ids": ["abc"], "students": ["cohort0"]}',
+    '{"course_ids": [null], "students": ["cohort0"]}',
+    '["cohort0"]',
+])
+def test_json_api_rejects_malformed_requests_with_400(client_for, body):
+    response = client_for('admin').post('/admin/enroll_students', data=body, content_type='application/json')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
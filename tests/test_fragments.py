@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import fragments
+from fragments import cached_fragment, fragment_cache_stats
+from models import Course
+
+
+@pytest.fixture(scope='module')
+def course_id(app):
+    with app.app_context():
+        return Course.query.order_by(Course.id).offset(1).first().id
+
+
+@pytest.fixture
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(fragments, '_fragments', fragments.OrderedDict())
+    monkeypatch.setattr(fragments, '_stats', {'hits': 0, 'misses': 0})
+
+
+def test_outline_is_shared_by_students_and_invalidated_by_a_new_module(client_for, course_id, empty_cache):
+    url = f'/student/courses/{course_id}'
+    first = client_for('student0').get(url).get_data(as_text=True)
+    assert client_for('student1').get(url).get_data(as_text=True) == first
+    assert fragment_cache_stats() == {'hits': 1, 'misses': 1, 'size': 1}
+
+    response = client_for('instructor').post(f'/instructor/course/{course_id}/module/new',
+                                             data={'title': 'Módulo añadido', 'description': 'Descripción'})
+    assert response.status_code == 302
+    assert 'Módulo añadido' in client_for('student0').get(url).get_data(as_text=True)
+    assert fragment_cache_stats()['misses'] == 2
+
+
+def test_stamp_includes_the_update_time(app, empty_cache):
+    # Un curso creado con el id de otro borrado puede repetir su versión, no su fecha
+    now = datetime.utcnow()
+    old = SimpleNamespace(id=99, content_version=1, updated_at=now - timedelta(days=1))
+    new = SimpleNamespace(id=99, content_version=1, updated_at=now)
+    with app.app_context():
+        assert cached_fragment(('curso', 99), old, lambda: 'antiguo') == 'antiguo'
+        assert cached_fragment(('curso', 99), old, lambda: 'no se renderiza') == 'antiguo'
+        assert cached_fragment(('curso', 99), new, lambda: 'nuevo') == 'nuevo'
+
+
+def test_cache_is_bounded(app, empty_cache, monkeypatch):
+    monkeypatch.setitem(app.config, 'FRAGMENT_CACHE_SIZE', 2)
+    course = SimpleNamespace(id=1, content_version=1, updated_at=None)
+    with app.app_context():
+        for name in ('a', 'b', 'c'):
+            cached_fragment(name, course, lambda name=name: name)
+        assert fragment_cache_stats()['size'] == 2
+        assert cached_fragment('a', course, lambda: 'a otra vez') == 'a otra vez'
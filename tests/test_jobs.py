@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import jobs
+from jobs import Job, submit_job, get_job
+
+
+@pytest.fixture
+def job_registry(monkeypatch):
+    registry = {}
+    monkeypatch.setattr(jobs, '_jobs', registry)
+    return registry
+
+
+def _job(registry, finished_ago=None):
+    job = Job('prueba')
+    if finished_ago is not None:
+        job.status = 'done'
+        job.finished_at = datetime.utcnow() - timedelta(seconds=finished_ago)
+    registry[job.id] = job
+    return job
+
+
+def test_finished_jobs_expire_after_the_ttl(app, job_registry, monkeypatch):
+    monkeypatch.setitem(app.config, 'JOB_RESULT_TTL', 60)
+    expired = _job(job_registry, finished_ago=120)
+    recent = _job(job_registry, finished_ago=10)
+    running = _job(job_registry)
+    running.finished_at, running.status = None, 'running'
+    job = submit_job(app, 'prueba', lambda job: None)
+    assert get_job(expired.id) is None
+    assert get_job(recent.id) is recent and get_job(running.id) is running and get_job(job.id) is job
+
+
+def test_history_keeps_the_most_recent_finished_jobs(app, job_registry, monkeypatch):
+    monkeypatch.setitem(app.config, 'JOB_HISTORY_LIMIT', 3)
+    running = _job(job_registry)
+    finished = [_job(job_registry, finished_ago=seconds) for seconds in (40, 30, 20, 10)]
+    job = submit_job(app, 'prueba', lambda job: None)
+    assert set(job_registry) >= {running.id, job.id}
+    assert [get_job(old.id) for old in finished] == [None, None, None, finished[3]]
@@ -0,0 +1,59 @@
+from models import db, User, Module, ContentItem, CourseEnrollment, CourseMetrics, StudentResponse
+from metrics import refresh_course_metrics
+
+
+def _metrics(course_id):
+    metrics = CourseMetrics.query.filter_by(course_id=course_id).one()
+    db.session.refresh(metrics)
+    return metrics.total_students, metrics.score_sum, metrics.score_count
+
+
+def _quiz(course_id):
+    return ContentItem.query.join(Module).filter(
+        Module.course_id == course_id, ContentItem.type == 'quiz'
+    ).order_by(ContentItem.id).first()
+
+
+def _student(username):
+    return User.query.filter_by(username=username).one()
+
+
+def test_average_score_counts_only_enrolled_students(app):
+    with app.app_context():
+        course_id = CourseEnrollment.query.order_by(CourseEnrollment.course_id).first().course_id
+        quiz = _quiz(course_id)
+        refresh_course_metrics([course_id])
+        students, score_sum, score_count = _metrics(course_id)
+
+        # student5 no está inscrito: su nota no cuenta
+        db.session.add(StudentResponse(student_id=_student('student5').id, content_item_id=quiz.id, score=10.0))
+        db.session.commit()
+        assert _metrics(course_id) == (students, score_sum, score_count)
+
+        db.session.add(StudentResponse(student_id=_student('student1').id, content_item_id=quiz.id, score=80.0))
+        db.session.commit()
+        assert _metrics(course_id) == (students, score_sum + 80.0, score_count + 1)
+
+
+def test_unenrolling_removes_the_students_scores(app):
+    with app.app_context():
+        course_id = CourseEnrollment.query.order_by(CourseEnrollment.course_id).first().course_id
+        student = _student('student3')
+        db.session.add(StudentResponse(student_id=student.id, content_item_id=_quiz(course_id).id, score=60.0))
+        db.session.commit()
+        before = _metrics(course_id)
+
+        enrollment = CourseEnrollment.query.filter_by(student_id=student.id, course_id=course_id).one()
+        db.session.delete(enrollment)
+        db.session.commit()
+        students, score_sum, score_count = _metrics(course_id)
+        assert students == before[0] - 1 and score_count < before[2] and score_sum <= before[1] - 60.0
+        refresh_course_metrics([course_id])
+        assert _metrics(course_id) == (students, score_sum, score_count)
+
+        # Al volver a inscribirse, sus notas vuelven a contar
+        db.session.add(CourseEnrollment(student_id=student.id, course_id=course_id))
+        db.session.commit()
+        assert _metrics(course_id) == before
+        refresh_course_metrics([course_id])
+        assert _metrics(course_id) == before
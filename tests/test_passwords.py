@@ -0,0 +1,44 @@
+import threading
+
+import passwords
+from models import db, Role, User
+from passwords import hash_with_rounds, needs_rehash
+
+
+def _user(app, username, password_hash):
+    with app.app_context():
+        role = Role.query.filter_by(name='student').one()
+        db.session.add(User(username=username, email=f'{username}@example.com', password=password_hash, role=role))
+        db.session.commit()
+
+
+def test_login_is_rejected_with_503_when_the_hashing_queue_is_full(app, monkeypatch):
+    _user(app, 'busy-login', hash_with_rounds(b'secreto', 4))
+    with app.app_context():
+        executor, _ = passwords._pool()
+    full = threading.BoundedSemaphore(1)
+    full.acquire()
+    monkeypatch.setattr(passwords, '_pool', lambda: (executor, full))
+    response = app.test_client().post('/', data={'username': 'busy-login', 'password': 'secreto'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '2'
+
+
+def test_login_rehashes_at_the_configured_cost(app, monkeypatch):
+    _user(app, 'rehash-login', hash_with_rounds(b'secreto', 5))
+    monkeypatch.setitem(app.config, 'BCRYPT_LOG_ROUNDS', 4)
+    response = app.test_client().post('/', data={'username': 'rehash-login', 'password': 'secreto'})
+    assert response.status_code == 302
+    with app.app_context():
+        user = User.query.filter_by(username='rehash-login').one()
+        assert user.password.startswith('$2b$04$')
+        assert not needs_rehash(user.password)
+        assert passwords.check_password(user.password, 'secreto')
+
+
+def test_needs_rehash_compares_the_stored_cost(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'BCRYPT_LOG_ROUNDS', 4)
+    with app.app_context():
+        assert not needs_rehash(hash_with_rounds(b'x', 4))
+        assert needs_rehash(hash_with_rounds(b'x', 5))
+        assert needs_rehash('texto-plano')
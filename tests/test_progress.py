@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from models import db, User, Course, Module, ContentItem, CourseEnrollment, StudentResponse
+from progress import recompute_enrollment_progress
+
+
+def _course_with_progress():
+    """Inscripción de student0 en el primer curso, con el progreso guardado al día."""
+    enrollment = CourseEnrollment.query.join(User, User.id == CourseEnrollment.student_id).filter(
+        User.username == 'student0'
+    ).order_by(CourseEnrollment.course_id).first()
+    recompute_enrollment_progress(course_ids=[enrollment.course_id])
+    return db.session.get(CourseEnrollment, enrollment.id)
+
+
+def test_adding_content_does_not_rewrite_enrollments(app):
+    updates = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('UPDATE') and 'course_enrollments' in statement:
+            updates.append(statement)
+
+    with app.app_context():
+        enrollment = _course_with_progress()
+        course_id, stored = enrollment.course_id, enrollment.progress
+        count = db.session.get(Course, course_id).content_count
+        module = Module.query.filter_by(course_id=course_id).order_by(Module.order).first()
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            db.session.add(ContentItem(title='Extra', type='text', content='Texto',
+                                       order=module.get_next_content_order(), module_id=module.id))
+            db.session.commit()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+        assert updates == []
+
+        enrollment = db.session.get(CourseEnrollment, enrollment.id)
+        assert enrollment.course.content_count == count + 1
+        # Lo guardado no cambia; el progreso mostrado ya usa el nuevo total
+        assert enrollment.progress == stored
+        assert enrollment.get_progress() == enrollment.completed_items * 100.0 / (count + 1)
+
+
+def test_recompute_since_refreshes_courses_with_new_content(app):
+    with app.app_context():
+        enrollment = _course_with_progress()
+        since = datetime.utcnow() - timedelta(seconds=1)
+        module = Module.query.filter_by(course_id=enrollment.course_id).order_by(Module.order).first()
+        db.session.add(ContentItem(title='Otra', type='text', content='Texto',
+                                   order=module.get_next_content_order(), module_id=module.id))
+        db.session.commit()
+        # La inscripción no tiene respuestas recientes: la recoge el cambio de contenidos del curso
+        assert not StudentResponse.query.filter(
+            StudentResponse.student_id == enrollment.student_id, StudentResponse.completion_date >= since
+        ).count()
+        assert recompute_enrollment_progress(since=since) >= 1
+        enrollment = db.session.get(CourseEnrollment, enrollment.id)
+        assert enrollment.progress == enrollment.get_progress()
@@ -0,0 +1,110 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import event
+
+from models import db, Course, Module, ContentItem
+from query_plans import _is_full_scan, _schema_copy, check_query_plans
+from sqlite_profile import READER_EXTENSION
+
+# Sentencias que no consultan tablas y no tienen plan que revisar
+_NO_PLAN = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE', 'PRAGMA')
+
+
+@pytest.fixture(scope='module')
+def ids(app):
+    with app.app_context():
+        course = Course.query.order_by(Course.id).first()
+        module = Module.query.filter_by(course_id=course.id).order_by(Module.order).first()
+        content = ContentItem.query.filter_by(module_id=module.id, type='text').order_by(ContentItem.order).first()
+        quiz = ContentItem.query.filter_by(module_id=module.id, type='quiz').first()
+        return {'course': course.id, 'module': module.id, 'content': content.id, 'quiz': quiz.id}
+
+
+@pytest.fixture
+def captured(app):
+    """Sentencias SQL (con sus parámetros) ejecutadas por el motor principal y el de solo lectura."""
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith(_NO_PLAN):
+            statements.append((statement, parameters[0] if executemany else parameters))
+
+    with app.app_context():
+        engines = [db.engine, app.extensions.get(READER_EXTENSION)]
+    engines = [engine for engine in engines if engine is not None]
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', capture)
+    yield statements
+    for engine in engines:
+        event.remove(engine, 'before_cursor_execute', capture)
+
+
+def _full_scans(app, statements):
+    """[(sentencia, detalle)] de cada recorrido completo de tabla en los planes de las sentencias."""
+    with app.app_context(), db.engine.connect() as connection:
+        schema = _schema_copy(connection)
+        virtual = [name for (name,) in connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE sql LIKE 'CREATE VIRTUAL%'"
+        )]
+    scans = []
+    try:
+        for statement, parameters in statements:
+            # Las tablas virtuales (búsqueda) no están en la copia del esquema
+            if any(name in statement for name in virtual):
+                continue
+            try:
+                plan = schema.execute(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+            except sqlite3.Error as e:
+                pytest.fail(f'No se pudo obtener el plan de {statement!r}: {e}')
+            scans.extend((statement, row[3]) for row in plan if _is_full_scan(row[3]))
+    finally:
+        schema.close()
+    return scans
+
+
+def _take_quiz(client, ids):
+    client.get(f"/student/quiz/{ids['quiz']}/take")
+    return client.post(f"/student/quiz/{ids['quiz']}/take", data={})
+
+
+HOT_ROUTES = {
+    'panel del estudiante': ('student0', lambda client, ids: client.get('/student/dashboard')),
+    'mis cursos': ('student0', lambda client, ids: client.get('/student/my_courses')),
+    'página del curso': ('student0', lambda client, ids: client.get(f"/student/courses/{ids['course']}")),
+    'página del módulo': ('student0', lambda client, ids: client.get(
+        f"/student/courses/{ids['course']}/modules/{ids['module']}"
+    )),
+    'contenido': ('student0', lambda client, ids: client.get(
+        f"/student/courses/{ids['course']}/modules/{ids['module']}/content/{ids['content']}"
+    )),
+    'intento de quiz': ('student1', _take_quiz),
+    'panel del instructor': ('instructor', lambda client, ids: client.get('/instructor/dashboard')),
+    'cursos del instructor': ('instructor', lambda client, ids: client.get('/instructor/courses')),
+    'detalle del curso': ('instructor', lambda client, ids: client.get(f"/instructor/course/{ids['course']}")),
+    'detalle del módulo': ('instructor', lambda client, ids: client.get(f"/instructor/module/{ids['module']}")),
+    'quizzes del módulo': ('instructor', lambda client, ids: client.get(
+        f"/instructor/module/{ids['module']}/quizzes"
+    )),
+    'estudiantes del curso': ('instructor', lambda client, ids: client.get(
+        f"/instructor/course/{ids['course']}/students"
+    )),
+}
+
+
+@pytest.mark.parametrize('route', list(HOT_ROUTES))
+def test_hot_route_uses_indexes(app, client_for, ids, captured, route):
+    username, request_route = HOT_ROUTES[route]
+    client = client_for(username)
+    captured.clear()
+    response = request_route(client, ids)
+    assert response.status_code < 400
+    assert captured, 'la ruta no ejecutó ninguna consulta'
+    assert _full_scans(app, list(captured)) == []
+
+
+def test_check_query_plans_finds_no_full_scans(app):
+    with app.app_context():
+        results = check_query_plans()
+    assert results
+    assert [(name, scans) for name, _, scans in results if scans] == []
@@ -0,0 +1,74 @@
+import re
+from collections import Counter
+
+from sqlalchemy import event
+
+from grading import AnswerKey
+from models import db, User, ContentItem, StudentResponse, PendingQuizAttempt
+from sqlite_profile import READER_EXTENSION
+
+
+def _shown(response):
+    """Ids de las preguntas mostradas en la página del quiz."""
+    page = response.get_data(as_text=True)
+    return sorted({int(question_id) for question_id in re.findall(r'name="question_(\d+)"', page)})
+
+
+def test_draw_is_reproducible_and_stratified(app, make_quiz):
+    quiz_id = make_quiz(questions=20, questions_per_attempt=5, stratify_by_tag=True,
+                        tags=['álgebra'] * 12 + ['geometría'] * 8)
+    with app.app_context():
+        key = AnswerKey.compile(db.session.get(ContentItem, quiz_id))
+    drawn = key.draw(1234)
+    assert [question.id for question in drawn.questions] == [question.id for question in key.draw(1234).questions]
+    assert len(drawn.questions) == 5
+    assert Counter(question.tag for question in drawn.questions) == {'álgebra': 3, 'geometría': 2}
+
+
+def test_attempt_keeps_its_draw_and_grades_only_the_drawn_questions(app, client_for, make_quiz):
+    quiz_id = make_quiz(questions=30, questions_per_attempt=4)
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement.upper())
+
+    client = client_for('student1')
+    with app.app_context():
+        engines = [engine for engine in (db.engine, app.extensions.get(READER_EXTENSION)) if engine is not None]
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        shown = _shown(client.get(f'/student/quiz/{quiz_id}/take'))
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', capture)
+    assert len(shown) == 4
+    assert not any('RANDOM()' in statement for statement in statements)
+    # Recargar la página no cambia el sorteo
+    assert _shown(client.get(f'/student/quiz/{quiz_id}/take')) == shown
+
+    response = client.post(f'/student/quiz/{quiz_id}/take',
+                           data={f'question_{question_id}': '1' for question_id in shown})
+    assert response.status_code == 302
+    with app.app_context():
+        student_id = User.query.filter_by(username='student1').one().id
+        attempt = StudentResponse.query.filter_by(student_id=student_id, content_item_id=quiz_id).one()
+        assert attempt.score == 10
+        assert sorted(answer.question_id for answer in attempt.answers) == shown
+        assert db.session.get(PendingQuizAttempt, (student_id, quiz_id)) is None
+
+
+def test_quiz_edited_during_the_attempt_is_restarted(app, client_for, make_quiz):
+    quiz_id = make_quiz(questions=10, questions_per_attempt=3)
+    client = client_for('student2')
+    shown = _shown(client.get(f'/student/quiz/{quiz_id}/take'))
+    with app.app_context():
+        db.session.get(ContentItem, quiz_id).version += 1
+        db.session.commit()
+    response = client.post(f'/student/quiz/{quiz_id}/take',
+                           data={f'question_{question_id}': '1' for question_id in shown})
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith(f'/student/quiz/{quiz_id}/take')
+    with app.app_context():
+        student_id = User.query.filter_by(username='student2').one().id
+        assert StudentResponse.query.filter_by(student_id=student_id, content_item_id=quiz_id).count() == 0
@@ -0,0 +1,69 @@
+import pytest
+
+from grading import AnswerKey, regrade_quiz, save_attempt_answers
+from item_analysis import quiz_item_analysis
+from jobs import Job
+from models import db, User, Module, ContentItem, QuizQuestion, StudentResponse
+
+
+def _questions(quiz):
+    return sorted(quiz.questions, key=lambda question: question.id)
+
+
+@pytest.fixture
+def quiz_id(app):
+    """Quiz nuevo de tres preguntas (respuesta correcta: opción 1) con un intento de student0 con dos aciertos."""
+    with app.app_context():
+        module = Module.query.order_by(Module.id.desc()).first()
+        quiz = ContentItem(title='Quiz re-calificado', type='quiz', content='', module_id=module.id,
+                           order=module.get_next_content_order())
+        db.session.add(quiz)
+        db.session.flush()
+        db.session.add_all(QuizQuestion(
+            question_text=f'Pregunta {i}', question_type='multiple_choice', correct_answer='1',
+            options='["sí", "no"]', content_item_id=quiz.id
+        ) for i in range(3))
+        db.session.commit()
+
+        _, _, score, graded = AnswerKey.compile(quiz).grade({
+            f'question_{question.id}': answer for question, answer in zip(_questions(quiz), ['1', '1', '2'])
+        })
+        student = User.query.filter_by(username='student0').one()
+        response = StudentResponse(student_id=student.id, content_item_id=quiz.id, score=score, completed=True)
+        db.session.add(response)
+        db.session.flush()
+        save_attempt_answers(response.id, graded)
+        db.session.commit()
+        return quiz.id
+
+
+def _score(quiz_id):
+    return StudentResponse.query.filter_by(content_item_id=quiz_id).one().score
+
+
+def test_regrade_scores_each_attempt_over_its_saved_answers(app, quiz_id):
+    with app.app_context():
+        quiz = db.session.get(ContentItem, quiz_id)
+        assert _score(quiz_id) == pytest.approx(20 / 3)
+        # Una pregunta nueva no cuenta como fallo de un intento que no la vio
+        db.session.add(QuizQuestion(question_text='Nueva', question_type='multiple_choice', correct_answer='1',
+                                    options='["sí", "no"]', content_item_id=quiz.id))
+        _questions(quiz)[2].correct_answer = '2'
+        db.session.commit()
+        assert regrade_quiz(Job('regrade_quiz'), quiz_id) == 1
+        assert _score(quiz_id) == pytest.approx(10.0)
+
+
+def test_item_analysis_is_refreshed_after_a_regrade_in_another_process(app, quiz_id):
+    with app.app_context():
+        quiz = db.session.get(ContentItem, quiz_id)
+        report = quiz_item_analysis(quiz)
+        assert [row['p_value'] for row in report['questions']] == [1.0, 1.0, 0.0]
+
+        _questions(quiz)[2].correct_answer = '2'
+        db.session.commit()
+        # La re-calificación no invalida la caché de este proceso; la marca de la base de datos sí
+        regrade_quiz(Job('regrade_quiz'), quiz_id)
+        quiz = db.session.get(ContentItem, quiz_id)
+        report = quiz_item_analysis(quiz)
+        assert [row['p_value'] for row in report['questions']] == [1.0, 1.0, 1.0]
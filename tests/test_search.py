@@ -0,0 +1,26 @@
+import pytest
+
+from models import Course
+
+
+@pytest.fixture(scope='module')
+def course_id(app):
+    with app.app_context():
+        return Course.query.order_by(Course.id).first().id
+
+
+def test_unenrolled_course_hits_offer_enrollment(client_for, course_id):
+    # student5 no está inscrito en ningún curso
+    response = client_for('student5').get('/student/search', query_string={'q': 'Curso'})
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert f'action="/student/enroll/{course_id}"' in page
+    assert f'href="/student/courses/{course_id}"' not in page
+
+
+def test_enrolled_course_hits_link_to_the_course(client_for, course_id):
+    response = client_for('student0').get('/student/search', query_string={'q': 'Curso'})
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert f'href="/student/courses/{course_id}"' in page
+    assert f'action="/student/enroll/{course_id}"' not in page
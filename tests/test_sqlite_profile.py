@@ -0,0 +1,109 @@
+import io
+
+import pytest
+from sqlalchemy import event
+
+import app as app_module
+import uploads
+from models import db, Role, User, Course, Module, ContentItem
+from passwords import hash_password
+from sqlite_profile import READER_EXTENSION
+
+
+@pytest.fixture
+def statements(app):
+    """Primera palabra de cada sentencia ejecutada, por motor ('reader' o 'writer')."""
+    log = {'reader': [], 'writer': []}
+    with app.app_context():
+        engines = {'reader': app.extensions[READER_EXTENSION], 'writer': db.engine}
+    listeners = {}
+    for name, engine in engines.items():
+        def capture(connection, cursor, statement, parameters, context, executemany, name=name):
+            log[name].append(statement.split(None, 1)[0].upper())
+        event.listen(engine, 'before_cursor_execute', capture)
+        listeners[name] = capture
+    yield log
+    for name, engine in engines.items():
+        event.remove(engine, 'before_cursor_execute', listeners[name])
+
+
+@pytest.fixture(scope='module')
+def course_ids(app):
+    with app.app_context():
+        course = Course.query.order_by(Course.id).first()
+        module = Module.query.filter_by(course_id=course.id).order_by(Module.order).first()
+        quiz = ContentItem.query.filter_by(module_id=module.id, type='quiz').first()
+        return {'course': course.id, 'module': module.id, 'quiz': quiz.id}
+
+
+def _clear(statements):
+    for log in statements.values():
+        log.clear()
+
+
+def test_get_requests_only_use_the_reader(client_for, course_ids, statements):
+    client = client_for('student0')
+    _clear(statements)
+    response = client.get(f"/student/courses/{course_ids['course']}")
+    assert response.status_code == 200
+    assert statements['reader']
+    assert statements['writer'] == []
+
+
+def test_writer_transaction_starts_with_the_first_write(client_for, course_ids, statements):
+    client = client_for('instructor')
+    _clear(statements)
+    response = client.post(f"/instructor/course/{course_ids['course']}/module/new",
+                           data={'title': 'Módulo nuevo', 'description': 'Descripción'})
+    assert response.status_code == 302
+    assert statements['reader'] and set(statements['reader']) == {'SELECT'}
+    assert statements['writer'][:2] == ['BEGIN', 'INSERT']
+
+
+def test_login_checks_the_password_without_the_write_lock(app, monkeypatch, write_lock_free):
+    with app.app_context():
+        role = Role.query.filter_by(name='student').one()
+        db.session.add(User(username='login-lock', email='login-lock@example.com',
+                            password=hash_password('secreto'), role=role))
+        db.session.commit()
+    free = []
+
+    def check_password(password_hash, password):
+        free.append(write_lock_free())
+        return real_check(password_hash, password)
+
+    real_check = app_module.check_password
+    monkeypatch.setattr(app_module, 'check_password', check_password)
+    response = app.test_client().post('/', data={'username': 'login-lock', 'password': 'secreto'})
+    assert response.status_code == 302
+    assert free == [True]
+
+
+def test_upload_body_is_received_without_the_write_lock(app, client_for, course_ids, monkeypatch, write_lock_free):
+    free = []
+    real_write = uploads.HashingFile.write
+
+    def write(self, data):
+        free.append(write_lock_free())
+        return real_write(self, data)
+
+    monkeypatch.setattr(uploads.HashingFile, 'write', write)
+    response = client_for('instructor').post(
+        f"/instructor/module/{course_ids['module']}/content/new",
+        data={'title': 'Apuntes', 'content_type': 'file', 'file': (io.BytesIO(b'apuntes ' * 1000), 'apuntes.txt')},
+        content_type='multipart/form-data',
+    )
+    assert response.status_code == 302
+    assert free and all(free)
+    with app.app_context():
+        assert ContentItem.query.filter_by(module_id=course_ids['module'], title='Apuntes').one().file_path
+
+
+def test_quiz_submission_checks_limits_inside_the_write_transaction(client_for, course_ids, statements):
+    client = client_for('student2')
+    assert client.get(f"/student/quiz/{course_ids['quiz']}/take").status_code == 200
+    _clear(statements)
+    response = client.post(f"/student/quiz/{course_ids['quiz']}/take", data={})
+    assert response.status_code == 302
+    # Retirar el intento es lo primero que se escribe; la comprobación de límites va después, en el escritor
+    assert statements['writer'][:3] == ['BEGIN', 'DELETE', 'SELECT']
@@ -0,0 +1,89 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from models import db, Module, ContentItem, UploadBlob
+from uploads import blob_path, collect_garbage
+
+DATA = b'temario del curso\n' * 4096
+SHA256 = hashlib.sha256(DATA).hexdigest()
+
+
+@pytest.fixture(scope='module')
+def module_ids(app):
+    with app.app_context():
+        return [module.id for module in Module.query.order_by(Module.id).limit(2)]
+
+
+def _upload(client, module_id, name, title):
+    response = client.post(f'/instructor/module/{module_id}/content/new', data={
+        'title': title, 'content_type': 'file', 'file': (io.BytesIO(DATA), name),
+    }, content_type='multipart/form-data')
+    assert response.status_code == 302
+
+
+def _stored_file(app):
+    with app.app_context():
+        return blob_path(SHA256)
+
+
+def _ref_count(sha256):
+    blob = db.session.get(UploadBlob, sha256)
+    if blob is not None:
+        db.session.refresh(blob)
+    return blob and blob.ref_count
+
+
+def test_same_content_is_stored_once_and_collected_with_its_last_reference(app, client_for, module_ids):
+    client = client_for('instructor')
+    _upload(client, module_ids[0], 'temario.txt', 'Temario A')
+    _upload(client, module_ids[1], 'syllabus.txt', 'Temario B')
+    with app.app_context():
+        items = ContentItem.query.filter(
+            ContentItem.title.in_(['Temario A', 'Temario B'])
+        ).order_by(ContentItem.id).all()
+        assert [item.file_path for item in items] == [f'{SHA256}/temario.txt', f'{SHA256}/syllabus.txt']
+        assert _ref_count(SHA256) == 2
+        item_ids = [item.id for item in items]
+    with open(_stored_file(app), 'rb') as f:
+        assert f.read() == DATA
+
+    assert client.post(f'/instructor/content/delete/{item_ids[0]}').status_code == 302
+    with app.app_context():
+        assert _ref_count(SHA256) == 1
+    assert os.path.exists(_stored_file(app))
+
+    assert client.post(f'/instructor/content/delete/{item_ids[1]}').status_code == 302
+    with app.app_context():
+        assert _ref_count(SHA256) is None
+    assert not os.path.exists(_stored_file(app))
+
+
+def test_download_is_conditional_on_the_content_hash(app, client_for, module_ids):
+    client = client_for('instructor')
+    _upload(client, module_ids[0], 'descarga.txt', 'Descarga')
+    response = client.get(f'/uploads/{SHA256}/descarga.txt')
+    assert response.status_code == 200
+    assert response.get_etag()[0] == SHA256
+    assert 'immutable' in response.headers['Cache-Control']
+    response.close()
+    assert client.get(f'/uploads/{SHA256}/descarga.txt', headers={'If-None-Match': f'"{SHA256}"'}).status_code == 304
+
+
+def test_collect_garbage_fixes_counts_and_removes_orphans(app):
+    with app.app_context():
+        orphan = hashlib.sha256(b'huerfano').hexdigest()
+        os.makedirs(os.path.dirname(blob_path(orphan)), exist_ok=True)
+        with open(blob_path(orphan), 'wb') as f:
+            f.write(b'huerfano')
+        referenced = db.session.get(UploadBlob, SHA256)
+        referenced.ref_count = 7
+        db.session.commit()
+
+        fixed, removed = collect_garbage()
+        assert fixed >= 1 and removed >= 1
+        assert _ref_count(SHA256) == ContentItem.query.filter(ContentItem.file_path.like(f'{SHA256}/%')).count()
+        assert not os.path.exists(blob_path(orphan))
+        assert os.path.exists(blob_path(SHA256))
@@ -0,0 +1,101 @@
+import csv
+import io
+import os
+
+import pytest
+
+import user_import
+from jobs import Job
+from models import db, User
+from passwords import check_password
+
+
+class InlinePool:
+    """ProcessPoolExecutor en el mismo proceso que anota el estado de la base de datos al hashear."""
+
+    def __init__(self, max_workers, mp_context, calls, write_lock_free):
+        self.start_method = mp_context.get_start_method()
+        self.calls = calls
+        self.write_lock_free = write_lock_free
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def map(self, func, *iterables, chunksize=1):
+        self.calls.append((self.start_method, db.session().in_transaction(), self.write_lock_free()))
+        return list(map(func, *iterables))
+
+
+@pytest.fixture
+def hashing_calls(app, monkeypatch, tmp_path, write_lock_free):
+    monkeypatch.setattr(app, 'instance_path', str(tmp_path))
+    monkeypatch.setattr(user_import, 'IMPORT_BATCH_SIZE', 2)
+    calls = []
+    monkeypatch.setattr(user_import, 'ProcessPoolExecutor',
+                        lambda max_workers, mp_context: InlinePool(max_workers, mp_context, calls, write_lock_free))
+    return calls
+
+
+def _csv(prefix, count, password=''):
+    lines = ['username,email,role,password']
+    lines += [f'{prefix}{i},{prefix}{i}@example.com,student,{password}' for i in range(count)]
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def _passwords(import_id):
+    data = user_import.take_generated_passwords(import_id)
+    return {username: password for username, _, password in csv.reader(io.StringIO(data.decode('utf-8')))}
+
+
+def test_import_hashes_outside_any_transaction(app, hashing_calls):
+    with app.app_context():
+        import_id = user_import.save_import_file(_csv('hash', 3, password='secreto'))
+        summary = user_import.run_import(Job('import_users'), import_id)
+        assert summary['created'] == 3 and summary['errors'] == []
+        assert hashing_calls == [('spawn', False, True), ('spawn', False, True)]
+        assert check_password(User.query.filter_by(username='hash0').one().password, 'secreto')
+
+
+def test_import_resumes_and_recovers_generated_passwords(app, hashing_calls, monkeypatch):
+    real_checkpoint = user_import._checkpoint
+
+    def crash(*args):
+        raise RuntimeError('corte')
+
+    with app.app_context():
+        import_id = user_import.save_import_file(_csv('resume', 5) + b'resume0,otro@example.com,student,\n')
+        # El primer lote se confirma y la importación se corta antes del punto de control
+        monkeypatch.setattr(user_import, '_checkpoint', crash)
+        with pytest.raises(RuntimeError):
+            user_import.run_import(Job('import_users'), import_id)
+        db.session.rollback()
+        assert User.query.filter(User.username.like('resume%')).count() == 2
+
+        monkeypatch.setattr(user_import, '_checkpoint', real_checkpoint)
+        summary = user_import.run_import(Job('import_users'), import_id)
+        # Las filas del lote ya confirmado cuentan como creadas y no se marcan como duplicadas
+        assert summary['created'] == 5
+        assert [error['line'] for error in summary['errors']] == [7]
+        assert summary['generated_passwords']
+
+        passwords = _passwords(import_id)
+        assert sorted(passwords) == [f'resume{i}' for i in range(5)]
+        for username, password in passwords.items():
+            assert check_password(User.query.filter_by(username=username).one().password, password)
+
+
+def test_generated_passwords_are_downloaded_once(app, client_for, hashing_calls):
+    with app.app_context():
+        import_id = user_import.save_import_file(_csv('once', 1))
+        user_import.run_import(Job('import_users'), import_id)
+        # El CSV subido y el estado se borran al terminar
+        csv_path, state_path, _ = user_import._paths(import_id)
+    client = client_for('admin')
+    response = client.get(f'/admin/import_users/{import_id}/passwords')
+    assert response.status_code == 200
+    assert response.data.decode('utf-8').startswith('once0,once0@example.com,')
+    assert client.get(f'/admin/import_users/{import_id}/passwords').status_code == 404
+    assert not os.path.exists(csv_path) and not os.path.exists(state_path)
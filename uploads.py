@@ -0,0 +1,287 @@
+import hashlib
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+from flask import current_app, Request, request, abort, send_file
+from sqlalchemy.dialects import postgresql, sqlite
+from werkzeug.utils import secure_filename
+from models import db, ContentItem, UploadBlob
+
+# Almacén de archivos direccionado por contenido: cada archivo se guarda una sola vez bajo su
+# SHA-256 y `ContentItem.file_path` lo referencia como "<sha256>/<nombre original>". La tabla
+# `upload_blobs` lleva la cuenta de referencias y el archivo se borra al quitar la última.
+_HASHED_PATH_RE = re.compile(r'^([0-9a-f]{64})/')
+_COPY_CHUNK_SIZE = 1024 * 1024
+# Los temporales más antiguos que esto son restos de subidas interrumpidas
+STALE_TEMP_SECONDS = 24 * 3600
+# Serializa la publicación y el borrado de archivos dentro del proceso
+_files_lock = threading.Lock()
+
+
+def _store_dir(*parts):
+    return os.path.join(current_app.config['UPLOAD_STORE'], *parts)
+
+
+def blob_path(sha256):
+    """Ruta en disco del contenido con el hash dado."""
+    return _store_dir('objects', sha256[:2], sha256)
+
+
+def content_hash(file_path):
+    """SHA-256 de un `file_path` del almacén, o None si es una ruta antigua."""
+    match = _HASHED_PATH_RE.match(file_path or '')
+    return match.group(1) if match else None
+
+
+def send_blob(sha256, download_name):
+    """Respuesta para descargar un archivo del almacén.
+
+    El ETag es el propio hash y, como el contenido de la URL no cambia nunca, se puede cachear
+    como inmutable. Se atienden peticiones condicionales (304) y por rangos (206). Con
+    `UPLOAD_ACCEL_REDIRECT` el envío se delega en nginx y con `USE_X_SENDFILE` en el servidor
+    que soporte esa cabecera, sin que el worker de Python transfiera los bytes.
+    """
+    path = blob_path(sha256)
+    if not os.path.exists(path):
+        abort(404)
+    max_age = current_app.config.get('UPLOAD_CACHE_MAX_AGE', 365 * 24 * 3600)
+    accel_prefix = current_app.config.get('UPLOAD_ACCEL_REDIRECT')
+    if accel_prefix:
+        response = current_app.response_class(
+            mimetype=mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+        )
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{sha256[:2]}/{sha256}"
+        response.headers.set('Content-Disposition', 'inline', filename=download_name)
+        response.last_modified = os.path.getmtime(path)
+        response.set_etag(sha256)
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        # nginx atiende los rangos; aquí solo se resuelve el 304
+        response = response.make_conditional(request)
+    else:
+        response = send_file(path, download_name=download_name, etag=sha256, max_age=max_age, conditional=True)
+        # Anuncia los rangos también en la respuesta completa para que el reproductor pueda saltar
+        response.headers.setdefault('Accept-Ranges', 'bytes')
+    response.cache_control.immutable = True
+    return response
+
+
+class HashingFile:
+    """Archivo temporal en el almacén que calcula el SHA-256 mientras se escribe."""
+
+    def __init__(self):
+        tmp_dir = _store_dir('tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False)
+        self.path = self._file.name
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.adopted = False
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def close(self):
+        self._file.close()
+        if not self.adopted:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+
+class UploadRequest(Request):
+    """Petición cuyos archivos subidos se escriben directamente en un temporal con hash."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingFile()
+
+
+def _spool(stream):
+    """Copia un stream cualquiera a un temporal con hash (si no lo creó `UploadRequest`)."""
+    target = HashingFile()
+    stream.seek(0)
+    shutil.copyfileobj(stream, target, _COPY_CHUNK_SIZE)
+    target.flush()
+    return target
+
+
+def save_upload(file):
+    """Prepara un archivo subido para el almacén y devuelve su `file_path`.
+
+    El archivo ya está en disco (escrito y hasheado mientras llegaba la petición); se publica
+    bajo su hash al confirmar la sesión y se descarta si se deshace. Si el contenido ya existe
+    no se vuelve a escribir.
+    """
+    stream = file.stream if isinstance(file.stream, HashingFile) else _spool(file.stream)
+    stream.flush()
+    stream.adopted = True
+    sha256 = stream.sha256.hexdigest()
+    name = secure_filename(file.filename or '') or 'archivo'
+    root, ext = os.path.splitext(name)
+    name = root[:255 - 65 - len(ext)] + ext
+    db.session.info.setdefault('pending_uploads', []).append((stream.path, sha256))
+    return f'{sha256}/{name}'
+
+
+def _publish(temp_path, sha256):
+    target = blob_path(sha256)
+    with _files_lock:
+        if os.path.exists(target):
+            os.remove(temp_path)
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(temp_path, target)
+
+
+def _is_referenced(connection, sha256):
+    blobs = UploadBlob.__table__
+    return connection.execute(db.select(blobs.c.sha256).where(blobs.c.sha256 == sha256)).first() is not None
+
+
+def _remove_unreferenced(sha256s):
+    """Borra los archivos que quedaron sin referencias, comprobándolo de nuevo en la base de datos."""
+    with _files_lock, db.engine.connect() as connection:
+        for sha256 in sha256s:
+            if not _is_referenced(connection, sha256):
+                try:
+                    os.remove(blob_path(sha256))
+                except FileNotFoundError:
+                    pass
+
+
+def _add_reference(connection, sha256):
+    table = UploadBlob.__table__
+    dialect = {'sqlite': sqlite, 'postgresql': postgresql}.get(connection.dialect.name)
+    if dialect is not None:
+        statement = dialect.insert(table).values(sha256=sha256, ref_count=1, created_at=datetime.utcnow())
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.sha256], set_={'ref_count': table.c.ref_count + 1}
+        ))
+        return
+    updated = connection.execute(
+        table.update().where(table.c.sha256 == sha256).values(ref_count=table.c.ref_count + 1)
+    ).rowcount
+    if not updated:
+        connection.execute(table.insert().values(sha256=sha256, ref_count=1, created_at=datetime.utcnow()))
+
+
+def _release_reference(connection, target, sha256):
+    """Resta una referencia; si era la última, el archivo se borra al confirmar la sesión."""
+    table = UploadBlob.__table__
+    connection.execute(table.update().where(table.c.sha256 == sha256).values(ref_count=table.c.ref_count - 1))
+    if connection.execute(table.delete().where(table.c.sha256 == sha256, table.c.ref_count <= 0)).rowcount:
+        session = db.inspect(target).session
+        if session is not None:
+            session.info.setdefault('released_uploads', set()).add(sha256)
+
+
+@db.event.listens_for(ContentItem, 'after_insert')
+def _content_file_added(mapper, connection, target):
+    sha256 = content_hash(target.file_path)
+    if sha256:
+        _add_reference(connection, sha256)
+
+
+@db.event.listens_for(ContentItem, 'after_delete')
+def _content_file_removed(mapper, connection, target):
+    sha256 = content_hash(target.file_path)
+    if sha256:
+        _release_reference(connection, target, sha256)
+
+
+@db.event.listens_for(ContentItem, 'after_update')
+def _content_file_changed(mapper, connection, target):
+    history = db.inspect(target).attrs.file_path.history
+    if not history.has_changes():
+        return
+    old = content_hash(history.deleted[0]) if history.deleted else None
+    new = content_hash(target.file_path)
+    if old == new:
+        return
+    if new:
+        _add_reference(connection, new)
+    if old:
+        _release_reference(connection, target, old)
+
+
+@db.event.listens_for(db.session, 'after_commit')
+def _apply_file_changes(session):
+    for temp_path, sha256 in session.info.pop('pending_uploads', []):
+        _publish(temp_path, sha256)
+    released = session.info.pop('released_uploads', None)
+    if released:
+        _remove_unreferenced(released)
+
+
+@db.event.listens_for(db.session, 'after_rollback')
+def _discard_file_changes(session):
+    for temp_path, _ in session.info.pop('pending_uploads', []):
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+    session.info.pop('released_uploads', None)
+
+
+def collect_garbage(dry_run=False):
+    """Recalcula las referencias desde `ContentItem.file_path` y borra los archivos huérfanos.
+
+    Corrige las cuentas desviadas (por ejemplo, por borrados en cascada hechos fuera del ORM),
+    borra los archivos sin referencias y los temporales de subidas interrumpidas. Devuelve
+    (cuentas corregidas, archivos borrados).
+    """
+    counts = {}
+    for (file_path,) in db.session.query(ContentItem.file_path).filter(ContentItem.file_path.isnot(None)):
+        sha256 = content_hash(file_path)
+        if sha256:
+            counts[sha256] = counts.get(sha256, 0) + 1
+    stored = dict(db.session.query(UploadBlob.sha256, UploadBlob.ref_count))
+
+    fixed = [sha256 for sha256 in set(counts) | set(stored) if counts.get(sha256) != stored.get(sha256)]
+    if not dry_run and fixed:
+        now = datetime.utcnow()
+        for sha256 in fixed:
+            if sha256 not in counts:
+                db.session.execute(db.delete(UploadBlob).where(UploadBlob.sha256 == sha256))
+            elif sha256 in stored:
+                db.session.execute(db.update(UploadBlob).where(UploadBlob.sha256 == sha256).values(
+                    ref_count=counts[sha256]
+                ))
+            else:
+                db.session.add(UploadBlob(sha256=sha256, ref_count=counts[sha256], created_at=now))
+        db.session.commit()
+
+    orphans = []
+    objects_dir = _store_dir('objects')
+    if os.path.isdir(objects_dir):
+        for prefix in os.listdir(objects_dir):
+            for name in os.listdir(os.path.join(objects_dir, prefix)):
+                if name not in counts:
+                    orphans.append(name)
+    stale = []
+    tmp_dir = _store_dir('tmp')
+    if os.path.isdir(tmp_dir):
+        cutoff = time.time() - STALE_TEMP_SECONDS
+        stale = [
+            os.path.join(tmp_dir, name) for name in os.listdir(tmp_dir)
+            if os.path.getmtime(os.path.join(tmp_dir, name)) < cutoff
+        ]
+    if not dry_run:
+        _remove_unreferenced(orphans)
+        for path in stale:
+            os.remove(path)
+    return len(fixed), len(orphans) + len(stale)
@@ -0,0 +1,304 @@
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import secrets
+import time
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from models import db, User, Role
+from passwords import hash_with_rounds, configured_rounds
+
+# Usuarios insertados por transacción
+IMPORT_BATCH_SIZE = 500
+# Valores por consulta IN al comprobar duplicados en la base de datos
+LOOKUP_CHUNK_SIZE = 500
+IMPORT_COLUMNS = ('username', 'email', 'role', 'password')
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+_IMPORT_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+def imports_dir():
+    path = os.path.join(current_app.instance_path, 'imports')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _paths(import_id):
+    base = os.path.join(imports_dir(), import_id)
+    return base + '.csv', base + '.state.json', base + '.passwords.csv'
+
+
+def _remove(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _remove_expired_passwords():
+    """Borra los CSV de contraseñas generadas más antiguos que `IMPORT_PASSWORDS_MAX_AGE`."""
+    deadline = time.time() - current_app.config.get('IMPORT_PASSWORDS_MAX_AGE', 24 * 3600)
+    with os.scandir(imports_dir()) as entries:
+        for entry in entries:
+            if entry.name.endswith('.passwords.csv') and entry.stat().st_mtime < deadline:
+                _remove(entry.path)
+
+
+def save_import_file(data):
+    """Guarda el CSV subido y devuelve su id (hash del contenido).
+
+    Volver a subir el mismo archivo reutiliza el id y reanuda la importación si no terminó.
+    """
+    _remove_expired_passwords()
+    import_id = hashlib.sha256(data).hexdigest()[:32]
+    csv_path = _paths(import_id)[0]
+    if not os.path.exists(csv_path):
+        with open(csv_path, 'wb') as f:
+            f.write(data)
+    return import_id
+
+
+def generated_passwords_path(import_id):
+    """Ruta del CSV de contraseñas generadas de la importación, o None si no existe o expiró."""
+    if not _IMPORT_ID_RE.match(import_id):
+        return None
+    _remove_expired_passwords()
+    path = _paths(import_id)[2]
+    return path if os.path.exists(path) else None
+
+
+def take_generated_passwords(import_id):
+    """Devuelve el contenido del CSV de contraseñas generadas y lo borra, o None si no existe.
+
+    Las contraseñas se entregan una sola vez: dos descargas simultáneas no obtienen ambas el archivo.
+    """
+    path = generated_passwords_path(import_id)
+    if path is None:
+        return None
+    taken_path = f'{path}.{secrets.token_hex(8)}'
+    try:
+        os.replace(path, taken_path)
+    except FileNotFoundError:
+        return None
+    try:
+        with open(taken_path, 'rb') as f:
+            return f.read()
+    finally:
+        _remove(taken_path)
+
+
+def _load_state(state_path):
+    if os.path.exists(state_path):
+        with open(state_path, encoding='utf-8') as f:
+            return json.load(f)
+    return {'next_line': 0, 'created': 0, 'errors': []}
+
+
+def _save_state(state_path, state):
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+
+def _read_rows(csv_path):
+    """Lee el CSV; devuelve filas (número de línea, datos) y un error si faltan columnas."""
+    with open(csv_path, encoding='utf-8-sig', newline='') as f:
+        reader = csv.DictReader(f)
+        missing = [column for column in IMPORT_COLUMNS[:3] if column not in (reader.fieldnames or [])]
+        if missing:
+            return [], f'Faltan columnas en el CSV: {", ".join(missing)}'
+        rows = [
+            (reader.line_num, {column: (row.get(column) or '').strip() for column in IMPORT_COLUMNS})
+            for row in reader
+        ]
+    return rows, None
+
+
+def _existing_values(column, values):
+    """Valores de `values` que ya existen en la columna, consultados por bloques."""
+    values = list(values)
+    existing = set()
+    for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+        chunk = values[start:start + LOOKUP_CHUNK_SIZE]
+        existing.update(value for (value,) in db.session.query(column).filter(column.in_(chunk)))
+    return existing
+
+
+def _validate(rows):
+    """Valida todas las filas con consultas por conjuntos. Devuelve (filas válidas, errores)."""
+    roles = {name: role_id for role_id, name in db.session.query(Role.id, Role.name)}
+    usernames = _existing_values(User.username, {row['username'] for _, row in rows if row['username']})
+    emails = _existing_values(User.email, {row['email'] for _, row in rows if row['email']})
+
+    valid, errors = [], []
+    seen_usernames, seen_emails = set(), set()
+    for line, row in rows:
+        if not row['username'] or not row['email']:
+            error = 'Faltan el nombre de usuario o el correo.'
+        elif not _EMAIL_RE.match(row['email']):
+            error = 'Correo electrónico no válido.'
+        elif row['role'] not in roles:
+            error = f'Rol desconocido: {row["role"]}.'
+        elif row['username'] in usernames or row['username'] in seen_usernames:
+            error = 'El nombre de usuario ya existe.'
+        elif row['email'] in emails or row['email'] in seen_emails:
+            error = 'El correo ya está registrado.'
+        else:
+            error = None
+        if error:
+            errors.append({'line': line, 'username': row['username'], 'error': error})
+            continue
+        seen_usernames.add(row['username'])
+        seen_emails.add(row['email'])
+        valid.append((line, dict(row, role_id=roles[row['role']])))
+    return valid, errors
+
+
+def _insert_batch(batch, hashes):
+    """Inserta un lote en una transacción; si choca con otro alta concurrente, fila a fila."""
+    values = [
+        {'username': row['username'], 'email': row['email'], 'role_id': row['role_id'], 'password': password_hash}
+        for (_, row), password_hash in zip(batch, hashes)
+    ]
+    try:
+        db.session.execute(db.insert(User), values)
+        db.session.commit()
+        return [line for line, _ in batch], []
+    except IntegrityError:
+        db.session.rollback()
+
+    inserted, errors = [], []
+    for (line, row), value in zip(batch, values):
+        try:
+            db.session.execute(db.insert(User), [value])
+            db.session.commit()
+            inserted.append(line)
+        except IntegrityError:
+            db.session.rollback()
+            errors.append({'line': line, 'username': row['username'], 'error': 'El usuario o el correo ya existe.'})
+    return inserted, errors
+
+
+def _write_passwords(passwords_path, entries):
+    if entries:
+        with open(passwords_path, 'a', encoding='utf-8', newline='') as f:
+            csv.writer(f).writerows((entry['username'], entry['email'], entry['password']) for entry in entries)
+
+
+def _recover_batch(state, passwords_path):
+    """Recupera el lote cuya importación se cortó entre la confirmación y el punto de control.
+
+    Un usuario del lote se creó si existe con el mismo hash que se le calculó: cuenta como
+    creado, su línea no se vuelve a procesar y, si su contraseña se generó, se entrega (salvo
+    que ya esté en el CSV de contraseñas).
+    """
+    pending = state.pop('pending_batch', None)
+    if not pending:
+        return
+    hashes = dict(db.session.query(User.username, User.password).filter(
+        User.username.in_([entry['username'] for entry in pending])
+    ))
+    created = [entry for entry in pending if hashes.get(entry['username']) == entry['hash']]
+    written = set()
+    if os.path.exists(passwords_path):
+        with open(passwords_path, encoding='utf-8', newline='') as f:
+            written = {row[0] for row in csv.reader(f) if row}
+    _write_passwords(passwords_path, [
+        entry for entry in created if 'password' in entry and entry['username'] not in written
+    ])
+    state['created'] += len(created)
+    state['recovered_lines'] = sorted(set(state.get('recovered_lines', [])) | {entry['line'] for entry in created})
+
+
+def _checkpoint(state, line, created, batch_errors, invalid):
+    """Avanza el punto de control y guarda los errores de las filas ya procesadas."""
+    state['errors'].extend(batch_errors)
+    state['errors'].extend(error for error in invalid if state['next_line'] < error['line'] <= line)
+    state['errors'].sort(key=lambda error: error['line'])
+    state['next_line'] = line
+    state['created'] += created
+
+
+def run_import(job, import_id):
+    """Importa los usuarios del CSV por lotes, reanudando desde el último lote confirmado.
+
+    Las contraseñas se hashean en un pool de procesos con todos los núcleos, fuera de
+    cualquier transacción; cada lote se inserta en la suya. Las contraseñas generadas se
+    añaden a un CSV aparte para entregarlas a los usuarios. Cada lote forma parte del punto
+    de control hasta que se confirma, de modo que un corte justo después de confirmarlo no
+    pierde sus contraseñas ni marca sus filas como duplicadas. Al terminar se borran el CSV
+    subido y el estado.
+    Devuelve un resumen con los usuarios creados y los errores por fila.
+    """
+    csv_path, state_path, passwords_path = _paths(import_id)
+    state = _load_state(state_path)
+    rows, error = _read_rows(csv_path)
+    if error:
+        _remove(csv_path, state_path)
+        raise ValueError(error)
+    if state.get('pending_batch'):
+        _recover_batch(state, passwords_path)
+        _save_state(state_path, state)
+
+    recovered = set(state.get('recovered_lines', []))
+    pending = [(line, row) for line, row in rows if line > state['next_line'] and line not in recovered]
+    valid, invalid = _validate(pending)
+    # Termina la transacción de las comprobaciones: el hashing no la mantiene abierta y cada
+    # lote se inserta en una transacción propia
+    db.session.rollback()
+    job.report(0, len(valid))
+
+    rounds = configured_rounds()
+    workers = os.cpu_count() or 1
+    # 'spawn': los procesos no heredan las conexiones, hilos ni bloqueos del servidor
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        for start in range(0, len(valid), IMPORT_BATCH_SIZE):
+            batch = valid[start:start + IMPORT_BATCH_SIZE]
+            generated = {}
+            passwords = []
+            for line, row in batch:
+                if not row['password']:
+                    generated[line] = secrets.token_urlsafe(9)
+                passwords.append((row['password'] or generated[line]).encode('utf-8'))
+            hashes = list(pool.map(hash_with_rounds, passwords, [rounds] * len(passwords),
+                                   chunksize=max(1, len(passwords) // (workers * 4))))
+
+            # El lote (con sus contraseñas generadas) se guarda antes de confirmarlo
+            entries = []
+            for (line, row), password_hash in zip(batch, hashes):
+                entry = {'line': line, 'username': row['username'], 'email': row['email'], 'hash': password_hash}
+                if line in generated:
+                    entry['password'] = generated[line]
+                entries.append(entry)
+            state['pending_batch'] = entries
+            _save_state(state_path, state)
+
+            inserted, batch_errors = _insert_batch(batch, hashes)
+            inserted_lines = set(inserted)
+            _write_passwords(passwords_path, [
+                entry for entry in entries if 'password' in entry and entry['line'] in inserted_lines
+            ])
+            del state['pending_batch']
+
+            # Punto de control: todo lo anterior a esta línea ya está confirmado
+            _checkpoint(state, batch[-1][0], len(inserted), batch_errors, invalid)
+            _save_state(state_path, state)
+            job.report(start + len(batch))
+
+    if rows:
+        _checkpoint(state, rows[-1][0], 0, [], invalid)
+    _remove(csv_path, state_path)
+    return {
+        'import_id': import_id,
+        'created': state['created'],
+        'errors': state['errors'],
+        'generated_passwords': os.path.exists(passwords_path),
+    }
+